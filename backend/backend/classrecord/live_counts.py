@@ -0,0 +1,107 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Counts older than this are still served, but a background refresh is started
+    'MAX_AGE_SECONDS': 120,
+    # Sheets read at the same time per worker process
+    'WORKERS': 4,
+}
+
+
+class LiveCountRefresher:
+    """
+    Keeps ClassRecord.live_student_count in step with the Google Sheet without
+    making requests wait for Google.
+
+    Readers get whatever count is stored (stale-while-revalidate) and ask for a
+    refresh; refreshes run on a small per-worker thread pool, at most one per
+    spreadsheet at a time. Write paths that change the roster request a refresh
+    too, which is usually served from the snapshot they just cached.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+    def is_stale(self, class_record) -> bool:
+        if class_record.live_student_count is None or class_record.live_count_refreshed_at is None:
+            return True
+        age = timezone.now() - class_record.live_count_refreshed_at
+        return age > timedelta(seconds=self.config['MAX_AGE_SECONDS'])
+
+    def schedule(self, sheet_ids: Iterable[str]) -> int:
+        """
+        Refresh the counts of these spreadsheets in the background.
+
+        Returns:
+            Number of refreshes started (spreadsheets already being refreshed are skipped)
+        """
+        started = 0
+        for sheet_id in sheet_ids:
+            if not sheet_id:
+                continue
+            with self._lock:
+                if sheet_id in self._in_flight:
+                    continue
+                self._in_flight.add(sheet_id)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config['WORKERS'], thread_name_prefix='live-counts'
+                    )
+                executor = self._executor
+            executor.submit(self._refresh_in_background, sheet_id)
+            started += 1
+        return started
+
+    def refresh(self, sheet_id: str) -> Optional[int]:
+        """Read the student count of a spreadsheet now and store it on its class records."""
+        from classrecord.models import ClassRecord
+        from utils.google_service_account_sheets import GoogleServiceAccountSheets
+        from utils.sheets_rate_limiter import BULK, rate_limiter
+
+        service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+        # Background work, so it leaves quota to teachers' requests
+        with rate_limiter.priority(BULK):
+            count = service.get_student_count(sheet_id)
+        if count is None:
+            return None
+
+        # update() leaves updated_at/last_modified alone, the record itself didn't change
+        ClassRecord.objects.filter(google_sheet_id=sheet_id).update(
+            live_student_count=count,
+            live_count_refreshed_at=timezone.now()
+        )
+        return count
+
+    def _refresh_in_background(self, sheet_id: str):
+        try:
+            count = self.refresh(sheet_id)
+            logger.info(f"Refreshed live student count for {sheet_id}: {count}")
+        except Exception as e:
+            logger.warning(f"Could not refresh live student count for {sheet_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(sheet_id)
+            # Pool threads outlive requests, so don't leave their DB connection open
+            connection.close()
+
+
+def _load_config() -> Dict:
+    return getattr(settings, 'CLASS_RECORD_LIVE_COUNTS', {})
+
+
+live_counts = LiveCountRefresher(_load_config())
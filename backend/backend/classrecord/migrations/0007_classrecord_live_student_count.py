@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrecord', '0006_auto_20250707_0117'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classrecord',
+            name='live_count_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='classrecord',
+            name='live_student_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+def mark_existing_sheets_ready(apps, schema_editor):
+    ClassRecord = apps.get_model('classrecord', 'ClassRecord')
+    ClassRecord.objects.exclude(google_sheet_id__isnull=True).exclude(google_sheet_id='').update(sheet_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrecord', '0007_classrecord_live_student_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classrecord',
+            name='sheet_status',
+            field=models.CharField(choices=[('none', 'No sheet'), ('provisioning', 'Provisioning'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='classrecord',
+            name='sheet_status_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(mark_existing_sheets_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classrecord', '0008_classrecord_sheet_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classrecord',
+            name='sheet_status_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
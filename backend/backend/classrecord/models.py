@@ -11,6 +11,17 @@ class ClassRecord(models.Model):
         ('Summer', 'Summer'),
     ]
 
+    SHEET_NONE = 'none'
+    SHEET_PROVISIONING = 'provisioning'
+    SHEET_READY = 'ready'
+    SHEET_FAILED = 'failed'
+    SHEET_STATUS_CHOICES = [
+        (SHEET_NONE, 'No sheet'),
+        (SHEET_PROVISIONING, 'Provisioning'),
+        (SHEET_READY, 'Ready'),
+        (SHEET_FAILED, 'Failed'),
+    ]
+
     name = models.CharField(max_length=200)
     semester = models.CharField(max_length=20, choices=SEMESTER_CHOICES)
     teacher_name = models.CharField(max_length=100, blank=True)
@@ -23,6 +34,16 @@ class ClassRecord(models.Model):
     google_sheet_id = models.CharField(max_length=255, blank=True, null=True)
     google_sheet_url = models.URLField(blank=True, null=True)
 
+    # The sheet is copied from the template in the background (see provisioning.py)
+    sheet_status = models.CharField(max_length=20, choices=SHEET_STATUS_CHOICES, default=SHEET_NONE)
+    sheet_status_error = models.TextField(blank=True)
+    # When provisioning started, so records left 'provisioning' by a dead worker can be retried
+    sheet_status_updated_at = models.DateTimeField(null=True, blank=True)
+
+    # Student count read from the Google Sheet, refreshed in the background (see live_counts.py)
+    live_student_count = models.IntegerField(null=True, blank=True)
+    live_count_refreshed_at = models.DateTimeField(null=True, blank=True)
+
     # EXISTING FIELDS for spreadsheet functionality
     spreadsheet_data = models.JSONField(default=list, blank=True)
     custom_columns = models.JSONField(default=dict, blank=True)
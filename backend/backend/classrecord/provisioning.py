@@ -0,0 +1,202 @@
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Sheets copied at the same time per worker process
+    'WORKERS': 2,
+    # A copy takes seconds; a record still 'provisioning' after this lost its
+    # worker (restart, crash) and is marked failed so it can be retried
+    'STALE_SECONDS': 600,
+}
+
+
+class SheetProvisioner:
+    """
+    Copies the class record template into the teacher's Drive outside the
+    create request.
+
+    perform_create saves the record as 'provisioning' and returns; the copy and
+    the sharing change run on a small per-worker thread pool. The record ends up
+    'ready' with its sheet id/url, or 'failed' with the error, and the teacher
+    gets a notification either way. Clients poll the sheet_status action or
+    watch their notifications.
+
+    The pool lives in the worker's memory, so a record whose worker went away
+    stays 'provisioning'; after STALE_SECONDS it is treated as failed.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+    def schedule(self, class_record_id: int, access_token: str) -> bool:
+        """
+        Provision the sheet of a class record in the background.
+
+        Returns:
+            False if that record is already being provisioned
+        """
+        with self._lock:
+            if class_record_id in self._in_flight:
+                return False
+            self._in_flight.add(class_record_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config['WORKERS'], thread_name_prefix='sheet-provisioning'
+                )
+            executor = self._executor
+        executor.submit(self._provision_in_background, class_record_id, access_token)
+        return True
+
+    def provision(self, class_record_id: int, access_token: str) -> Dict:
+        """
+        Copy the template for a class record and share it for embedding, now.
+
+        Returns:
+            Dict with success status, and the sheet id or error
+        """
+        from classrecord.models import ClassRecord
+        from users.google_sheets_service import GoogleSheetsService
+
+        class_record = ClassRecord.objects.filter(id=class_record_id).first()
+        if class_record is None:
+            return {'success': False, 'error': 'Class record no longer exists'}
+
+        template_id = getattr(settings, 'GOOGLE_SHEETS_TEMPLATE_ID', None)
+        if not template_id:
+            return self._mark_failed(class_record, 'No Google Sheets template ID configured')
+
+        user_sheets_service = GoogleSheetsService(access_token, user_id=class_record.user_id)
+        copy_result = user_sheets_service.copy_template_sheet(
+            template_file_id=template_id,
+            new_name=f"{class_record.name} - {class_record.semester}"
+        )
+        if not copy_result['success']:
+            return self._mark_failed(class_record, copy_result.get('error', 'Failed to copy template'))
+
+        copied_file_info = copy_result['file']
+        copied_sheet_id = copied_file_info['id']
+
+        # Anyone with the link can edit, for iframe embedding
+        public_result = user_sheets_service.update_sheet_permissions(file_id=copied_sheet_id, make_editable=True)
+        if not public_result['success']:
+            # The teacher still owns the sheet; it may just be view-only when embedded
+            logger.warning(f"Sheet {copied_sheet_id} created but not made publicly editable: "
+                           f"{public_result.get('error', 'Unknown error')}")
+
+        # Only claim a record that still has no sheet; a retry may have attached one meanwhile
+        updated = ClassRecord.objects.filter(id=class_record.id, google_sheet_id__isnull=True).update(
+            google_sheet_id=copied_sheet_id,
+            google_sheet_url=copied_file_info.get('webViewLink'),
+            sheet_status=ClassRecord.SHEET_READY,
+            sheet_status_error='',
+            sheet_status_updated_at=timezone.now()
+        )
+        if not updated:
+            # Deleted, or given another sheet, while the copy was running; don't leave an orphaned sheet behind
+            from users.google_drive_service import GoogleDriveService
+            GoogleDriveService(access_token).delete_file(copied_sheet_id)
+            return {'success': False, 'error': 'Class record no longer exists or already has a sheet'}
+
+        self._notify(class_record, 'Class record sheet ready',
+                     f'The Google Sheet for {class_record.name} is ready.')
+
+        logger.info(f"Provisioned sheet {copied_sheet_id} for class record {class_record.id}")
+        return {'success': True, 'sheet_id': copied_sheet_id}
+
+    def _mark_failed(self, class_record, error: str) -> Dict:
+        from classrecord.models import ClassRecord
+
+        updated = ClassRecord.objects.filter(
+            id=class_record.id, google_sheet_id__isnull=True, sheet_status=ClassRecord.SHEET_PROVISIONING
+        ).update(
+            sheet_status=ClassRecord.SHEET_FAILED,
+            sheet_status_error=error,
+            sheet_status_updated_at=timezone.now()
+        )
+        if not updated:
+            # Another attempt finished (or took over) meanwhile; its outcome stands
+            return {'success': False, 'error': error}
+
+        self._notify(class_record, 'Class record sheet failed',
+                     f'The Google Sheet for {class_record.name} could not be created: {error}')
+
+        logger.warning(f"Provisioning sheet for class record {class_record.id} failed: {error}")
+        return {'success': False, 'error': error}
+
+    def expire_stale(self, class_record) -> bool:
+        """
+        Mark a record failed if it has been 'provisioning' for longer than STALE_SECONDS.
+
+        Args:
+            class_record: ClassRecord instance; refreshed in place when it was expired
+
+        Returns:
+            True if the record was marked failed
+        """
+        from classrecord.models import ClassRecord
+
+        if class_record.sheet_status != ClassRecord.SHEET_PROVISIONING:
+            return False
+
+        cutoff = timezone.now() - timedelta(seconds=self.config['STALE_SECONDS'])
+        updated = ClassRecord.objects.filter(
+            Q(sheet_status_updated_at__lt=cutoff) | Q(sheet_status_updated_at__isnull=True),
+            id=class_record.id,
+            sheet_status=ClassRecord.SHEET_PROVISIONING
+        ).update(
+            sheet_status=ClassRecord.SHEET_FAILED,
+            sheet_status_error='Sheet creation did not finish; please retry',
+            sheet_status_updated_at=timezone.now()
+        )
+        if updated:
+            logger.warning(f"Provisioning sheet for class record {class_record.id} timed out")
+            class_record.refresh_from_db(fields=['sheet_status', 'sheet_status_error', 'sheet_status_updated_at'])
+        return bool(updated)
+
+    @staticmethod
+    def _notify(class_record, title: str, message: str):
+        try:
+            from notifications.utils import create_notification
+            create_notification(class_record.user, 'class', title, message, related_object=class_record)
+        except Exception as e:
+            logger.warning(f"Could not notify about class record {class_record.id}: {str(e)}")
+
+    def _provision_in_background(self, class_record_id: int, access_token: str):
+        try:
+            self.provision(class_record_id, access_token)
+        except Exception as e:
+            logger.error(f"Provisioning sheet for class record {class_record_id} failed: {str(e)}")
+            try:
+                from classrecord.models import ClassRecord
+                class_record = ClassRecord.objects.filter(id=class_record_id).first()
+                if class_record is not None:
+                    self._mark_failed(class_record, str(e))
+            except Exception:
+                pass
+        finally:
+            with self._lock:
+                self._in_flight.discard(class_record_id)
+            # Pool threads outlive requests, so don't leave their DB connection open
+            connection.close()
+
+
+def _load_config() -> Dict:
+    return getattr(settings, 'CLASS_RECORD_PROVISIONING', {})
+
+
+provisioner = SheetProvisioner(_load_config())
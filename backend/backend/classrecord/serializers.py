@@ -20,9 +20,12 @@ class ClassRecordSerializer(serializers.ModelSerializer):
             'custom_columns',
             'last_modified',
             'google_sheet_id',
-            'google_sheet_url'
+            'google_sheet_url',
+            'sheet_status',
+            'sheet_status_error'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'last_modified', 'student_count']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_modified', 'student_count', 'sheet_status',
+                            'sheet_status_error']
 
     def create(self, validated_data):
         # Ensure Google Sheets fields have default values if not provided
@@ -85,6 +88,9 @@ class ClassRecordDetailSerializer(serializers.ModelSerializer):
             'updated_at',
             'last_modified',
             'google_sheet_id',
-            'google_sheet_url'
+            'google_sheet_url',
+            'sheet_status',
+            'sheet_status_error'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'last_modified', 'student_count', 'google_sheet_url']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_modified', 'student_count', 'google_sheet_url',
+                            'sheet_status', 'sheet_status_error']
\ No newline at end of file
@@ -5,7 +5,9 @@ from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
 from .models import ClassRecord, Student, GradeCategory, Grade
+from .provisioning import provisioner
 from .serializers import (
     ClassRecordSerializer,
     ClassRecordDetailSerializer,
@@ -13,7 +15,6 @@ from .serializers import (
     GradeCategorySerializer,
     GradeSerializer
 )
-from users.google_sheets_service import GoogleSheetsService
 from users.google_drive_service import GoogleDriveService
 # Remove the service account imports since we're switching to user-based approach
 # from utils.google_service_account_sheets import GoogleServiceAccountSheets
@@ -28,93 +29,35 @@ class ClassRecordViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         print("🔍 DEBUG: Entering perform_create method.")
-        
-        try:
-            # Save the class record initially without Google Sheet details
-            # Ensure google_sheet_url is explicitly set to None to avoid constraint issues
-            class_record = serializer.save(
-                user=self.request.user,
-                google_sheet_id=None,
-                google_sheet_url=None
-            )
-            
-            print(f"✅ ClassRecord created successfully: {class_record.id}")
 
-            # Check for user's Google access token
-            access_token = self.request.headers.get('X-Google-Access-Token')
-            if not access_token:
-                print("❌ No Google access token found in request headers. Skipping Google Sheets creation.")
-                print("   Please ensure the frontend sends the user's Google access token in the X-Google-Access-Token header.")
-                return
-
-            # Initialize Google Sheets service with user's access token
-            user_sheets_service = GoogleSheetsService(access_token)
-            template_id = getattr(settings, 'GOOGLE_SHEETS_TEMPLATE_ID', None)
-            
-            print(f"🔍 Template ID: {template_id}")
-            print(f"🔍 User email: {self.request.user.email}")
-            print(f"🔍 Using user's Google access token for Google Drive operations")
-            
-            if template_id:
-                # Step 1: Copy the template using the user's access token (will be owned by user)
-                print(f"🔄 Copying template sheet to user's Google Drive: {template_id}")
-                copy_result = user_sheets_service.copy_template_sheet(
-                    template_file_id=template_id,
-                    new_name=f"{class_record.name} - {class_record.semester}"
-                )
-                
-                print(f"🔍 Copy result: {copy_result}")
-                
-                if copy_result['success']:
-                    copied_file_info = copy_result['file']
-                    copied_sheet_id = copied_file_info['id']
-                    
-                    print(f"✅ Sheet copied successfully to user's Drive: {copied_sheet_id}")
-                    print(f"✅ File is now owned by user: {self.request.user.email}")
-                    
-                    # Step 2: Make the sheet publicly editable for iframe embedding
-                    print(f"🔄 Making sheet publicly editable for embedding...")
-                    public_result = user_sheets_service.update_sheet_permissions(
-                        file_id=copied_sheet_id, 
-                        make_editable=True
-                    )
-                    
-                    print(f"🔍 Public result: {public_result}")
-                    
-                    if public_result['success']:
-                        # Update the class record with the new sheet information
-                        class_record.google_sheet_id = copied_sheet_id
-                        class_record.google_sheet_url = copied_file_info.get('webViewLink')
-                        class_record.save()
-                        
-                        print(f"✅ Google Sheet created in user's Drive and made publicly editable successfully!")
-                        print(f"   Sheet ID: {copied_sheet_id}")
-                        print(f"   View URL: {copied_file_info.get('webViewLink')}")
-                        print(f"   Embed URL: {copied_file_info.get('embedLink')}")
-                        print(f"   File owner: User ({self.request.user.email})")
-                        print(f"   Permissions: Anyone with link can edit")
-                    else:
-                        print(f"⚠️ Sheet created in user's Drive but failed to make publicly editable: {public_result.get('error', 'Unknown error')}")
-                        print(f"   Details: {public_result.get('details', 'No details provided')}")
-                        print(f"   Sheet may be view-only in embedded mode but user has full access")
-                        
-                        # Still save with user access
-                        class_record.google_sheet_id = copied_sheet_id
-                        class_record.google_sheet_url = copied_file_info.get('webViewLink')
-                        class_record.save()
-                else:
-                    print(f"❌ Failed to copy Google Sheet template to user's Drive: {copy_result.get('error', 'Unknown error')}")
-                    print(f"   Details: {copy_result.get('details', 'No details provided')}")
-                    print(f"   Make sure the template is accessible to the user or publicly readable")
-            else:
-                print("❌ No Google Sheets template ID configured in settings.")
-                
-        except Exception as e:
-            print(f"❌ Error during Google Sheets user operation: {str(e)}")
-            import traceback
-            print(f"   Full traceback: {traceback.format_exc()}")
-            # Don't re-raise - allow ClassRecord creation to succeed even if Google Sheets fails
-            print("📝 ClassRecord created successfully, but Google Sheets integration failed.")
+        # Check for user's Google access token
+        access_token = self.request.headers.get('X-Google-Access-Token')
+        template_id = getattr(settings, 'GOOGLE_SHEETS_TEMPLATE_ID', None)
+        provision = bool(access_token and template_id)
+
+        # Save the class record initially without Google Sheet details
+        # Ensure google_sheet_url is explicitly set to None to avoid constraint issues
+        class_record = serializer.save(
+            user=self.request.user,
+            google_sheet_id=None,
+            google_sheet_url=None,
+            sheet_status=ClassRecord.SHEET_PROVISIONING if provision else ClassRecord.SHEET_NONE,
+            sheet_status_updated_at=timezone.now() if provision else None
+        )
+
+        print(f"✅ ClassRecord created successfully: {class_record.id}")
+
+        if not access_token:
+            print("❌ No Google access token found in request headers. Skipping Google Sheets creation.")
+            print("   Please ensure the frontend sends the user's Google access token in the X-Google-Access-Token header.")
+            return
+        if not template_id:
+            print("❌ No Google Sheets template ID configured in settings.")
+            return
+
+        # 🔥 Copy the template in the background; clients poll sheet_status (or get a notification)
+        print(f"🔄 Provisioning Google Sheet for class record {class_record.id} in the background")
+        transaction.on_commit(lambda: provisioner.schedule(class_record.id, access_token))
 
     def perform_destroy(self, instance):
         """Extend the default destroy method to delete the Google Sheet."""
@@ -172,6 +115,48 @@ class ClassRecordViewSet(viewsets.ModelViewSet):
         print(f"✅ ClassRecord '{instance.id}' has been deleted from the database.")
         print("--- Exiting perform_destroy ---")
 
+    @action(detail=True, methods=['get'])
+    def sheet_status(self, request, pk=None):
+        """Provisioning state of the class record's Google Sheet"""
+        class_record = self.get_object()
+        # A record whose worker went away would otherwise stay 'provisioning' forever
+        provisioner.expire_stale(class_record)
+        return Response({
+            'sheet_status': class_record.sheet_status,
+            'sheet_status_error': class_record.sheet_status_error,
+            'google_sheet_id': class_record.google_sheet_id,
+            'google_sheet_url': class_record.google_sheet_url
+        })
+
+    @action(detail=True, methods=['post'])
+    def provision_sheet(self, request, pk=None):
+        """Start (or retry) copying the template sheet for a class record without one"""
+        class_record = self.get_object()
+
+        if class_record.google_sheet_id:
+            return Response({'error': 'Class record already has a Google Sheet'}, status=status.HTTP_400_BAD_REQUEST)
+
+        access_token = request.headers.get('X-Google-Access-Token')
+        if not access_token:
+            return Response({'error': 'X-Google-Access-Token header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not getattr(settings, 'GOOGLE_SHEETS_TEMPLATE_ID', None):
+            return Response({'error': 'No Google Sheets template ID configured'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Claim the record with a conditional update, so two requests can't both start a copy
+        provisioner.expire_stale(class_record)
+        claimed = ClassRecord.objects.filter(id=class_record.id, google_sheet_id__isnull=True).exclude(
+            sheet_status=ClassRecord.SHEET_PROVISIONING
+        ).update(
+            sheet_status=ClassRecord.SHEET_PROVISIONING,
+            sheet_status_error='',
+            sheet_status_updated_at=timezone.now()
+        )
+        if not claimed:
+            return Response({'error': 'Google Sheet is already being created'}, status=status.HTTP_409_CONFLICT)
+        provisioner.schedule(class_record.id, access_token)
+
+        return Response({'sheet_status': ClassRecord.SHEET_PROVISIONING}, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['post'])
     def save_spreadsheet(self, request, pk=None):
         """Save spreadsheet data"""
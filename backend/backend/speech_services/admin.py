@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import LearnedPhrase, SpeechCorrection
+
+
+@admin.register(SpeechCorrection)
+class SpeechCorrectionAdmin(admin.ModelAdmin):
+    list_display = ('original', 'corrected', 'user', 'correction_type', 'confidence', 'created_at')
+    list_filter = ('correction_type',)
+    search_fields = ('original', 'corrected', 'student_name')
+
+
+@admin.register(LearnedPhrase)
+class LearnedPhraseAdmin(admin.ModelAdmin):
+    list_display = ('original_key', 'corrected_key', 'user', 'count', 'last_seen')
+    search_fields = ('original_key', 'corrected_key')
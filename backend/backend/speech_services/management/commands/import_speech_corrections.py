@@ -0,0 +1,69 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from speech_services.models import SpeechCorrection
+from speech_services.utils import SpeechRecognitionTracker
+
+
+class Command(BaseCommand):
+    help = 'Imports the old speech_corrections.json log into SpeechCorrection rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=os.path.join(settings.BASE_DIR, 'speech_corrections.json'),
+                            help='Path of the JSON log (defaults to BASE_DIR/speech_corrections.json)')
+        parser.add_argument('--user', help='Email of the teacher the corrections belong to; shared by everyone if omitted')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        with open(path, 'r') as f:
+            entries = json.load(f)
+
+        # Running the import twice doesn't duplicate rows
+        existing = set(
+            SpeechCorrection.objects.filter(user=user).values_list('original', 'corrected', 'created_at')
+        )
+
+        corrections = []
+        skipped = 0
+        for entry in entries:
+            original = entry.get('original')
+            corrected = entry.get('corrected')
+            created_at = parse_datetime(entry.get('timestamp') or '')
+            if original is None or corrected is None or created_at is None:
+                skipped += 1
+                continue
+            if (original, corrected, created_at) in existing:
+                skipped += 1
+                continue
+
+            corrections.append(SpeechCorrection(
+                user=user,
+                original=original,
+                original_key=SpeechCorrection.normalize(original),
+                corrected=corrected,
+                student_name=entry.get('student_name'),
+                confidence=entry.get('confidence'),
+                correction_type=entry.get('correction_type') or SpeechCorrection.AUTOMATIC,
+                created_at=created_at
+            ))
+
+        SpeechCorrection.objects.bulk_create(corrections, batch_size=500)
+        SpeechRecognitionTracker(user).record_learned(corrections)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {len(corrections)} corrections from {path} ({skipped} skipped)'
+        ))
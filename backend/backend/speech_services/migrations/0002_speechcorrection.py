@@ -0,0 +1,38 @@
+# Generated by Django 3.2.8 on 2026-10-18 03:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('speech_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeechCorrection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.TextField()),
+                ('original_key', models.CharField(max_length=255)),
+                ('corrected', models.TextField()),
+                ('student_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('correction_type', models.CharField(choices=[('automatic', 'Automatic'), ('manual', 'Manual')], default='automatic', max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='speech_corrections', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='speechcorrection',
+            index=models.Index(fields=['user', 'original_key'], name='speech_corr_user_orig_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.8 on 2026-10-18 03:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def learn_existing_corrections(apps, schema_editor):
+    SpeechCorrection = apps.get_model('speech_services', 'SpeechCorrection')
+    LearnedPhrase = apps.get_model('speech_services', 'LearnedPhrase')
+
+    pairs = {}
+    rows = SpeechCorrection.objects.values_list('user_id', 'original_key', 'corrected', 'created_at')
+    for user_id, original, corrected, created_at in rows.iterator():
+        corrected = (corrected or '').strip().lower()[:255]
+        if not original or original == corrected:
+            continue
+        count, last_seen = pairs.get((user_id, original, corrected), (0, created_at))
+        pairs[(user_id, original, corrected)] = (count + 1, max(last_seen, created_at))
+
+    LearnedPhrase.objects.bulk_create([
+        LearnedPhrase(user_id=user_id, original_key=original, corrected_key=corrected,
+                      count=count, last_seen=last_seen)
+        for (user_id, original, corrected), (count, last_seen) in pairs.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('speech_services', '0002_speechcorrection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearnedPhrase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_key', models.CharField(max_length=255)),
+                ('corrected_key', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='learned_phrases', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='learnedphrase',
+            constraint=models.UniqueConstraint(fields=('user', 'original_key', 'corrected_key'), name='learned_phrase_unique_pair'),
+        ),
+        migrations.RunPython(learn_existing_corrections, migrations.RunPython.noop),
+    ]
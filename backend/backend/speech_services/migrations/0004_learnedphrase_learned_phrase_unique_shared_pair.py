@@ -0,0 +1,37 @@
+# Generated by Django 3.2.8 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def merge_duplicate_shared_pairs(apps, schema_editor):
+    LearnedPhrase = apps.get_model('speech_services', 'LearnedPhrase')
+
+    kept = {}
+    duplicates = []
+    for phrase in LearnedPhrase.objects.filter(user__isnull=True).order_by('id').iterator():
+        key = (phrase.original_key, phrase.corrected_key)
+        first = kept.get(key)
+        if first is None:
+            kept[key] = phrase
+            continue
+        first.count += phrase.count
+        first.last_seen = max(first.last_seen, phrase.last_seen)
+        first.save(update_fields=['count', 'last_seen'])
+        duplicates.append(phrase.id)
+
+    LearnedPhrase.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('speech_services', '0003_learnedphrase'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_shared_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='learnedphrase',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('original_key', 'corrected_key'), name='learned_phrase_unique_shared_pair'),
+        ),
+    ]
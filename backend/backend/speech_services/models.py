@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class TranscriptionUsage(models.Model):
@@ -9,4 +10,67 @@ class TranscriptionUsage(models.Model):
 
     class Meta:
         verbose_name = "Transcription Usage"
-        verbose_name_plural = "Transcription Usage"
\ No newline at end of file
+        verbose_name_plural = "Transcription Usage"
+
+class SpeechCorrection(models.Model):
+    """
+    A transcript that was corrected, automatically (fuzzy name matching) or by
+    the teacher. Learned phrases for recognition are built from these, per teacher.
+    """
+    AUTOMATIC = 'automatic'
+    MANUAL = 'manual'
+    CORRECTION_TYPE_CHOICES = [
+        (AUTOMATIC, 'Automatic'),
+        (MANUAL, 'Manual'),
+    ]
+
+    # Null for corrections imported from the old shared log; those apply to every teacher
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='speech_corrections')
+    original = models.TextField()
+    # Lowercased original, for lookups by what was heard
+    original_key = models.CharField(max_length=255)
+    corrected = models.TextField()
+    student_name = models.CharField(max_length=255, blank=True, null=True)
+    confidence = models.FloatField(null=True, blank=True)
+    correction_type = models.CharField(max_length=20, choices=CORRECTION_TYPE_CHOICES, default=AUTOMATIC)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'original_key'], name='speech_corr_user_orig_idx'),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"'{self.original}' -> '{self.corrected}'"
+
+    @staticmethod
+    def normalize(phrase):
+        return (phrase or '').strip().lower()[:255]
+
+
+class LearnedPhrase(models.Model):
+    """
+    Running total of one (heard, corrected) pair for a teacher, updated as
+    corrections are logged. Recognition reads the top pairs from here instead
+    of grouping the whole correction history.
+    """
+    # Null for pairs learned from shared corrections
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='learned_phrases')
+    original_key = models.CharField(max_length=255)
+    corrected_key = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'original_key', 'corrected_key'], name='learned_phrase_unique_pair'),
+            # NULLs never conflict in the constraint above, so shared pairs need their own
+            models.UniqueConstraint(fields=['original_key', 'corrected_key'], condition=models.Q(user__isnull=True),
+                                    name='learned_phrase_unique_shared_pair'),
+        ]
+
+    def __str__(self):
+        return f"'{self.original_key}' -> '{self.corrected_key}' ({self.count})"
@@ -4,6 +4,11 @@ class TranscriptionRequestSerializer(serializers.Serializer):
     audio_file = serializers.FileField(required=True)
     language = serializers.CharField(required=False, allow_null=True, allow_blank=True)
 
+class BatchTranscriptionRequestSerializer(serializers.Serializer):
+    audio_files = serializers.ListField(child=serializers.FileField(), allow_empty=False)
+    language = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    student_names = serializers.CharField(required=False, allow_blank=True)
+
 class TranscriptionResponseSerializer(serializers.Serializer):
     text = serializers.CharField()
     success = serializers.BooleanField()
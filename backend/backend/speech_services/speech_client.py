@@ -0,0 +1,179 @@
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from google.cloud import speech
+from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+
+from utils.concurrent_fetch import ConcurrentFetcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # gRPC channels per worker; each multiplexes many concurrent calls
+    'CHANNELS': 1,
+    # Keep idle channels open between voice commands
+    'KEEPALIVE_TIME_MS': 30000,
+    'KEEPALIVE_TIMEOUT_MS': 10000,
+    # Recognition configs kept, one per (language, roster, learned phrases)
+    'MAX_CONFIGS': 128,
+    # Clips of a batch transcribed at the same time, and the time budget of a batch
+    'BATCH_WORKERS': 40,
+    'BATCH_DEADLINE_SECONDS': 90,
+    'BATCH_MAX_CLIPS': 100,
+    # Budget of the learned-phrase context, well inside Google's per-request limits
+    # (5,000 phrases and 100,000 characters across all contexts)
+    'LEARNED_MAX_PHRASES': 500,
+    'LEARNED_MAX_CHARACTERS': 10000,
+}
+
+
+class SpeechClientPool:
+    """
+    Long-lived Speech-to-Text clients for the worker process.
+
+    speech.SpeechClient() builds a gRPC channel and loads credentials, which is
+    most of the latency of a short voice command; here each channel is built once
+    per worker (rebuilt after a fork) with keep-alive pings so it stays usable
+    between commands. gRPC clients are thread-safe, so threads share them;
+    with several channels, calls are spread round-robin.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._cycle = None
+        self._pid = None
+        self._metrics = {
+            'channels_built': 0,
+            'channel_setup_ms': 0.0,
+            'clients_reused': 0,
+            'recognize_calls': 0,
+            'config_ms': 0.0,
+            'recognize_ms': 0.0,
+        }
+
+    def _build_client(self) -> speech.SpeechClient:
+        channel = SpeechGrpcTransport.create_channel(
+            options=[
+                ('grpc.max_send_message_length', -1),
+                ('grpc.max_receive_message_length', -1),
+                ('grpc.keepalive_time_ms', self.config['KEEPALIVE_TIME_MS']),
+                ('grpc.keepalive_timeout_ms', self.config['KEEPALIVE_TIMEOUT_MS']),
+                ('grpc.keepalive_permit_without_calls', 1),
+                ('grpc.http2.max_pings_without_data', 0),
+            ]
+        )
+        return speech.SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+
+    def get_client(self) -> Tuple[speech.SpeechClient, float]:
+        """
+        Get a shared client.
+
+        Returns:
+            Tuple of (client, milliseconds spent setting up a channel, 0 when reused)
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Channels don't survive a fork; start over in the child
+                self._clients = []
+                self._pid = os.getpid()
+
+            if len(self._clients) < self.config['CHANNELS']:
+                started = time.perf_counter()
+                self._clients.append(self._build_client())
+                self._cycle = itertools.cycle(list(self._clients))
+                setup_ms = (time.perf_counter() - started) * 1000
+
+                self._metrics['channels_built'] += 1
+                self._metrics['channel_setup_ms'] += setup_ms
+                logger.info(f"Built Speech-to-Text channel for worker {os.getpid()} in {setup_ms:.1f} ms")
+                return self._clients[-1], setup_ms
+
+            self._metrics['clients_reused'] += 1
+            return next(self._cycle), 0.0
+
+    def record_call(self, timings: Dict):
+        """Add the config build and recognize latency of a transcription."""
+        with self._lock:
+            self._metrics['recognize_calls'] += 1
+            self._metrics['config_ms'] += timings.get('config_ms', 0.0)
+            self._metrics['recognize_ms'] += timings.get('recognize_ms', 0.0)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['channels'] = len(self._clients)
+        calls = metrics['recognize_calls']
+        metrics['channel_setup_ms'] = round(metrics['channel_setup_ms'], 1)
+        metrics['avg_config_ms'] = round(metrics.pop('config_ms') / calls, 1) if calls else 0.0
+        metrics['avg_recognize_ms'] = round(metrics.pop('recognize_ms') / calls, 1) if calls else 0.0
+        return metrics
+
+
+class RecognitionConfigCache:
+    """
+    RecognitionConfig objects memoized per (language, student roster, learned
+    phrases). Building one means building every SpeechContext, including the
+    numbers 0-100 and each student's name variants; a roster rarely changes
+    between voice commands, so it is built once and reused.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+        }
+
+    @staticmethod
+    def roster_key(student_names) -> str:
+        return hashlib.sha1('\n'.join(student_names or []).encode('utf-8')).hexdigest()
+
+    def get(self, key: Tuple, factory: Callable) -> speech.RecognitionConfig:
+        with self._lock:
+            config = self._entries.get(key)
+            if config is not None:
+                self._entries.move_to_end(key)
+                self._metrics['hits'] += 1
+                return config
+
+        # Built outside the lock; two threads may both build the same config, which is harmless
+        config = factory()
+        with self._lock:
+            self._entries[key] = config
+            self._metrics['misses'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return config
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['entries'] = len(self._entries)
+        return metrics
+
+
+def _load_config() -> Dict:
+    return getattr(settings, 'SPEECH_CLIENT', {})
+
+
+client_pool = SpeechClientPool(_load_config())
+config_cache = RecognitionConfigCache(client_pool.config['MAX_CONFIGS'])
+# Separate from the Sheets fan-out pool, whose per-host limit is sized for Sheets quotas
+batch_fetcher = ConcurrentFetcher({
+    'MAX_WORKERS': client_pool.config['BATCH_WORKERS'],
+    'PER_HOST_LIMIT': client_pool.config['BATCH_WORKERS'],
+    'DEFAULT_DEADLINE_SECONDS': client_pool.config['BATCH_DEADLINE_SECONDS'],
+})
@@ -0,0 +1,273 @@
+import logging
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from google.cloud import speech
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Bytes read from the request body at a time; about 250 ms of 32 kbps Opus
+    'CHUNK_BYTES': 1024,
+    # Google ends a recognition stream after about 5 minutes of audio
+    'MAX_STREAM_SECONDS': 290,
+    # latest_short stops listening after the first utterance
+    'MODEL': 'latest_long',
+}
+
+# "Name Score", allowing the punctuation automatic punctuation adds ("John, 95.")
+SCORE_UTTERANCE_PATTERN = re.compile(r'^(?P<name>.*?[^\s,:-])[\s,:-]+(?P<score>\d+(?:\.\d+)?)[\s.!?]*$')
+
+
+def parse_score_utterance(transcript: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a "Name Score" utterance.
+
+    Returns:
+        Tuple of (student name, score), or None if the utterance doesn't end with a score
+    """
+    match = SCORE_UTTERANCE_PATTERN.match((transcript or '').strip())
+    if match is None:
+        return None
+    return match.group('name').strip(' .,'), match.group('score')
+
+
+def iter_request_body(request, chunk_size: int = None) -> Iterator[bytes]:
+    """
+    Chunks of a request body as they arrive, including chunked (Transfer-Encoding)
+    uploads, so audio can be recognized while it is still being recorded.
+
+    Args:
+        request: Django HttpRequest whose body hasn't been read
+        chunk_size: Bytes per read, CHUNK_BYTES by default
+    """
+    chunk_size = chunk_size or _load_config().get('CHUNK_BYTES', DEFAULT_CONFIG['CHUNK_BYTES'])
+    meta = request.META
+    if not meta.get('CONTENT_LENGTH') and meta.get('wsgi.input_terminated'):
+        # Django only reads up to CONTENT_LENGTH, which chunked uploads don't send
+        stream = meta['wsgi.input']
+    else:
+        stream = request
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamingTranscription:
+    """
+    One continuous voice grading session over streaming_recognize.
+
+    Audio is sent to Google as it arrives and events() yields interim results
+    while the teacher speaks. Google marks the end of each utterance with a final
+    result; that utterance is post-processed (smart selection, fuzzy name
+    matching) and, when a sheet and column are given, its "Name Score" is queued
+    in the sheet write buffer on a separate thread, so recognition of the next
+    utterance isn't held up by it. When the audio ends, the pending utterances are
+    finished and the buffer is flushed.
+
+    Events are dicts with a 'type':
+        interim: text recognized so far for the current utterance
+        final: a finished utterance, with the write ack when one was queued
+        done: end of the stream, with the flush acks and timings
+        error: the stream failed; finals already sent stand
+    """
+
+    def __init__(self, audio_chunks: Iterable[bytes], language: str = None, student_names: List[str] = None,
+                 sheet_id: str = None, column_name: str = None, sheet_name: str = None,
+                 user=None, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(_load_config())
+        if config:
+            self.config.update(config)
+        self.audio_chunks = audio_chunks
+        self.language = language
+        self.student_names = student_names
+        self.sheet_id = sheet_id
+        self.column_name = column_name
+        self.sheet_name = sheet_name
+        self.user = user
+
+        self.audio_bytes = 0
+        self.utterances = 0
+        self._sheets = None
+        self._closed = False
+        self._started = None
+        self._audio_ended = None
+        self._last_final = None
+
+    def _requests(self) -> Iterator[speech.StreamingRecognizeRequest]:
+        # Consumed by gRPC on its own thread while events() reads the responses
+        try:
+            for chunk in self.audio_chunks:
+                if self._closed:
+                    return
+                self.audio_bytes += len(chunk)
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+                if time.perf_counter() - self._started > self.config['MAX_STREAM_SECONDS']:
+                    logger.warning(f"Ending speech stream after {self.config['MAX_STREAM_SECONDS']}s of audio")
+                    return
+        finally:
+            self._audio_ended = time.perf_counter()
+
+    def events(self) -> Iterator[Dict]:
+        from .speech_client import client_pool
+        from .utils import get_recognition_config
+
+        self._started = time.perf_counter()
+        timings = {}
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speech-utterances')
+        pending = deque()
+        responses = None
+        error = None
+
+        try:
+            try:
+                client, channel_ms = client_pool.get_client()
+                timings['channel_setup_ms'] = round(channel_ms, 1)
+
+                started = time.perf_counter()
+                config = get_recognition_config(
+                    self.language, self.student_names, model=self.config['MODEL'], user=self.user
+                )
+                streaming_config = speech.StreamingRecognitionConfig(config=config, interim_results=True)
+                timings['config_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+                responses = client.streaming_recognize(
+                    streaming_config, self._requests(), timeout=self.config['MAX_STREAM_SECONDS'] + 30
+                )
+                for response in responses:
+                    if 'first_result_ms' not in timings and response.results:
+                        timings['first_result_ms'] = round((time.perf_counter() - self._started) * 1000, 1)
+
+                    for result in response.results:
+                        if not result.alternatives:
+                            continue
+                        if result.is_final:
+                            self.utterances += 1
+                            self._last_final = time.perf_counter()
+                            alternatives = [
+                                {'transcript': alternative.transcript.strip(), 'confidence': alternative.confidence}
+                                for alternative in result.alternatives
+                            ]
+                            pending.append(executor.submit(self._finish_utterance, self.utterances, alternatives))
+                        else:
+                            yield {
+                                'type': 'interim',
+                                'text': result.alternatives[0].transcript.strip(),
+                                'stability': round(result.stability, 3)
+                            }
+
+                    # Send utterances as soon as they are finished, in order
+                    while pending and pending[0].done():
+                        yield pending.popleft().result()
+
+            except Exception as e:
+                logger.error(f"Streaming recognition failed: {str(e)}")
+                error = f"Google Speech-to-Text error: {str(e)}"
+
+            while pending:
+                yield pending.popleft().result()
+
+            flush = None
+            if self.sheet_id and self.column_name:
+                flush = executor.submit(self._flush).result()
+
+            if self._audio_ended and self._last_final and self._last_final > self._audio_ended:
+                timings['final_after_audio_end_ms'] = round((self._last_final - self._audio_ended) * 1000, 1)
+            timings['total_ms'] = round((time.perf_counter() - self._started) * 1000, 1)
+            print(f"⏱️ Speech stream: {self.utterances} utterances, {self.audio_bytes} bytes, timings {timings}")
+
+            if error:
+                yield {'type': 'error', 'success': False, 'error': error, 'flush': flush, 'timings': timings}
+            else:
+                yield {
+                    'type': 'done',
+                    'success': True,
+                    'utterances': self.utterances,
+                    'flush': flush,
+                    'timings': timings
+                }
+
+        finally:
+            # Also reached when the client goes away mid-stream
+            self._closed = True
+            if responses is not None and hasattr(responses, 'cancel'):
+                responses.cancel()
+            # Corrections are saved from the utterance thread; don't leave its DB connection open.
+            # connection is resolved per thread, so it must be looked up on that thread
+            executor.submit(lambda: connection.close())
+            executor.shutdown(wait=False)
+
+    def _finish_utterance(self, utterance: int, alternatives: List[Dict]) -> Dict:
+        from .utils import SpeechRecognitionTracker, post_process_transcript, smart_transcript_selection
+
+        started = time.perf_counter()
+        try:
+            transcript = smart_transcript_selection(alternatives, self.student_names)
+            confidence = max(alternative['confidence'] for alternative in alternatives)
+
+            text = transcript
+            if transcript and self.student_names:
+                text = post_process_transcript(transcript, self.student_names)
+                if text != transcript:
+                    SpeechRecognitionTracker(self.user).log_correction(transcript, text, confidence=confidence)
+
+            event = {
+                'type': 'final',
+                'success': bool(text),
+                'utterance': utterance,
+                'text': text,
+                'raw_text': transcript,
+                'confidence': confidence,
+                'alternatives': alternatives
+            }
+
+            if text and self.sheet_id and self.column_name:
+                parsed = parse_score_utterance(text)
+                if parsed is None:
+                    event['write'] = {'success': False, 'error': 'Utterance is not "Name Score"'}
+                else:
+                    event['student_name'], event['score'] = parsed
+                    event['write'] = self._get_sheets().queue_cell_update(
+                        self.sheet_id, None, self.column_name, event['score'], self.sheet_name,
+                        student_name=event['student_name']
+                    )
+
+        except Exception as e:
+            logger.error(f"Finishing utterance {utterance} failed: {str(e)}")
+            event = {
+                'type': 'final',
+                'success': False,
+                'utterance': utterance,
+                'alternatives': alternatives,
+                'error': str(e)
+            }
+
+        event['finish_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return event
+
+    def _get_sheets(self):
+        # Only used from the utterance thread, which gets its own Google clients
+        if self._sheets is None:
+            from utils.google_service_account_sheets import GoogleServiceAccountSheets
+            self._sheets = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+        return self._sheets
+
+    def _flush(self) -> Dict:
+        try:
+            return self._get_sheets().flush_cell_updates(self.sheet_id)
+        except Exception as e:
+            logger.error(f"Flushing streamed scores failed: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+
+def _load_config() -> Dict:
+    return getattr(settings, 'SPEECH_STREAMING', {})
@@ -1,3 +1,88 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from .models import LearnedPhrase, SpeechCorrection
+from .utils import SpeechRecognitionTracker
+
+
+class SpeechRecognitionTrackerTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        self.other_teacher = User.objects.create(username='other', email='other@example.com')
+
+    def test_corrections_are_per_teacher(self):
+        SpeechRecognitionTracker(self.teacher).log_correction('Jon 95', 'John 95')
+
+        self.assertEqual(SpeechRecognitionTracker(self.teacher).get_common_mistakes(), {'jon 95': ['john 95']})
+        self.assertEqual(SpeechRecognitionTracker(self.other_teacher).get_common_mistakes(), {})
+
+    def test_shared_corrections_apply_to_every_teacher(self):
+        SpeechRecognitionTracker().log_correction('bikada 90', 'Bicada 90')
+
+        self.assertEqual(
+            SpeechRecognitionTracker(self.other_teacher).get_improved_speech_contexts(),
+            ['bikada 90', 'bicada 90']
+        )
+
+    def test_repeated_corrections_are_grouped(self):
+        tracker = SpeechRecognitionTracker(self.teacher)
+        for _ in range(3):
+            tracker.log_correction('Jon 95', 'John 95')
+
+        self.assertEqual(tracker.get_improved_speech_contexts(), ['jon 95', 'john 95'])
+        self.assertEqual(tracker.get_corrections_for('JON 95'), ['John 95'])
+
+    def test_unsaved_corrections_are_written_together(self):
+        tracker = SpeechRecognitionTracker(self.teacher)
+        version = tracker.get_version()
+        tracker.log_correction('Jon 1', 'John 1', save=False)
+        tracker.log_correction('Mery 2', 'Mary 2', save=False)
+
+        self.assertEqual(SpeechCorrection.objects.count(), 0)
+        tracker.save_error_log()
+        self.assertEqual(SpeechCorrection.objects.filter(user=self.teacher).count(), 2)
+        self.assertNotEqual(tracker.get_version(), version)
+
+    def test_learned_phrases_ranked_by_frequency(self):
+        tracker = SpeechRecognitionTracker(self.teacher)
+        tracker.log_correction('Mery 80', 'Mary 80')
+        for _ in range(2):
+            tracker.log_correction('Jon 95', 'John 95')
+
+        self.assertEqual(LearnedPhrase.objects.get(original_key='jon 95').count, 2)
+        self.assertEqual(tracker.get_improved_speech_contexts(), ['jon 95', 'john 95', 'mery 80', 'mary 80'])
+
+    def test_learned_phrases_respect_budget(self):
+        tracker = SpeechRecognitionTracker(self.teacher)
+        tracker.log_correction('Jon 95', 'John 95')
+        tracker.log_correction('Mery 80', 'Mary 80')
+        tracker.log_correction('x' * 150, 'Peter 70')
+
+        self.assertEqual(len(tracker.get_improved_speech_contexts(max_phrases=3)), 3)
+        # Equal counts: the most recent pair comes first
+        self.assertEqual(tracker.get_improved_speech_contexts(max_characters=16), ['peter 70', 'mery 80'])
+        self.assertNotIn('x' * 150, tracker.get_improved_speech_contexts())
+
+    def test_shared_pairs_are_one_row(self):
+        tracker = SpeechRecognitionTracker()
+        for _ in range(2):
+            tracker.log_correction('bikada 90', 'Bicada 90')
+
+        self.assertEqual(LearnedPhrase.objects.get(user__isnull=True, original_key='bikada 90').count, 2)
+
+    def test_last_seen_never_moves_back(self):
+        tracker = SpeechRecognitionTracker(self.teacher)
+        tracker.log_correction('Jon 95', 'John 95')
+        latest = LearnedPhrase.objects.get(original_key='jon 95').last_seen
+
+        older = SpeechCorrection(user=self.teacher, original='Jon 95', corrected='John 95',
+                                 created_at=latest - timedelta(hours=1))
+        older.original_key = SpeechCorrection.normalize(older.original)
+        tracker.record_learned([older])
+
+        phrase = LearnedPhrase.objects.get(original_key='jon 95')
+        self.assertEqual(phrase.count, 2)
+        self.assertEqual(phrase.last_seen, latest)
@@ -1,14 +1,17 @@
-import os
+import hashlib
 import tempfile
 import io
 import re
+import threading
+import time
+from collections import OrderedDict
 import numpy as np
 from scipy import signal
 from fuzzywuzzy import fuzz
 from google.cloud import speech
-from django.conf import settings
-from django.utils import timezone
-import json
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateTimeField, F, Max, Q, Value
+from django.db.models.functions import Greatest
 
 
 # 🎯 NEW: Audio Preprocessing for Noisy Environments
@@ -57,6 +60,62 @@ def preprocess_audio(audio_bytes):
         return audio_bytes  # Return original if preprocessing fails
 
 
+# Phonetic variations for common misheard names/words
+PHONETIC_VARIATIONS = {
+    # Common name mishearings
+    "Owen": ["Omen", "Owin", "Open", "Ocean", "Owing"],
+    "Ethan": ["Eathan", "Nathan", "Even", "Ivan", "Eden"],
+    "Aaron": ["Erin", "Aren", "Iron", "Adam", "Arron"],
+    "Ian": ["Eon", "Ion", "Ann", "Yan"],
+    "Zaki": ["Zacky", "Saki", "Jackie", "Rocky"],
+    "Jake": ["Jack", "Zach", "Take", "Shake"],
+
+    # Add patterns for names ending in certain sounds
+    "bikada": ["because of the", "because", "because da", "be cada", "picked up"],
+    "mikael": ["Michael", "me call", "my call", "make all"],
+    "rafael": ["refill", "ref fell", "raphael"],
+
+    # Common classroom words that might interfere
+    "attendance": ["a tendance", "at tendance"],
+    "present": ["present", "president"],
+    "absent": ["ab sent", "have sent"],
+}
+
+# Base context with common names and numbers
+BASE_PHRASES = (
+    # Common student names that might be misheard
+    "Omen", "Owen", "Ethan", "Aaron", "Aiden", "Ian", "Adam",
+    "Zaki", "Zach", "Jack", "Jake", "Zack", "bikada", "Bikada",
+    "John", "Jane", "James", "Jenny", "Jerry",
+    "Alex", "Alice", "Anna", "Amy", "Andy",
+    "Ben", "Beth", "Bill", "Bob", "Bella",
+    "Chris", "Claire", "Carl", "Cathy", "Cole",
+    "David", "Diana", "Dan", "Donna", "Drew",
+    # Numbers 0-100 (common score ranges)
+    *[str(i) for i in range(0, 101)],
+    # Score phrases
+    "fifty", "sixty", "seventy", "eighty", "ninety",
+    "zero", "ten", "twenty", "thirty", "forty",
+)
+
+# 🎯 NEW: Specific context for problematic name patterns
+PROBLEMATIC_PATTERNS = (
+    # Names that sound like common words
+    "bikada", "Bikada", "BIKADA",
+    "because of the", "because", "because da",  # Common mishearing of bikada
+
+    # Other common problematic names (add yours here)
+    "Omen", "Owen", "Ethan", "Aaron", "Aiden",
+    "Amen", "Alvin", "Evan", "Ivan", "Adam",
+)
+
+# Doesn't depend on the request, so it is built once
+_PROBLEMATIC_CONTEXT = speech.SpeechContext(
+    phrases=list(PROBLEMATIC_PATTERNS),
+    boost=30.0,  # Even higher boost for known problematic words
+)
+
+
 # 🎯 NEW: Enhanced Speech Contexts with Phonetic Variations
 def build_adaptive_contexts(student_names=None):
     """
@@ -65,48 +124,8 @@ def build_adaptive_contexts(student_names=None):
     """
     contexts = []
 
-    # Phonetic variations for common misheard names/words
-    phonetic_variations = {
-        # Common name mishearings
-        "Owen": ["Omen", "Owin", "Open", "Ocean", "Owing"],
-        "Ethan": ["Eathan", "Nathan", "Even", "Ivan", "Eden"],
-        "Aaron": ["Erin", "Aren", "Iron", "Adam", "Arron"],
-        "Ian": ["Eon", "Ion", "Ann", "Yan"],
-        "Zaki": ["Zacky", "Saki", "Jackie", "Rocky"],
-        "Jake": ["Jack", "Zach", "Take", "Shake"],
-
-        # Add patterns for names ending in certain sounds
-        "bikada": ["because of the", "because", "because da", "be cada", "picked up"],
-        "mikael": ["Michael", "me call", "my call", "make all"],
-        "rafael": ["refill", "ref fell", "raphael"],
-
-        # Common classroom words that might interfere
-        "attendance": ["a tendance", "at tendance"],
-        "present": ["present", "president"],
-        "absent": ["ab sent", "have sent"],
-    }
-
     # Build primary context with student names and their variations
-    primary_phrases = []
-
-    # Base context with common names and numbers
-    base_phrases = [
-        # Common student names that might be misheard
-        "Omen", "Owen", "Ethan", "Aaron", "Aiden", "Ian", "Adam",
-        "Zaki", "Zach", "Jack", "Jake", "Zack", "bikada", "Bikada",
-        "John", "Jane", "James", "Jenny", "Jerry",
-        "Alex", "Alice", "Anna", "Amy", "Andy",
-        "Ben", "Beth", "Bill", "Bob", "Bella",
-        "Chris", "Claire", "Carl", "Cathy", "Cole",
-        "David", "Diana", "Dan", "Donna", "Drew",
-        # Numbers 0-100 (common score ranges)
-        *[str(i) for i in range(0, 101)],
-        # Score phrases
-        "fifty", "sixty", "seventy", "eighty", "ninety",
-        "zero", "ten", "twenty", "thirty", "forty",
-    ]
-
-    primary_phrases.extend(base_phrases)
+    primary_phrases = list(BASE_PHRASES)
 
     # Add student names and their phonetic variations
     if student_names:
@@ -118,8 +137,8 @@ def build_adaptive_contexts(student_names=None):
 
             # Add phonetic variations if we know them
             name_lower = name.lower()
-            if name_lower in phonetic_variations:
-                primary_phrases.extend(phonetic_variations[name_lower])
+            if name_lower in PHONETIC_VARIATIONS:
+                primary_phrases.extend(PHONETIC_VARIATIONS[name_lower])
 
     # Create primary speech context with high boost
     contexts.append(
@@ -129,28 +148,43 @@ def build_adaptive_contexts(student_names=None):
         )
     )
 
-    # 🎯 NEW: Specific context for problematic name patterns
-    problematic_patterns = [
-        # Names that sound like common words
-        "bikada", "Bikada", "BIKADA",
-        "because of the", "because", "because da",  # Common mishearing of bikada
-
-        # Other common problematic names (add yours here)
-        "Omen", "Owen", "Ethan", "Aaron", "Aiden",
-        "Amen", "Alvin", "Evan", "Ivan", "Adam",
-    ]
-
-    contexts.append(
-        speech.SpeechContext(
-            phrases=problematic_patterns,
-            boost=30.0,  # Even higher boost for known problematic words
-        )
-    )
+    contexts.append(_PROBLEMATIC_CONTEXT)
 
     return contexts
 
 
 # 🎯 NEW: Post-processing with Fuzzy Matching
+# Lowest fuzzy score at which a spoken name is taken to be a roster entry
+NAME_MATCH_THRESHOLD = 60
+
+
+def match_student(name, student_names):
+    """
+    Roster entry closest to a spoken name
+
+    Scores each entry by the best of plain, partial (handles cases like
+    "because of the" -> "bikada") and token-order-insensitive similarity, so a
+    first name alone ("John") still matches "John Smith".
+
+    Returns:
+        Tuple of (student name, fuzzy score 0-100), or (None, best score) if nothing is close enough
+    """
+    best_name, best_score = None, 0
+    name = name.lower()
+    for student_name in student_names or []:
+        candidate = student_name.lower()
+        score = max(fuzz.ratio(name, candidate), fuzz.partial_ratio(name, candidate),
+                    fuzz.token_sort_ratio(name, candidate))
+
+        print(f"Fuzzy matching '{name}' vs '{student_name}': {score}%")
+
+        if score > best_score:
+            best_name, best_score = student_name, score
+    if best_score <= NAME_MATCH_THRESHOLD:
+        return None, best_score
+    return best_name, best_score
+
+
 def post_process_transcript(transcript, student_names=None):
     """
     Apply NLP-based corrections after transcription
@@ -171,25 +205,7 @@ def post_process_transcript(transcript, student_names=None):
         score_part = match.group(2)
 
         # 🎯 FUZZY MATCHING: Find closest student name
-        best_match = None
-        best_score = 0
-
-        for student_name in student_names:
-            # Calculate similarity
-            similarity = fuzz.ratio(name_part.lower(), student_name.lower())
-
-            # Also try partial matching (handles cases like "because of the" -> "bikada")
-            partial_similarity = fuzz.partial_ratio(name_part.lower(), student_name.lower())
-            token_similarity = fuzz.token_sort_ratio(name_part.lower(), student_name.lower())
-
-            # Take the best similarity score
-            max_similarity = max(similarity, partial_similarity, token_similarity)
-
-            print(f"Fuzzy matching '{name_part}' vs '{student_name}': {max_similarity}%")
-
-            if max_similarity > best_score and max_similarity > 60:  # 60% threshold
-                best_score = max_similarity
-                best_match = student_name
+        best_match, best_score = match_student(name_part, student_names)
 
         if best_match:
             corrected = f"{best_match} {score_part}"
@@ -212,95 +228,304 @@ def post_process_transcript(transcript, student_names=None):
     return transcript
 
 
+# Google rejects phrases longer than this
+MAX_PHRASE_CHARACTERS = 100
+
+
 # 🎯 NEW: Error Tracking and Learning System
 class SpeechRecognitionTracker:
     """
     Track errors and learn from corrections to improve over time
+    Corrections are SpeechCorrection rows kept per teacher (plus shared ones
+    with no teacher); nothing is loaded until it is asked for
     """
 
-    def __init__(self, log_file_path=None):
-        self.log_file_path = log_file_path or os.path.join(settings.BASE_DIR, 'speech_corrections.json')
-        self.error_log = self.load_error_log()
+    def __init__(self, user=None):
+        self.user = user if getattr(user, 'is_authenticated', False) else None
+        self.pending = []
 
-    def load_error_log(self):
-        """Load existing error log from file"""
-        try:
-            if os.path.exists(self.log_file_path):
-                with open(self.log_file_path, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading speech correction log: {e}")
-        return []
+    def _corrections(self):
+        """Corrections that apply to this teacher: their own and the shared ones"""
+        from .models import SpeechCorrection
 
-    def save_error_log(self):
-        """Save error log to file"""
-        try:
-            with open(self.log_file_path, 'w') as f:
-                json.dump(self.error_log, f, indent=2, default=str)
-        except Exception as e:
-            print(f"Error saving speech correction log: {e}")
+        if self.user is None:
+            return SpeechCorrection.objects.filter(user__isnull=True)
+        return SpeechCorrection.objects.filter(Q(user=self.user) | Q(user__isnull=True))
 
-    def log_correction(self, original_transcript, corrected_transcript, student_name=None, confidence=None):
+    def log_correction(self, original_transcript, corrected_transcript, student_name=None, confidence=None,
+                       save=True, correction_type=None):
         """
         Log when corrections are made (either automatic or manual)
+        Pass save=False to log several corrections and write them at once with save_error_log()
         """
-        correction_entry = {
-            'timestamp': timezone.now().isoformat(),
-            'original': original_transcript,
-            'corrected': corrected_transcript,
-            'student_name': student_name,
-            'confidence': confidence,
-            'correction_type': 'automatic' if original_transcript != corrected_transcript else 'manual'
-        }
+        from .models import SpeechCorrection
+
+        correction = SpeechCorrection(
+            user=self.user,
+            original=original_transcript,
+            original_key=SpeechCorrection.normalize(original_transcript),
+            corrected=corrected_transcript,
+            student_name=student_name,
+            confidence=confidence,
+            correction_type=correction_type or (
+                SpeechCorrection.AUTOMATIC if original_transcript != corrected_transcript else SpeechCorrection.MANUAL
+            )
+        )
 
-        self.error_log.append(correction_entry)
-        self.save_error_log()
+        if save:
+            try:
+                correction.save()
+                self.record_learned([correction])
+            except Exception as e:
+                print(f"Error saving speech correction: {e}")
+        else:
+            self.pending.append(correction)
 
         print(f"📝 Logged correction: '{original_transcript}' -> '{corrected_transcript}'")
+        return correction
+
+    def save_error_log(self):
+        """Write the corrections logged with save=False in one query"""
+        from .models import SpeechCorrection
+
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        try:
+            SpeechCorrection.objects.bulk_create(pending)
+            self.record_learned(pending)
+        except Exception as e:
+            print(f"Error saving speech corrections: {e}")
+
+    def record_learned(self, corrections):
+        """
+        Add saved corrections to this teacher's learned phrase counts
+        """
+        from .models import LearnedPhrase, SpeechCorrection
+
+        pairs = {}
+        for correction in corrections:
+            original = correction.original_key
+            corrected = SpeechCorrection.normalize(correction.corrected)
+            if not original or original == corrected:
+                continue
+            count, last_seen = pairs.get((original, corrected), (0, correction.created_at))
+            pairs[(original, corrected)] = (count + 1, max(last_seen, correction.created_at))
+
+        for (original, corrected), (count, last_seen) in pairs.items():
+            learned = LearnedPhrase.objects.filter(user=self.user, original_key=original, corrected_key=corrected)
+            # Batches can be saved out of order; last_seen never moves back
+            last_seen_update = Greatest(F('last_seen'), Value(last_seen, output_field=DateTimeField()))
+            if learned.update(count=F('count') + count, last_seen=last_seen_update):
+                continue
+            try:
+                with transaction.atomic():
+                    LearnedPhrase.objects.create(
+                        user=self.user, original_key=original, corrected_key=corrected,
+                        count=count, last_seen=last_seen
+                    )
+            except IntegrityError:
+                # Another worker added the pair first
+                learned.update(count=F('count') + count, last_seen=last_seen_update)
+
+    def _learned(self):
+        """Learned pairs that apply to this teacher: their own and the shared ones"""
+        from .models import LearnedPhrase
+
+        if self.user is None:
+            return LearnedPhrase.objects.filter(user__isnull=True)
+        return LearnedPhrase.objects.filter(Q(user=self.user) | Q(user__isnull=True))
+
+    def get_version(self):
+        """
+        Changes whenever a correction that applies to this teacher is learned
+        """
+        stats = self._learned().order_by().aggregate(count=Count('id'), latest=Max('last_seen'))
+        return stats['count'], stats['latest']
+
+    def get_corrections_for(self, phrase):
+        """
+        What a phrase heard by recognition was corrected to before (indexed lookup)
+        """
+        from .models import SpeechCorrection
+
+        return list(
+            self._corrections()
+            .filter(original_key=SpeechCorrection.normalize(phrase))
+            .order_by()
+            .values_list('corrected', flat=True)
+            .distinct()
+        )
 
     def get_common_mistakes(self):
         """
-        Analyze logged corrections to find common patterns
+        Analyze logged corrections to find common patterns, most frequent and recent first
         """
         mistakes = {}
-        for entry in self.error_log:
-            original = entry['original'].lower()
-            corrected = entry['corrected'].lower()
-
-            if original != corrected:
-                if original not in mistakes:
-                    mistakes[original] = []
-                mistakes[original].append(corrected)
+        for original, corrected in self._learned().order_by('-count', '-last_seen').values_list(
+                'original_key', 'corrected_key'):
+            corrections = mistakes.setdefault(original, [])
+            if corrected not in corrections:
+                corrections.append(corrected)
 
         return mistakes
 
-    def get_improved_speech_contexts(self):
+    def get_improved_speech_contexts(self, max_phrases=None, max_characters=None):
         """
         Generate improved speech contexts based on learned mistakes
+
+        Phrases are deduplicated and taken by frequency, then recency, until the
+        phrase or character budget (SPEECH_CLIENT LEARNED_MAX_*) is used up.
         """
-        common_mistakes = self.get_common_mistakes()
-        improved_phrases = []
+        from .speech_client import client_pool
 
-        for mistake, corrections in common_mistakes.items():
+        max_phrases = max_phrases or client_pool.config['LEARNED_MAX_PHRASES']
+        max_characters = max_characters or client_pool.config['LEARNED_MAX_CHARACTERS']
+
+        improved_phrases = {}
+        characters = 0
+        # Each pair adds at most two phrases; the shared pairs may repeat the teacher's
+        pairs = self._learned().order_by('-count', '-last_seen').values_list('original_key', 'corrected_key')
+        for original, corrected in pairs[:max_phrases * 2]:
             # Add both the mistake and corrections to help recognition
-            improved_phrases.append(mistake)
-            improved_phrases.extend(corrections)
+            for phrase in (original, corrected):
+                if phrase in improved_phrases or len(phrase) > MAX_PHRASE_CHARACTERS:
+                    continue
+                if len(improved_phrases) >= max_phrases or characters + len(phrase) > max_characters:
+                    return list(improved_phrases)
+                improved_phrases[phrase] = True
+                characters += len(phrase)
+
+        return list(improved_phrases)
+
+
+_learned_lock = threading.Lock()
+# Teacher id -> learned phrases, most recently used last
+_learned_states = OrderedDict()
+_MAX_LEARNED_STATES = 256
+
+
+def get_learned_phrases(user=None):
+    """
+    Phrases learned from a teacher's corrections, rebuilt only when their corrections change
 
-        return improved_phrases
+    Returns:
+        Tuple of (version of the learned phrases, learned phrases).
+        The version only changes when the phrases do, not on every logged correction.
+    """
+    tracker = SpeechRecognitionTracker(user)
+    key = tracker.user.pk if tracker.user else None
+
+    try:
+        stamp = tracker.get_version()
+        with _learned_lock:
+            state = _learned_states.get(key)
+            if state is not None and state['stamp'] == stamp:
+                _learned_states.move_to_end(key)
+                return state['version'], state['phrases']
+
+        phrases = tracker.get_improved_speech_contexts()
+    except Exception as e:
+        # Recognition still works without learned phrases
+        print(f"Error loading learned speech phrases: {e}")
+        return None, []
+
+    version = hashlib.sha1('\n'.join(phrases).encode('utf-8')).hexdigest()
+    with _learned_lock:
+        _learned_states[key] = {'stamp': stamp, 'version': version, 'phrases': phrases}
+        _learned_states.move_to_end(key)
+        while len(_learned_states) > _MAX_LEARNED_STATES:
+            _learned_states.popitem(last=False)
+    return version, phrases
+
+
+def build_recognition_config(language=None, student_names=None, learned_phrases=None, model="latest_short"):
+    """
+    Build the RecognitionConfig for a roster; get_recognition_config memoizes it per
+    (language, roster, learned phrases, model)
+    """
+    # 🎯 ENHANCED: Build adaptive speech contexts with phonetic variations
+    speech_contexts = build_adaptive_contexts(student_names)
+
+    # 🎯 NEW: Add learned corrections to speech contexts
+    if learned_phrases:
+        speech_contexts.append(
+            speech.SpeechContext(
+                phrases=learned_phrases,
+                boost=20.0,
+            )
+        )
+
+    # 🔧 FIXED: Configuration for WEBM OPUS audio
+    return speech.RecognitionConfig(
+        # 🔧 CHANGE: Use WEBM_OPUS encoding instead of LINEAR16
+        encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+        # 🔧 REMOVE: Don't specify sample_rate_hertz for WEBM_OPUS
+        # Google will auto-detect the rate from the WEBM header
+        # sample_rate_hertz=16000,  # Remove this line
+        language_code=language or "en-US",
+
+        # 🎯 ACCURACY IMPROVEMENTS
+        enable_automatic_punctuation=True,
+        enable_spoken_punctuation=False,
+        enable_spoken_emojis=False,
+        enable_word_time_offsets=True,
+        enable_word_confidence=True,
+
+        # 🎯 MODEL SELECTION
+        model=model,
+        use_enhanced=True,
+
+        # 🔧 REMOVE: Don't specify audio_channel_count for WEBM_OPUS
+        # Google will auto-detect from the WEBM header
+        # audio_channel_count=1,  # Remove this line
+        enable_separate_recognition_per_channel=False,
+
+        # 🎯 SPEECH CONTEXTS: Apply our enhanced contexts
+        speech_contexts=speech_contexts,
+
+        # 🎯 ALTERNATIVES: Get multiple alternatives
+        max_alternatives=5,
+
+        # 🎯 PROFANITY FILTER
+        profanity_filter=False,
+    )
+
+
+def get_recognition_config(language=None, student_names=None, model="latest_short", user=None):
+    """
+    Memoized RecognitionConfig; contexts for the same roster, language and learned
+    phrases are built once per worker
+    """
+    from .speech_client import config_cache
+
+    learned_version, learned_phrases = get_learned_phrases(user)
+    config_key = (language or "en-US", config_cache.roster_key(student_names), learned_version, model)
+    return config_cache.get(
+        config_key, lambda: build_recognition_config(language, student_names, learned_phrases, model)
+    )
 
 
 # 🎯 ENHANCED: Main transcription function with all improvements
-def transcribe_audio(audio_bytes, language=None, student_names=None, enable_preprocessing=True):
+def transcribe_audio(audio_bytes, language=None, student_names=None, enable_preprocessing=True, tracker=None,
+                     user=None, config=None):
     """
     Transcribe audio using Google Speech-to-Text API with enhanced accuracy
     Now includes: audio preprocessing, fuzzy matching, and error learning
+
+    The client (and its gRPC channel) is shared by the worker and the config is
+    memoized per roster; the time spent on each step is returned in 'timings'.
+    Learned phrases and logged corrections belong to the given teacher. When a
+    tracker is passed, corrections are logged to it without saving them; the
+    caller saves them. A config built by get_recognition_config may be passed in.
     """
-    try:
-        # Initialize the Google Speech client
-        client = speech.SpeechClient()
+    from .speech_client import client_pool
 
-        # Initialize error tracker
-        tracker = SpeechRecognitionTracker()
+    timings = {}
+    try:
+        # Shared Google Speech client; only the first call in a worker sets up the channel
+        client, channel_ms = client_pool.get_client()
+        timings['channel_setup_ms'] = round(channel_ms, 1)
 
         # Log the audio size for debugging
         audio_size = len(audio_bytes)
@@ -315,56 +540,20 @@ def transcribe_audio(audio_bytes, language=None, student_names=None, enable_prep
         # Create the audio content from bytes
         audio = speech.RecognitionAudio(content=audio_bytes)
 
-        # 🎯 ENHANCED: Build adaptive speech contexts with phonetic variations
-        speech_contexts = build_adaptive_contexts(student_names)
-
-        # 🎯 NEW: Add learned corrections to speech contexts
-        learned_phrases = tracker.get_improved_speech_contexts()
-        if learned_phrases:
-            speech_contexts.append(
-                speech.SpeechContext(
-                    phrases=learned_phrases,
-                    boost=20.0,
-                )
-            )
-
-        # 🔧 FIXED: Configuration for WEBM OPUS audio
-        config = speech.RecognitionConfig(
-            # 🔧 CHANGE: Use WEBM_OPUS encoding instead of LINEAR16
-            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            # 🔧 REMOVE: Don't specify sample_rate_hertz for WEBM_OPUS
-            # Google will auto-detect the rate from the WEBM header
-            # sample_rate_hertz=16000,  # Remove this line
-            language_code=language or "en-US",
-
-            # 🎯 ACCURACY IMPROVEMENTS
-            enable_automatic_punctuation=True,
-            enable_spoken_punctuation=False,
-            enable_spoken_emojis=False,
-            enable_word_time_offsets=True,
-            enable_word_confidence=True,
-
-            # 🎯 MODEL SELECTION
-            model="latest_short",
-            use_enhanced=True,
-
-            # 🔧 REMOVE: Don't specify audio_channel_count for WEBM_OPUS
-            # Google will auto-detect from the WEBM header
-            # audio_channel_count=1,  # Remove this line
-            enable_separate_recognition_per_channel=False,
-
-            # 🎯 SPEECH CONTEXTS: Apply our enhanced contexts
-            speech_contexts=speech_contexts,
-
-            # 🎯 ALTERNATIVES: Get multiple alternatives
-            max_alternatives=5,
-
-            # 🎯 PROFANITY FILTER
-            profanity_filter=False,
-        )
+        # Contexts for the same roster, language and learned phrases are built once
+        started = time.perf_counter()
+        if config is None:
+            config = get_recognition_config(language, student_names, user=user)
+        timings['config_ms'] = round((time.perf_counter() - started) * 1000, 1)
 
         # Perform the transcription
+        started = time.perf_counter()
         response = client.recognize(config=config, audio=audio)
+        timings['recognize_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        client_pool.record_call(timings)
+        print(f"⏱️ Speech timings: channel {timings['channel_setup_ms']} ms, "
+              f"config {timings['config_ms']} ms, recognize {timings['recognize_ms']} ms")
 
         # 🎯 ENHANCED: Process results with confidence analysis
         best_transcript = ""
@@ -405,17 +594,22 @@ def transcribe_audio(audio_bytes, language=None, student_names=None, enable_prep
         selected_transcript = smart_transcript_selection(alternatives_info, student_names)
 
         # 🎯 NEW: Apply post-processing with fuzzy matching
+        corrections_made = 0
         if selected_transcript and student_names:
             original_transcript = selected_transcript
             selected_transcript = post_process_transcript(selected_transcript, student_names)
 
             # Log if correction was made
             if original_transcript != selected_transcript:
+                save = tracker is None
+                tracker = tracker or SpeechRecognitionTracker(user)
                 tracker.log_correction(
                     original_transcript,
                     selected_transcript,
-                    confidence=highest_confidence
+                    confidence=highest_confidence,
+                    save=save
                 )
+                corrections_made = 1
 
         if selected_transcript:
             return {
@@ -424,14 +618,16 @@ def transcribe_audio(audio_bytes, language=None, student_names=None, enable_prep
                 "confidence": highest_confidence,
                 "alternatives": alternatives_info,
                 "preprocessing_applied": False,  # Changed to False since we skip it
-                "corrections_made": len(tracker.error_log)
+                "corrections_made": corrections_made,
+                "timings": timings
             }
         else:
             print("No speech detected in the audio")
             return {
                 "success": False,
                 "error": "No speech detected",
-                "alternatives": alternatives_info
+                "alternatives": alternatives_info,
+                "timings": timings
             }
 
     except Exception as e:
@@ -442,6 +638,69 @@ def transcribe_audio(audio_bytes, language=None, student_names=None, enable_prep
         }
 
 
+def transcribe_batch(clips, language=None, student_names=None, user=None):
+    """
+    Transcribe clips recorded against one roster (batch recordings) concurrently,
+    so a batch takes about as long as its slowest clip
+
+    The recognition config is built once for the whole batch and corrections
+    are saved together at the end.
+
+    Returns:
+        Dict with results in clip order, each with confidence and the matched student/score
+    """
+    from .speech_client import batch_fetcher, client_pool
+    from .streaming import parse_score_utterance
+
+    started = time.perf_counter()
+
+    # Built here once, so clips don't race each other to build it or query the database from pool threads
+    config = get_recognition_config(language, student_names, user=user)
+    tracker = SpeechRecognitionTracker(user)
+
+    tasks = {
+        index: (lambda audio=audio: transcribe_audio(
+            audio, language, student_names, tracker=tracker, user=user, config=config
+        ))
+        for index, audio in enumerate(clips)
+    }
+    fan_out = batch_fetcher.run(
+        tasks, host='speech.googleapis.com', deadline_seconds=client_pool.config['BATCH_DEADLINE_SECONDS']
+    )
+
+    tracker.save_error_log()
+
+    results = []
+    for index in range(len(clips)):
+        result = fan_out.get(index) or {
+            "success": False,
+            "error": fan_out.error_for(index)
+        }
+        result = dict(result, index=index, student_name=None, matched_student=None, match_score=None, score=None)
+
+        parsed = parse_score_utterance(result.get("text"))
+        if parsed:
+            result["student_name"], result["score"] = parsed
+            result["matched_student"], result["match_score"] = match_student(parsed[0], student_names)
+        results.append(result)
+
+    recognize_times = [r["timings"]["recognize_ms"] for r in results if "recognize_ms" in r.get("timings", {})]
+    timings = {
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "slowest_clip_ms": max(recognize_times) if recognize_times else 0.0,
+        "sum_clip_ms": round(sum(recognize_times), 1)
+    }
+    print(f"⏱️ Batch of {len(clips)} clips: {timings}")
+
+    return {
+        "success": any(r["success"] for r in results),
+        "results": results,
+        "transcribed": sum(1 for r in results if r["success"]),
+        "failed": sum(1 for r in results if not r["success"]),
+        "timings": timings
+    }
+
+
 # 🎯 ENHANCED: Smart transcript selection with fuzzy matching
 def smart_transcript_selection(alternatives_info, student_names=None):
     """
@@ -516,29 +775,32 @@ def smart_transcript_selection(alternatives_info, student_names=None):
 
 
 # 🎯 NEW: Manual correction function for building training data
-def log_manual_correction(original_transcript, corrected_transcript, student_name=None):
+def log_manual_correction(original_transcript, corrected_transcript, student_name=None, user=None):
     """
     Function to call when users manually correct transcriptions
     This builds valuable training data for future improvements
     """
-    tracker = SpeechRecognitionTracker()
+    from .models import SpeechCorrection
+
+    tracker = SpeechRecognitionTracker(user)
     tracker.log_correction(
         original_transcript,
         corrected_transcript,
         student_name=student_name,
-        confidence=None  # Manual corrections don't have confidence scores
+        confidence=None,  # Manual corrections don't have confidence scores
+        correction_type=SpeechCorrection.MANUAL
     )
 
     print(f"✅ Manual correction logged: '{original_transcript}' -> '{corrected_transcript}'")
 
 
 # 🎯 NEW: Fallback transcription with multiple approaches
-def transcribe_with_fallback(audio_bytes, language=None, student_names=None):
+def transcribe_with_fallback(audio_bytes, language=None, student_names=None, user=None):
     """
     Try multiple approaches if primary transcription has low confidence
     """
     # Try primary configuration with preprocessing
-    result = transcribe_audio(audio_bytes, language, student_names, enable_preprocessing=True)
+    result = transcribe_audio(audio_bytes, language, student_names, enable_preprocessing=True, user=user)
 
     if result['success'] and result['confidence'] > 0.8:
         return result
@@ -546,7 +808,8 @@ def transcribe_with_fallback(audio_bytes, language=None, student_names=None):
     print("🎯 Primary transcription confidence low, trying fallback approaches...")
 
     # Fallback 1: Try without preprocessing (in case preprocessing is causing issues)
-    result_no_preprocess = transcribe_audio(audio_bytes, language, student_names, enable_preprocessing=False)
+    result_no_preprocess = transcribe_audio(audio_bytes, language, student_names, enable_preprocessing=False,
+                                            user=user)
 
     # Fallback 2: Try with different model configuration
     # (You could implement this with different models)
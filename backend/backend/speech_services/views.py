@@ -1,3 +1,6 @@
+import json
+
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,8 +8,10 @@ from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from .serializers import TranscriptionRequestSerializer, TranscriptionResponseSerializer
-from .utils import transcribe_audio
+from .serializers import (
+    BatchTranscriptionRequestSerializer, TranscriptionRequestSerializer, TranscriptionResponseSerializer
+)
+from .utils import transcribe_audio, transcribe_batch
 from .models import TranscriptionUsage
 
 
@@ -46,7 +51,7 @@ class SpeechServiceViewSet(viewsets.ViewSet):
             audio_bytes = audio_file.read()
 
             # 🎯 ENHANCED: Call improved transcribe function with student names
-            result = transcribe_audio(audio_bytes, language, student_names)
+            result = transcribe_audio(audio_bytes, language, student_names, user=request.user)
 
             # Record usage for monitoring
             TranscriptionUsage.objects.create(
@@ -61,4 +66,113 @@ class SpeechServiceViewSet(viewsets.ViewSet):
             return Response(
                 {"success": False, "error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    @extend_schema(
+        description='Transcribe a batch of clips recorded against one roster concurrently; results come back '
+                    'in upload order with confidence and the matched student and score',
+        request=BatchTranscriptionRequestSerializer
+    )
+    @action(detail=False, methods=['POST'])
+    def transcribe_batch(self, request):
+        serializer = BatchTranscriptionRequestSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            from .speech_client import client_pool
+
+            audio_files = request.FILES.getlist('audio_files')
+            language = request.data.get('language')
+
+            student_names_str = request.data.get('student_names', '')
+            student_names = [name.strip() for name in student_names_str.split(',') if
+                             name.strip()] if student_names_str else None
+
+            max_clips = client_pool.config['BATCH_MAX_CLIPS']
+            if len(audio_files) > max_clips:
+                return Response(
+                    {"success": False, "error": f"At most {max_clips} clips can be transcribed in one batch"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            clips = [audio_file.read() for audio_file in audio_files]
+            result = transcribe_batch(clips, language, student_names, user=request.user)
+
+            # Record usage for monitoring, one entry per clip like single transcriptions
+            TranscriptionUsage.objects.bulk_create([
+                TranscriptionUsage(user=request.user, audio_length_seconds=len(audio_bytes) / 32000)
+                for audio_bytes in clips
+            ])
+
+            return Response(result)
+
+        except Exception as e:
+            return Response(
+                {"success": False, "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @extend_schema(
+        description='Stream audio (WEBM_OPUS, chunked request body) and receive newline-delimited JSON events: '
+                    'interim results while speaking, a final result per utterance and a done event. '
+                    'Query parameters: language, student_names (comma separated), and sheet_id, column and '
+                    'sheet_name to queue each "Name Score" utterance in the sheet write buffer.',
+        request=None,
+        responses={200: None}
+    )
+    @action(detail=False, methods=['POST'])
+    def stream(self, request):
+        from .streaming import StreamingTranscription, iter_request_body
+
+        language = request.query_params.get('language')
+        student_names_str = request.query_params.get('student_names', '')
+        student_names = [name.strip() for name in student_names_str.split(',') if
+                         name.strip()] if student_names_str else None
+        sheet_id = request.query_params.get('sheet_id')
+        column = request.query_params.get('column')
+        sheet_name = request.query_params.get('sheet_name')
+
+        if sheet_id and not column:
+            return Response(
+                {"success": False, "error": "column is required to write scores to a sheet"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # The body is read while recognizing, so it must not be parsed into request.data first
+        transcription = StreamingTranscription(
+            iter_request_body(request._request), language, student_names,
+            sheet_id=sheet_id, column_name=column, sheet_name=sheet_name, user=request.user
+        )
+        user = request.user
+
+        def stream_events():
+            for event in transcription.events():
+                yield json.dumps(event) + '\n'
+
+            # Record usage for monitoring
+            TranscriptionUsage.objects.create(
+                user=user,
+                audio_length_seconds=transcription.audio_bytes / 32000  # Rough estimate, as in transcribe
+            )
+
+        response = StreamingHttpResponse(stream_events(), content_type='application/x-ndjson')
+        # Don't let proxies hold events back until the stream ends
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @extend_schema(
+        description='Per-worker Speech-to-Text client, recognition config cache and batch counters'
+    )
+    @action(detail=False, methods=['GET'])
+    def metrics(self, request):
+        from .speech_client import batch_fetcher, client_pool, config_cache
+
+        return Response({
+            "success": True,
+            "client_pool": client_pool.get_metrics(),
+            "config_cache": config_cache.get_metrics(),
+            "batch": batch_fetcher.get_metrics()
+        })
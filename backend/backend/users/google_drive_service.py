@@ -3,6 +3,8 @@ import requests
 from typing import List, Dict, Optional, BinaryIO
 from django.conf import settings
 
+from utils.google_http import google_http
+
 logger = logging.getLogger(__name__)
 
 class GoogleDriveService:
@@ -25,6 +27,8 @@ class GoogleDriveService:
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
+        # Shared keep-alive session, so calls don't each open a new TLS connection
+        self.http = google_http.session
     
     def test_connection(self) -> Dict:
         """
@@ -34,7 +38,7 @@ class GoogleDriveService:
             Dict containing success status and user info or error message
         """
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.DRIVE_API_BASE_URL}/about",
                 headers=self.headers,
                 params={'fields': 'user'},
@@ -91,7 +95,7 @@ class GoogleDriveService:
             if query_parts:
                 params['q'] = ' and '.join(query_parts)
             
-            response = requests.get(
+            response = self.http.get(
                 f"{self.DRIVE_API_BASE_URL}/files",
                 headers=self.headers,
                 params=params,
@@ -152,7 +156,7 @@ class GoogleDriveService:
             # Remove Content-Type header for multipart request
             upload_headers = {'Authorization': f'Bearer {self.access_token}'}
             
-            response = requests.post(
+            response = self.http.post(
                 f"{self.UPLOAD_URL}?uploadType=multipart",
                 headers=upload_headers,
                 files=files,
@@ -205,7 +209,7 @@ class GoogleDriveService:
             if parent_folder_id:
                 metadata['parents'] = [parent_folder_id]
             
-            response = requests.post(
+            response = self.http.post(
                 f"{self.DRIVE_API_BASE_URL}/files",
                 headers=self.headers,
                 json=metadata,
@@ -247,7 +251,7 @@ class GoogleDriveService:
             Dict containing file content or error message
         """
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.DRIVE_API_BASE_URL}/files/{file_id}",
                 headers=self.headers,
                 params={'alt': 'media'},
@@ -285,7 +289,7 @@ class GoogleDriveService:
             Dict containing success status or error message.
         """
         try:
-            response = requests.delete(
+            response = self.http.delete(
                 f"{self.DRIVE_API_BASE_URL}/files/{file_id}",
                 headers=self.headers,
                 timeout=15
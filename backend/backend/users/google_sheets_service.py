@@ -1,8 +1,12 @@
 import logging
 import requests
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from django.conf import settings
 
+from utils.concurrent_fetch import fetcher, request_timeout
+from utils.google_http import ACCOUNT_HEADER, google_http
+from utils.sheet_snapshot_cache import METADATA_FIELDS, build_metadata
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,18 +18,24 @@ class GoogleSheetsService:
     SHEETS_API_BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
     DRIVE_API_BASE_URL = "https://www.googleapis.com/drive/v3"
 
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, user_id: Optional[int] = None):
         """
         Initialize with user's access token.
 
         Args:
             access_token: Google OAuth2 access token with drive.file scope
+            user_id: ID of the user the token belongs to; Sheets calls are rate
+                     limited per user, and tokens change every hour
         """
         self.access_token = access_token
         self.headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
+        if user_id is not None:
+            self.headers[ACCOUNT_HEADER] = f'user:{user_id}'
+        # Shared keep-alive session, so calls don't each open a new TLS connection
+        self.http = google_http.session
 
     def copy_template_sheet(self, template_file_id: str, new_name: str) -> Dict:
         """
@@ -45,7 +55,7 @@ class GoogleSheetsService:
                 "name": new_name
             }
 
-            response = requests.post(
+            response = self.http.post(
                 copy_url,
                 headers=self.headers,
                 json=copy_data,
@@ -97,7 +107,7 @@ class GoogleSheetsService:
                 }
             }
 
-            response = requests.post(
+            response = self.http.post(
                 create_url,
                 headers=self.headers,
                 json=create_data,
@@ -121,7 +131,7 @@ class GoogleSheetsService:
             print(f"🔍 Attempting to read template content from: {template_file_id}")
             
             # Try with user token first
-            template_response = requests.get(
+            template_response = self.http.get(
                 template_values_url,
                 headers=self.headers,
                 timeout=15
@@ -139,7 +149,7 @@ class GoogleSheetsService:
                 
                 api_key = self._get_api_key()
                 if api_key:
-                    template_response = requests.get(
+                    template_response = self.http.get(
                         f"{template_values_url}?key={api_key}",
                         timeout=15
                     )
@@ -163,7 +173,7 @@ class GoogleSheetsService:
                     "majorDimension": "ROWS"
                 }
 
-                update_response = requests.put(
+                update_response = self.http.put(
                     update_url,
                     headers=self.headers,
                     json=update_data,
@@ -181,7 +191,7 @@ class GoogleSheetsService:
 
             # Step 4: Get the web view link
             file_info_url = f"{self.DRIVE_API_BASE_URL}/files/{new_sheet_id}"
-            file_response = requests.get(
+            file_response = self.http.get(
                 file_info_url,
                 headers=self.headers,
                 params={'fields': 'webViewLink'},
@@ -233,7 +243,7 @@ class GoogleSheetsService:
                 'fields': 'spreadsheetId,properties.title,sheets.properties'
             }
 
-            response = requests.get(
+            response = self.http.get(
                 url,
                 headers=self.headers,
                 params=params,
@@ -294,7 +304,7 @@ class GoogleSheetsService:
                     "type": "anyone"
                 }
 
-                response = requests.post(
+                response = self.http.post(
                     permissions_url,
                     headers=self.headers,
                     json=permission_data,
@@ -341,7 +351,7 @@ class GoogleSheetsService:
                 'pageSize': 50
             }
 
-            response = requests.get(
+            response = self.http.get(
                 url,
                 headers=self.headers,
                 params=params,
@@ -395,25 +405,12 @@ class GoogleSheetsService:
                 return self.get_specific_sheet_data(sheet_id, sheet_name)
 
             # Original behavior - get first sheet
-            url = f"{self.SHEETS_API_BASE_URL}/{sheet_id}"
-
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=10
-            )
-
-            if response.status_code != 200:
-                return {
-                    'success': False,
-                    'error': f'Failed to get sheet metadata: {response.status_code}',
-                    'details': response.text
-                }
-
-            spreadsheet = response.json()
+            metadata, error = self._get_spreadsheet_metadata(sheet_id)
+            if error:
+                return error
 
             # Get the first sheet name
-            first_sheet = spreadsheet['sheets'][0]['properties']['title']
+            first_sheet = metadata['sheets'][0]['title']
 
             # Use the specific sheet method
             return self.get_specific_sheet_data(sheet_id, first_sheet)
@@ -437,54 +434,69 @@ class GoogleSheetsService:
         """
         try:
             # Get sheet metadata first
-            url = f"{self.SHEETS_API_BASE_URL}/{sheet_id}"
+            metadata, error = self._get_spreadsheet_metadata(sheet_id)
+            if error:
+                return error
 
-            response = requests.get(
-                url,
+            all_sheets = []
+
+            sheet_names = [sheet_properties['title'] for sheet_properties in metadata['sheets']]
+            ranges = [f"'{sheet_name}'!A:Z" for sheet_name in sheet_names]  # 🔥 Use sheet name in quotes for safety
+
+            # 🔥 Load every tab in one values:batchGet round trip instead of one request per tab
+            values_by_sheet = {}
+            batch_response = self.http.get(
+                f"{self.SHEETS_API_BASE_URL}/{sheet_id}/values:batchGet",
                 headers=self.headers,
+                params={'ranges': ranges},
                 timeout=10
             )
 
-            if response.status_code != 200:
+            if batch_response.status_code == 200:
+                value_ranges = batch_response.json().get('valueRanges', [])
+                for sheet_name, value_range in zip(sheet_names, value_ranges):
+                    values_by_sheet[sheet_name] = value_range.get('values', [])
+            elif batch_response.status_code in (401, 403):
+                # Expired token or no access; per-tab reads would fail the same way
                 return {
                     'success': False,
-                    'error': f'Failed to get sheet metadata: {response.status_code}',
-                    'details': response.text
+                    'error': f'Failed to get sheets data: {batch_response.status_code}',
+                    'details': batch_response.text
                 }
-
-            spreadsheet = response.json()
-            all_sheets = []
+            else:
+                # One bad tab fails the whole batch; fall back to per-tab reads so the others still load
+                logger.warning(f"Batch get failed ({batch_response.status_code}), reading sheets one by one")
+
+            # 🔥 Tabs the batch didn't return are fetched in parallel, not one after another
+            missing = [sheet_name for sheet_name in sheet_names if sheet_name not in values_by_sheet]
+            fetched = fetcher.run(
+                {sheet_name: self._tab_values_reader(sheet_id, sheet_name) for sheet_name in missing},
+                host='sheets.googleapis.com'
+            )
+            values_by_sheet.update(
+                (sheet_name, values) for sheet_name, values in fetched.results.items() if values is not None
+            )
 
             # 🔥 Loop through ALL sheets instead of just the first one
-            for sheet_info in spreadsheet['sheets']:
-                sheet_name = sheet_info['properties']['title']
-                sheet_id_internal = sheet_info['properties']['sheetId']
-
-                # Get data for this specific sheet
-                range_name = f"'{sheet_name}'!A:Z"  # 🔥 Use sheet name in quotes for safety
-                values_url = f"{self.SHEETS_API_BASE_URL}/{sheet_id}/values/{range_name}"
-
-                values_response = requests.get(
-                    values_url,
-                    headers=self.headers,
-                    timeout=10
-                )
-
-                if values_response.status_code == 200:
-                    values_data = values_response.json()
-                    values = values_data.get('values', [])
-
-                    if values:  # Only add sheets that have data
-                        headers = values[0] if values else []
-                        tableData = values[1:] if len(values) > 1 else []
-
-                        all_sheets.append({
-                            'sheet_name': sheet_name,
-                            'sheet_id': sheet_id_internal,
-                            'headers': headers,
-                            'tableData': tableData,
-                            'row_count': len(tableData)
-                        })
+            for sheet_properties in metadata['sheets']:
+                sheet_name = sheet_properties['title']
+                sheet_id_internal = sheet_properties['sheetId']
+
+                if sheet_name not in values_by_sheet:
+                    continue
+                values = values_by_sheet[sheet_name]
+
+                if values:  # Only add sheets that have data
+                    headers = values[0] if values else []
+                    tableData = values[1:] if len(values) > 1 else []
+
+                    all_sheets.append({
+                        'sheet_name': sheet_name,
+                        'sheet_id': sheet_id_internal,
+                        'headers': headers,
+                        'tableData': tableData,
+                        'row_count': len(tableData)
+                    })
 
             return {
                 'success': True,
@@ -499,6 +511,52 @@ class GoogleSheetsService:
                 'error': f'Failed to get sheets data: {str(e)}'
             }
 
+    def _get_spreadsheet_metadata(self, sheet_id: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Tab titles, ids and grid sizes, with the same field mask as the service account reads.
+
+        Not served from the shared metadata cache: that cache is filled by the service
+        account and other users, and this call is what tells an expired token or a
+        user without access apart.
+
+        Returns:
+            (metadata, None), or (None, error dict) if the request failed
+        """
+        response = self.http.get(
+            f"{self.SHEETS_API_BASE_URL}/{sheet_id}",
+            headers=self.headers,
+            params={'fields': METADATA_FIELDS},
+            timeout=10
+        )
+
+        if response.status_code != 200:
+            return None, {
+                'success': False,
+                'error': f'Failed to get sheet metadata: {response.status_code}',
+                'details': response.text
+            }
+
+        return build_metadata(response.json()), None
+
+    def _tab_values_reader(self, sheet_id: str, sheet_name: str):
+        """Task reading one tab's values; returns None when the read fails."""
+
+        def read():
+            range_name = f"'{sheet_name}'!A:Z"
+            values_url = f"{self.SHEETS_API_BASE_URL}/{sheet_id}/values/{range_name}"
+
+            values_response = self.http.get(
+                values_url,
+                headers=self.headers,
+                timeout=request_timeout(10)
+            )
+
+            if values_response.status_code != 200:
+                return None
+            return values_response.json().get('values', [])
+
+        return read
+
     def get_specific_sheet_data(self, sheet_id: str, sheet_name: str) -> Dict:
         """
         Get data from a specific sheet by name.
@@ -515,7 +573,7 @@ class GoogleSheetsService:
             range_name = f"'{sheet_name}'!A:Z"  # 🔥 Use specific sheet name
             values_url = f"{self.SHEETS_API_BASE_URL}/{sheet_id}/values/{range_name}"
 
-            values_response = requests.get(
+            values_response = self.http.get(
                 values_url,
                 headers=self.headers,
                 timeout=10
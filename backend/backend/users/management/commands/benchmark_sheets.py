@@ -0,0 +1,72 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.google_service_account_sheets import GoogleServiceAccountSheets
+from utils.sheet_snapshot_cache import snapshot_cache
+
+
+class Command(BaseCommand):
+    help = 'Times the service account sheet endpoints against a real spreadsheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sheet_id', help='ID of a spreadsheet shared with the service account')
+        parser.add_argument('--iterations', type=int, default=5, help='Runs per operation')
+        parser.add_argument('--warm', action='store_true',
+                            help='Keep cached metadata/snapshots between runs instead of measuring cold reads')
+
+    def handle(self, *args, **options):
+        if not settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS:
+            raise CommandError('Service account credentials are not configured')
+
+        sheet_id = options['sheet_id']
+        service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+
+        # Payload and latency of the metadata call: full resource vs the field mask the services use
+        for label, fields in [('metadata (full)', None), ('metadata (field mask)', service.METADATA_FIELDS)]:
+            request_args = {'spreadsheetId': sheet_id}
+            if fields:
+                request_args['fields'] = fields
+
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                spreadsheet = service.sheets_service.spreadsheets().get(**request_args).execute()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            payload_kb = len(json.dumps(spreadsheet).encode('utf-8')) / 1024
+            self._report(label, timings, f"payload {payload_kb:8.1f} KB")
+
+        operations = [
+            ('first sheet name', lambda: {'success': service.get_first_sheet_name(sheet_id) is not None}),
+            ('sheets list', lambda: service.get_sheets_list(sheet_id)),
+            ('all sheets data (per tab)', lambda: service.get_all_sheets_data(sheet_id, batch_read=False)),
+            ('all sheets data (batchGet)', lambda: service.get_all_sheets_data(sheet_id)),
+        ]
+
+        for label, operation in operations:
+            timings = []
+            for _ in range(options['iterations']):
+                if not options['warm']:
+                    snapshot_cache.clear()
+
+                started = time.perf_counter()
+                result = operation()
+                timings.append((time.perf_counter() - started) * 1000)
+
+                if not result.get('success'):
+                    raise CommandError(f"{label} failed: {result.get('error')}")
+
+            self._report(label, timings)
+
+        self.stdout.write(self.style.SUCCESS(f"Done ({options['iterations']} runs each)"))
+
+    def _report(self, label, timings, extra=''):
+        self.stdout.write(
+            f"{label:<28} mean {statistics.mean(timings):8.1f} ms   "
+            f"median {statistics.median(timings):8.1f} ms   "
+            f"min {min(timings):8.1f} ms   max {max(timings):8.1f} ms   {extra}".rstrip()
+        )
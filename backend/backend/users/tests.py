@@ -1,3 +1,278 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from utils.google_client_pool import client_registry
+from utils.google_service_account_sheets import GoogleServiceAccountSheets
+from utils.sheet_columns import SheetColumnMap, column_index, column_letter
+from utils.sheet_snapshot_cache import SheetSnapshot
+from utils.sheet_write_buffer import SheetWriteBuffer, build_ack
+from utils.sheets_rate_limiter import SheetsRateLimiter
+from utils.student_index import StudentIndex
+
+
+def build_wide_template(extra_columns):
+    """3-row header template like the class record sheets, widened past column Z."""
+    main_headers = ['', '', '', '', 'QUIZ', '', 'LAB', '']
+    headers = ['NO.', 'LASTNAME', 'FIRST NAME', 'STUDENT ID', 'QUIZ 1', 'QUIZ 2', 'LAB 1', 'LAB 2']
+    max_scores = ['', '', '', '', '10', '10', '20', '20']
+    for i in range(extra_columns):
+        main_headers.append('ACTIVITY' if i == 0 else '')
+        headers.append(f'ACT {i + 1}')
+        max_scores.append('5')
+    main_headers.append('TOTAL')
+    headers.append('TOTAL')
+    max_scores.append('')
+    return headers, main_headers, max_scores
+
+
+class ColumnLetterTests(SimpleTestCase):
+    def test_single_letters(self):
+        self.assertEqual(column_letter(0), 'A')
+        self.assertEqual(column_letter(25), 'Z')
+
+    def test_multi_letters(self):
+        self.assertEqual(column_letter(26), 'AA')
+        self.assertEqual(column_letter(38), 'AM')
+        self.assertEqual(column_letter(51), 'AZ')
+        self.assertEqual(column_letter(52), 'BA')
+        self.assertEqual(column_letter(701), 'ZZ')
+        self.assertEqual(column_letter(702), 'AAA')
+
+    def test_round_trip(self):
+        for index in range(0, 1000):
+            self.assertEqual(column_index(column_letter(index)), index)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            column_letter(-1)
+        with self.assertRaises(ValueError):
+            column_index('A1')
+
+
+class SheetColumnMapTests(SimpleTestCase):
+    def setUp(self):
+        # 8 base columns + 50 activities + TOTAL runs through column BG
+        self.headers, self.main_headers, self.max_scores = build_wide_template(50)
+        self.columns = SheetColumnMap(self.headers, self.main_headers, self.max_scores)
+
+    def test_lookup_past_z(self):
+        self.assertEqual(self.columns.get('ACT 18').letter, 'Z')
+        self.assertEqual(self.columns.get('ACT 19').letter, 'AA')
+        self.assertEqual(self.columns.get('ACT 44').letter, 'AZ')
+        self.assertEqual(self.columns.get('ACT 45').letter, 'BA')
+        self.assertEqual(self.columns.get('TOTAL').letter, 'BG')
+        self.assertEqual(self.columns.last_letter, 'BG')
+
+    def test_lookup_is_normalized(self):
+        self.assertIs(self.columns.get(' act  19 '), self.columns.get('ACT 19'))
+        self.assertIn('first name', self.columns)
+        self.assertIsNone(self.columns.get('QUIZ 9'))
+
+    def test_matches_headers_index(self):
+        for index, header in enumerate(self.headers):
+            self.assertEqual(self.columns.get(header).index, index)
+
+    def test_category_and_max_score(self):
+        self.assertEqual(self.columns.get('QUIZ 2').category, 'QUIZ')
+        self.assertEqual(self.columns.get('LAB 1').max_score, '20')
+        self.assertEqual(self.columns.get('ACT 50').category, 'ACTIVITY')
+        self.assertEqual(self.columns.get('ACT 50').max_score, '5')
+        self.assertEqual(self.columns.get('LASTNAME').category, '')
+
+    def test_formula_columns(self):
+        self.assertTrue(self.columns.get('TOTAL').is_formula)
+        self.assertFalse(self.columns.get('ACT 30').is_formula)
+        self.assertNotIn(self.columns.get('TOTAL'), self.columns.writable_columns())
+
+    def test_writable_runs_skip_formula_columns(self):
+        headers = ['NO.', 'LASTNAME', 'QUIZ 1', 'QUIZ TOTAL', 'LAB 1', 'GRAND TOTAL']
+        runs = SheetColumnMap(headers).writable_runs()
+        self.assertEqual([[column.letter for column in run] for run in runs], [['A', 'B', 'C'], ['E']])
+
+    def test_select_by_category_and_pattern(self):
+        quizzes = self.columns.select(category='quiz')
+        self.assertEqual([column.header for column in quizzes], ['QUIZ 1', 'QUIZ 2'])
+        self.assertEqual(len(self.columns.select(pattern='act *')), 50)
+        acts = self.columns.select(category='ACTIVITY', pattern='ACT 4?')
+        self.assertEqual((len(acts), acts[0].letter, acts[-1].letter), (10, 'AV', 'BE'))
+        self.assertEqual(self.columns.select(pattern='TOTAL'), [])
+        self.assertEqual(self.columns.select(), [])
+
+    def test_name_columns(self):
+        self.assertEqual(self.columns.last_name.letter, 'B')
+        self.assertEqual(self.columns.first_name.letter, 'C')
+        self.assertEqual(self.columns.student_id.letter, 'D')
+
+    def test_from_sheet_data(self):
+        columns = SheetColumnMap.from_sheet_data({
+            'headers': self.headers,
+            'main_headers': self.main_headers,
+            'max_scores': self.max_scores
+        })
+        self.assertEqual(columns.get('ACT 44').as_dict()['letter'], 'AZ')
+
+
+class StudentIndexTests(SimpleTestCase):
+    def setUp(self):
+        headers = ['NO.', 'LASTNAME', 'FIRST NAME', 'STUDENT ID', 'QUIZ 1', 'TOTAL']
+        rows = [
+            ['1', 'Omen', 'Jared Karl', '1000', '', ''],
+            ['2', 'Smith', 'Anna', '1001', '', ''],
+            ['', '', '', '', '', ''],
+            ['4', 'Dela Cruz', 'Juan', '1003', '', ''],
+            ['5', 'Smith', 'Anna', '1004', '', ''],
+        ]
+        self.students = StudentIndex(rows, SheetColumnMap(headers))
+
+    def test_skips_empty_rows(self):
+        self.assertEqual(len(self.students), 4)
+
+    def test_exact_and_reversed(self):
+        self.assertEqual(self.students.match('Anna Smith').strategy, 'exact')
+        self.assertEqual(self.students.find('Smith, Anna'), 1)
+        self.assertEqual(self.students.match('Smith Anna').strategy, 'reversed')
+        self.assertEqual(self.students.find('  juan   DELA CRUZ '), 3)
+
+    def test_full_name_and_first_token(self):
+        self.assertEqual(self.students.match('Jared Karl Omen').strategy, 'full_name')
+        self.assertEqual(self.students.match('Jared Omen').strategy, 'first_token')
+        self.assertEqual(self.students.find('Jared Omen'), 0)
+
+    def test_containment_fallback(self):
+        match = self.students.match('Anna Smit')
+        self.assertEqual(match.row_index, 1)
+        self.assertEqual(match.strategy, 'first_exact_last_contains')
+        # Too little overlap between 'cruz' and 'dela cruz'
+        self.assertIsNone(self.students.find('Juan Cruz'))
+
+    def test_no_match(self):
+        self.assertIsNone(self.students.find('Pedro Penduko'))
+        self.assertIsNone(self.students.find(''))
+        self.assertIsNone(self.students.find('Ann Smith'))
+
+    def test_lookup_by_id_and_partial(self):
+        self.assertEqual(self.students.find_by_id('1004'), 4)
+        self.assertIsNone(self.students.find_by_id('9999'))
+        self.assertEqual(self.students.find_partial('dela'), 3)
+
+    def test_find_duplicate_reasons(self):
+        self.assertEqual(self.students.find_duplicate('X', 'Y', '1003').strategy, 'student_id')
+        self.assertEqual(self.students.find_duplicate('anna', 'SMITH').strategy, 'exact_name')
+        match = self.students.find_duplicate('Jared', 'Omen')
+        self.assertEqual((match.row_index, match.strategy), (0, 'last_name_first_similar'))
+        self.assertAlmostEqual(match.score, 2 / 3)
+        self.assertEqual(self.students.find_duplicate('Juan', 'Cruz').strategy, 'first_name_last_similar')
+
+    def test_find_duplicate_handles_blank_names(self):
+        self.assertIsNone(self.students.find_duplicate('', '', ''))
+        self.assertIsNone(self.students.find_duplicate(None, None, None))
+        self.assertIsNone(self.students.find_duplicate('', 'Reyes'))
+
+
+class SheetWriteBufferTests(SimpleTestCase):
+    CREDENTIALS = {'client_email': 'buffer-test@example.com', 'private_key_id': 'buffer-test'}
+
+    def setUp(self):
+        credentials = mock.Mock(token='token', expiry=datetime.utcnow() + timedelta(hours=1))
+        patches = [
+            mock.patch('utils.google_client_pool.service_account.Credentials.from_service_account_info',
+                       return_value=credentials),
+            mock.patch('utils.google_client_pool.build', return_value=mock.Mock()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.flushed = threading.Event()
+
+    def write(self, sheet_id, edits):
+        # Same client lookup as the service account's buffered writer
+        client_registry.get_clients(self.CREDENTIALS)
+        self.flushed.set()
+        return [build_ack(edit, 'written') for edit in edits]
+
+    def test_timer_flushes_reuse_clients(self):
+        buffer = SheetWriteBuffer({'WINDOW_SECONDS': 0.01})
+        builds = client_registry.get_metrics()['service_builds']
+
+        for row in (1, 2):
+            self.flushed.clear()
+            buffer.add('sheet', {'cell_range': f'Sheet1!E{row}', 'value': row}, self.write)
+            self.assertTrue(self.flushed.wait(5))
+
+        acks = buffer.flush('sheet')
+        self.assertEqual([ack['status'] for ack in acks], ['written', 'written'])
+        self.assertEqual(buffer.get_metrics()['timer_flushes'], 2)
+        # One Drive/Sheets pair for the flush thread, reused by the second flush
+        self.assertEqual(client_registry.get_metrics()['service_builds'] - builds, 2)
+
+
+class ColumnImportTests(SimpleTestCase):
+    def setUp(self):
+        snapshot = SheetSnapshot({
+            'success': True,
+            'sheet_name': 'Sheet1',
+            'headers': ['NO.', 'LASTNAME', 'FIRST NAME', 'STUDENT ID', 'QUIZ 1', 'TOTAL'],
+            'main_headers': ['', '', '', '', 'QUIZ', 'TOTAL'],
+            'max_scores': ['', '', '', '', '10', ''],
+            'tableData': [
+                ['1', 'Omen', 'Jared', '1000', '4', ''],
+                ['2', 'Smith', 'Anna', '1001', '', ''],
+            ]
+        })
+        # The plan is built from the snapshot alone, so dry runs never touch the API
+        self.service = GoogleServiceAccountSheets.__new__(GoogleServiceAccountSheets)
+        patcher = mock.patch.object(GoogleServiceAccountSheets, '_get_snapshot', return_value=snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plan(self, mappings, column_data):
+        result = self.service.import_column_data_with_mapping(
+            'sheet', mappings, {'columnData': column_data}, dry_run=True
+        )
+        self.assertTrue(result['success'])
+        return result
+
+    def test_mappings_on_one_column_chain(self):
+        result = self.plan([
+            {'importColumn': 'QUIZ 1', 'targetColumn': 'QUIZ 1', 'action': 'replace'},
+            {'importColumn': 'BONUS', 'targetColumn': 'QUIZ 1', 'action': 'merge_add'},
+        ], {
+            'QUIZ 1': {'Jared Omen': '7', 'Anna Smith': '5'},
+            'BONUS': {'Jared Omen': '2'},
+        })
+        # The bonus is added to the replaced score, not to the old one
+        self.assertEqual(result['plan']['ranges'], [
+            {'range': "'Sheet1'!E2", 'values': [['BONUS']]},
+            {'range': "'Sheet1'!E4:E5", 'values': [['9.0'], ['5']]},
+        ])
+        self.assertEqual(result['results']['cellsUpdated'], 2)
+
+    def test_target_renamed_by_earlier_mapping(self):
+        result = self.plan([
+            {'importColumn': 'QUIZ A', 'targetColumn': 'QUIZ 1', 'action': 'replace'},
+            {'importColumn': 'QUIZ A', 'targetColumn': 'QUIZ A', 'action': 'merge_skip'},
+        ], {
+            'QUIZ A': {'Jared Omen': '8', 'Anna Smith': '6'},
+        })
+        self.assertEqual(result['results']['errors'], [])
+        self.assertEqual(result['plan']['ranges'], [
+            {'range': "'Sheet1'!E2", 'values': [['QUIZ A']]},
+            {'range': "'Sheet1'!E4:E5", 'values': [['8'], ['6']]},
+        ])
+        self.assertEqual(result['results']['cellsSkipped'], 2)
+
+
+class SheetsRateLimiterTests(SimpleTestCase):
+    def test_give_ups_leave_no_token_debt(self):
+        limiter = SheetsRateLimiter({'READS_PER_MINUTE': 60, 'BURST_SECONDS': 1, 'MAX_WAIT_SECONDS': 0})
+        for _ in range(50):
+            limiter.acquire('account', 'sheet')
+
+        self.assertEqual(limiter.get_metrics()['wait_limit_reached'], 49)
+        for bucket in limiter._buckets.values():
+            # The next call waits at most for one token, however many calls gave up before it
+            self.assertGreaterEqual(bucket.tokens, 0.0)
+            self.assertLessEqual(bucket.wait_time(1.0), 1.0 / bucket.rate)
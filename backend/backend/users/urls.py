@@ -17,7 +17,9 @@ from .views import (
     sheets_analyze_columns_mapping, sheets_execute_column_import, sheets_rename_column_header,
     sheets_analyze_columns_mapping_enhanced, sheets_execute_column_import_enhanced, get_import_history,
     sheets_update_max_score_service_account, sheets_update_batch_max_scores_service_account,
-    sheets_update_range_service_account, delete_student_from_sheet, update_multiple_cells_service_account
+    sheets_update_range_service_account, delete_student_from_sheet, update_multiple_cells_service_account,
+    sheets_client_metrics_service_account, sheets_queue_cell_update_service_account,
+    sheets_flush_cell_updates_service_account
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -50,6 +52,9 @@ urlpatterns = [
     path('sheets/service-account/data/<str:sheet_id>/', sheets_get_data_service_account,
          name='sheets_get_data_service_account'),
 
+    path('sheets/service-account/client-metrics/', sheets_client_metrics_service_account,
+         name='sheets_client_metrics_service_account'),
+
     path('sheets/service-account/<str:sheet_id>/update-cell/', sheets_update_cell_service_account, name='sheets_update_cell_service_account'),
     path('sheets/service-account/<str:sheet_id>/add-student/', sheets_add_student_service_account, name='sheets_add_student_service_account'),
 
@@ -74,6 +79,14 @@ urlpatterns = [
          sheets_update_cell_specific_sheet_service_account,
          name='sheets_update_cell_specific_sheet_service_account'),
 
+    path('sheets/service-account/<str:sheet_id>/queue-cell-update/',
+         sheets_queue_cell_update_service_account,
+         name='sheets_queue_cell_update_service_account'),
+
+    path('sheets/service-account/<str:sheet_id>/flush-cell-updates/',
+         sheets_flush_cell_updates_service_account,
+         name='sheets_flush_cell_updates_service_account'),
+
     path('activities/', UserActivityListView.as_view(), name='user-activities'),
     path('activities/create/', create_activity, name='create-activity'),
     path('activities/stats/', get_activity_stats, name='activity-stats'),
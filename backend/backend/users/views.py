@@ -5,7 +5,7 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from drf_spectacular.utils import OpenApiExample, extend_schema, OpenApiParameter
 from google.oauth2 import id_token
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -20,7 +20,6 @@ from .utils import send_verification_email, get_current_utc_time, get_user_login
 from .google_drive_service import GoogleDriveService
 from firebase_admin import auth
 from .google_sheets_service import GoogleSheetsService
-from django.core.cache import cache
 import hashlib
 
 
@@ -765,7 +764,7 @@ def sheets_copy_template(request):
         if not template_id or not sheet_name:
             return Response({'error': 'template_id and name are required'}, status=400)
         
-        sheets_service = GoogleSheetsService(access_token)
+        sheets_service = GoogleSheetsService(access_token, user_id=request.user.pk)
         result = sheets_service.copy_template_sheet(
             template_file_id=template_id, 
             new_name=sheet_name
@@ -787,7 +786,7 @@ def sheets_get_info(request, sheet_id):
         if not access_token:
             return Response({'error': 'Google access token required in X-Google-Access-Token header'}, status=400)
         
-        sheets_service = GoogleSheetsService(access_token)
+        sheets_service = GoogleSheetsService(access_token, user_id=request.user.pk)
         result = sheets_service.get_sheet_info(sheet_id)
         
         return Response(result)
@@ -806,7 +805,7 @@ def sheets_list_user_sheets(request):
         if not access_token:
             return Response({'error': 'Google access token required in X-Google-Access-Token header'}, status=400)
         
-        sheets_service = GoogleSheetsService(access_token)
+        sheets_service = GoogleSheetsService(access_token, user_id=request.user.pk)
         result = sheets_service.get_user_sheets()
         
         return Response(result)
@@ -828,7 +827,7 @@ def sheets_update_permissions(request, sheet_id):
         make_public = request.data.get('make_public_readable', False)
         make_editable = request.data.get('make_editable', False)
         
-        sheets_service = GoogleSheetsService(access_token)
+        sheets_service = GoogleSheetsService(access_token, user_id=request.user.pk)
         result = sheets_service.update_sheet_permissions(sheet_id, make_public, make_editable)
         
         return Response(result)
@@ -847,7 +846,7 @@ def sheets_get_data(request, sheet_id):
         if not access_token:
             return Response({'error': 'Google access token required in X-Google-Access-Token header'}, status=400)
 
-        sheets_service = GoogleSheetsService(access_token)
+        sheets_service = GoogleSheetsService(access_token, user_id=request.user.pk)
         result = sheets_service.get_sheet_data(sheet_id)
 
         return Response(result)
@@ -874,6 +873,33 @@ def sheets_get_data_service_account(request, sheet_id):
         return Response({'error': str(e)}, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sheets_client_metrics_service_account(request):
+    """Per-worker counters for pooled Google clients and sessions, the sheet snapshot cache, the write buffer, fan-out fetches and the Sheets rate limiter"""
+    try:
+        from utils.concurrent_fetch import fetcher
+        from utils.google_client_pool import client_registry
+        from utils.google_http import google_http
+        from utils.sheets_rate_limiter import rate_limiter
+        from utils.sheet_snapshot_cache import snapshot_cache
+        from utils.sheet_write_buffer import write_buffer
+
+        return Response({
+            'success': True,
+            'metrics': client_registry.get_metrics(),
+            'snapshot_cache': snapshot_cache.get_metrics(),
+            'write_buffer': write_buffer.get_metrics(),
+            'fan_out': fetcher.get_metrics(),
+            'http_pool': google_http.get_metrics(),
+            'rate_limiter': rate_limiter.get_metrics()
+        })
+
+    except Exception as e:
+        logger.error(f"Client metrics error: {str(e)}")
+        return Response({'error': str(e)}, status=500)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def sheets_update_cell_service_account(request, sheet_id):
@@ -898,6 +924,15 @@ def sheets_update_cell_service_account(request, sheet_id):
         return Response({'error': str(e)}, status=500)
 
 
+def _refresh_live_count(sheet_id):
+    """Refresh the stored student count of a sheet in the background after its roster changed."""
+    try:
+        from classrecord.live_counts import live_counts
+        live_counts.schedule([sheet_id])
+    except Exception as e:
+        logger.warning(f"Could not schedule live count refresh for {sheet_id}: {str(e)}")
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def sheets_add_student_service_account(request, sheet_id):
@@ -911,6 +946,8 @@ def sheets_add_student_service_account(request, sheet_id):
 
         service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
         result = service.add_student(sheet_id, student_data)
+        if result.get('success'):
+            _refresh_live_count(sheet_id)
 
         return Response(result)
 
@@ -944,6 +981,9 @@ def sheets_add_student_with_auto_number_service_account(request, sheet_id):
             print(f"🔍 API ENDPOINT: Calling add_student_with_auto_number without sheet_name")
             result = service.add_student_with_auto_number(sheet_id, student_data)
 
+        if result.get('success'):
+            _refresh_live_count(sheet_id)
+
         return Response(result)
 
     except Exception as e:
@@ -970,38 +1010,37 @@ def sheets_auto_number_students_service_account(request, sheet_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_class_records_with_live_counts_cached(request):
-    """Get class records with cached live student counts"""
+    """
+    Get class records with live student counts.
+
+    Counts come from ClassRecord.live_student_count and never wait for Google:
+    stale or missing counts are served as they are (flagged student_count_stale)
+    and refreshed in the background for the next load.
+    """
     try:
+        from classrecord.live_counts import live_counts
         from classrecord.models import ClassRecord
         from classrecord.serializers import ClassRecordSerializer
-        from utils.google_service_account_sheets import GoogleServiceAccountSheets
 
         # Get all class records for the user
-        class_records = ClassRecord.objects.filter(user=request.user).order_by('-created_at')
+        class_records = list(ClassRecord.objects.filter(user=request.user).order_by('-created_at'))
         serializer = ClassRecordSerializer(class_records, many=True)
         records_data = serializer.data
 
-        service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+        stale_sheet_ids = []
+        for class_record, record in zip(class_records, records_data):
+            if not class_record.google_sheet_id:
+                continue
+
+            if class_record.live_student_count is not None:
+                record['student_count'] = class_record.live_student_count
+            record['student_count_refreshed_at'] = class_record.live_count_refreshed_at
+            record['student_count_stale'] = live_counts.is_stale(class_record)
 
-        for record in records_data:
-            if record.get('google_sheet_id'):
-                # 🔥 Use cache with 2-minute expiry
-                cache_key = f"student_count_{record['google_sheet_id']}"
-                cached_count = cache.get(cache_key)
-
-                if cached_count is not None:
-                    # Use cached value
-                    record['student_count'] = cached_count
-                else:
-                    try:
-                        # Get fresh count and cache it
-                        live_count = service.get_student_count(record['google_sheet_id'])
-                        record['student_count'] = live_count
-
-                        # Cache for 2 minutes
-                        cache.set(cache_key, live_count, 120)
-                    except Exception as e:
-                        logger.warning(f"Could not get live count for record {record['id']}: {str(e)}")
+            if record['student_count_stale']:
+                stale_sheet_ids.append(class_record.google_sheet_id)
+
+        live_counts.schedule(stale_sheet_ids)
 
         return Response(records_data)
 
@@ -1086,6 +1125,60 @@ def sheets_update_cell_specific_sheet_service_account(request, sheet_id):
         return Response({'error': str(e)}, status=500)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sheets_queue_cell_update_service_account(request, sheet_id):
+    """Queue a cell edit in the write buffer; edits are written together in one batch"""
+    try:
+        from utils.google_service_account_sheets import GoogleServiceAccountSheets
+
+        row = request.data.get('row')  # 0-based index
+        student_name = request.data.get('student_name')  # Used to find the row when row is not given
+        column = request.data.get('column')  # Column name like 'QUIZ 1'
+        value = request.data.get('value')
+        sheet_name = request.data.get('sheet_name')
+
+        if (row is None and not student_name) or not column or value is None:
+            return Response({'error': 'row (or student_name), column, and value are required'}, status=400)
+
+        service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+        result = service.queue_cell_update(sheet_id, row, column, value, sheet_name, student_name=student_name)
+
+        return Response(result)
+
+    except Exception as e:
+        logger.error(f"Queue cell update error: {str(e)}")
+        return Response({'error': str(e)}, status=500)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sheets_flush_cell_updates_service_account(request, sheet_id):
+    """
+    Write all queued cell edits now and return their acknowledgements (end of a grading session).
+
+    Edits are buffered per worker process, so this request may reach a worker other than
+    the one that queued them. Send the edit ids from the queue responses: any this worker
+    has no ack for are returned in unknown_edit_ids with status 'unknown' (not confirmed
+    written), instead of a bare success.
+    """
+    try:
+        from utils.google_service_account_sheets import GoogleServiceAccountSheets
+
+        edit_ids = request.data.get('edit_ids')
+        if edit_ids is not None and not isinstance(edit_ids, list):
+            return Response({'error': 'edit_ids must be a list'}, status=400)
+
+        service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
+        result = service.flush_cell_updates(sheet_id, edit_ids=edit_ids)
+
+        return Response(result)
+
+    except Exception as e:
+        logger.error(f"Flush cell updates error: {str(e)}")
+        return Response({'error': str(e)}, status=500)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def sheets_import_students_preview(request, sheet_id):
@@ -1157,6 +1250,8 @@ def sheets_import_students_execute(request, sheet_id):
             resolved_conflicts,
             sheet_name
         )
+        if import_result.get('success'):
+            _refresh_live_count(sheet_id)
 
         return Response(import_result)
 
@@ -1225,6 +1320,10 @@ def sheets_execute_column_import(request, sheet_id):
         column_mappings = request.data.get('column_mappings', [])
         import_data = request.data.get('import_data', {})
         sheet_name = request.data.get('sheet_name')  # Optional specific sheet
+        try:
+            dry_run = serializers.BooleanField().to_internal_value(request.data.get('dry_run', False))
+        except serializers.ValidationError:
+            return Response({'error': 'dry_run must be true or false'}, status=400)
 
         if not column_mappings:
             return Response({'error': 'Column mappings are required'}, status=400)
@@ -1234,12 +1333,13 @@ def sheets_execute_column_import(request, sheet_id):
 
         service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
 
-        # Execute the column import
+        # Execute the column import (dry_run returns the write plan without writing)
         import_result = service.import_column_data_with_mapping(
             sheet_id,
             column_mappings,
             import_data,
-            sheet_name
+            sheet_name,
+            dry_run=dry_run
         )
 
         return Response(import_result)
@@ -1334,6 +1434,10 @@ def sheets_execute_column_import_enhanced(request, sheet_id):
         import_data = request.data.get('import_data', {})
         sheet_name = request.data.get('sheet_name')
         class_record_id = request.data.get('class_record_id')  # 🔥 NEW: Need class record ID
+        try:
+            dry_run = serializers.BooleanField().to_internal_value(request.data.get('dry_run', False))
+        except serializers.ValidationError:
+            return Response({'error': 'dry_run must be true or false'}, status=400)
 
         if not column_mappings:
             return Response({'error': 'Column mappings are required'}, status=400)
@@ -1350,16 +1454,17 @@ def sheets_execute_column_import_enhanced(request, sheet_id):
 
         service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
 
-        # Execute the column import
+        # Execute the column import (dry_run returns the write plan without writing)
         import_result = service.import_column_data_with_mapping(
             sheet_id,
             column_mappings,
             import_data,
-            sheet_name
+            sheet_name,
+            dry_run=dry_run
         )
 
         # 🔥 NEW: Save import history after successful import
-        if import_result['success'] and class_record_id:
+        if import_result['success'] and class_record_id and not dry_run:
             history_result = service.save_import_history(
                 column_mappings,
                 import_data,
@@ -1438,11 +1543,14 @@ def sheets_update_batch_max_scores_service_account(request, sheet_id):
         from utils.google_service_account_sheets import GoogleServiceAccountSheets
 
         column_names = request.data.get('column_names', [])  # e.g., ['QUIZ 1', 'QUIZ 2']
+        category = request.data.get('category')              # e.g., 'QUIZ' for every quiz column
+        pattern = request.data.get('pattern')                # e.g., 'LAB *'
         max_score = request.data.get('max_score')            # e.g., '20'
         sheet_name = request.data.get('sheet_name')          # Optional specific sheet
 
-        if not column_names or max_score is None:
-            return Response({'error': 'column_names (array) and max_score are required'}, status=400)
+        if (not column_names and not category and not pattern) or max_score is None:
+            return Response({'error': 'column_names (array) or category/pattern, and max_score are required'},
+                            status=400)
 
         # Validate max score is a positive number
         try:
@@ -1455,7 +1563,9 @@ def sheets_update_batch_max_scores_service_account(request, sheet_id):
         service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
 
         # Update the batch max scores
-        result = service.update_batch_max_scores_in_sheet(sheet_id, column_names, str(max_score), sheet_name)
+        result = service.update_batch_max_scores_in_sheet(
+            sheet_id, column_names, str(max_score), sheet_name, category=category, pattern=pattern
+        )
 
         return Response(result)
 
@@ -1513,6 +1623,7 @@ def delete_student_from_sheet(request, sheet_id):
         result = service.delete_student_from_sheet(sheet_id, student_identifier, search_type, sheet_name)
 
         if result['success']:
+            _refresh_live_count(sheet_id)
             return Response(result, status=200)
         else:
             return Response(result, status=400)
@@ -1530,6 +1641,7 @@ def update_multiple_cells_service_account(request, sheet_id):
     """Update multiple individual cells while preserving formulas"""
     try:
         from utils.google_service_account_sheets import GoogleServiceAccountSheets
+        from utils.sheet_write_buffer import write_buffer
 
         updates = request.data.get('updates', [])  # Array of {range, values}
         sheet_name = request.data.get('sheet_name')
@@ -1539,16 +1651,22 @@ def update_multiple_cells_service_account(request, sheet_id):
 
         service = GoogleServiceAccountSheets(settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS)
 
+        # Queued single-cell edits go first, so they cannot overwrite these values later
+        write_buffer.flush(sheet_id, collect=False)
+
         # Execute batch update
         body = {
             'valueInputOption': 'USER_ENTERED',
             'data': updates
         }
 
-        result = service.sheets_service.spreadsheets().values().batchUpdate(
-            spreadsheetId=sheet_id,
-            body=body
-        ).execute()
+        try:
+            result = service.sheets_service.spreadsheets().values().batchUpdate(
+                spreadsheetId=sheet_id,
+                body=body
+            ).execute()
+        finally:
+            service.invalidate_cache(sheet_id)
 
         return Response({
             'success': True,
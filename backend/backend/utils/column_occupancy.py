@@ -0,0 +1,70 @@
+from typing import Dict, List
+
+from utils.sheet_columns import SheetColumnMap
+
+
+class ColumnStats:
+    """How much of one column is filled in, and by whom."""
+
+    __slots__ = ('index', 'data_count', 'sample_values', 'student_data')
+
+    def __init__(self, index: int, data_count: int, sample_values: List[str], student_data: List[Dict]):
+        self.index = index
+        self.data_count = data_count
+        self.sample_values = sample_values
+        self.student_data = student_data
+
+    @property
+    def has_data(self) -> bool:
+        return self.data_count > 0
+
+
+class ColumnOccupancy:
+    """
+    Fill counts, sample values and per-student presence for every column of a
+    sheet, computed in one pass over a column-major view of the data rows.
+
+    Built once per snapshot and shared by the column-mapping analysis and the
+    import preview.
+    """
+
+    def __init__(self, table_data: List[List], columns: SheetColumnMap, sample_limit: int = 3,
+                 student_limit: int = 5):
+        width = len(columns)
+        rows = [list(row[:width]) + [''] * (width - len(row)) for row in table_data]
+
+        # Rows counted as students for fill percentages: NO. or LASTNAME present
+        self.total_students = sum(1 for row in rows if any(str(cell).strip() for cell in row[:2]))
+
+        names = {}
+        if columns.first_name is not None and columns.last_name is not None:
+            first_idx, last_idx = columns.first_name.index, columns.last_name.index
+            for row_index, row in enumerate(rows):
+                name = f"{str(row[first_idx] or '').strip()} {str(row[last_idx] or '').strip()}".strip()
+                if name:
+                    names[row_index] = name
+
+        self.stats = []
+        for index, values in enumerate(zip(*rows) if rows else [()] * width):
+            filled = [(row_index, str(value).strip()) for row_index, value in enumerate(values)
+                      if value and str(value).strip()]
+
+            student_data = []
+            for row_index, value in filled:
+                if len(student_data) >= student_limit:
+                    break
+                if row_index in names:
+                    student_data.append({'name': names[row_index], 'score': value, 'rowIndex': row_index})
+
+            self.stats.append(ColumnStats(
+                index,
+                len(filled),
+                [value for _, value in filled[:sample_limit]],
+                student_data
+            ))
+
+    def __getitem__(self, index: int) -> ColumnStats:
+        return self.stats[index]
+
+    def fill_percentage(self, index: int) -> float:
+        return self.stats[index].data_count / self.total_students if self.total_students > 0 else 0
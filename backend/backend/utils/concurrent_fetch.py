@@ -0,0 +1,219 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Threads shared by every fan-out in the worker process
+    'MAX_WORKERS': 8,
+    # Calls in flight to one host at a time, across all fan-outs
+    'PER_HOST_LIMIT': 4,
+    # Used when a fan-out doesn't pass its own deadline
+    'DEFAULT_DEADLINE_SECONDS': 25,
+}
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """Point in time by which a fan-out (and everything it calls) must be done."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for one HTTP call: cap, or less if the deadline is closer."""
+        return max(min(cap, self.remaining()), 0.1)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the fan-out task running on this thread, if any."""
+    return getattr(_local, 'deadline', None)
+
+
+def request_timeout(default: float) -> float:
+    """HTTP timeout that respects the deadline of the surrounding fan-out."""
+    deadline = current_deadline()
+    return deadline.timeout(default) if deadline else default
+
+
+class FanOutResult:
+    """
+    Outcome of a fan-out. Results of calls that failed or missed the deadline are
+    missing; their keys are in errors / timed_out instead.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.timed_out = []
+        self.elapsed = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors and not self.timed_out
+
+    def get(self, key, default=None):
+        return self.results.get(key, default)
+
+    def error_for(self, key) -> Optional[str]:
+        if key in self.timed_out:
+            return 'Timed out'
+        return self.errors.get(key)
+
+
+class ConcurrentFetcher:
+    """
+    Runs independent Google calls (tabs, spreadsheets) in parallel, so N calls
+    take about as long as the slowest one instead of their sum.
+
+    The thread pool is shared by the worker process and bounded, and a semaphore
+    per host caps how many calls go to one API at once. Every fan-out has a
+    deadline: calls still pending when it passes are reported as timed out
+    rather than waited for. Code running inside a task can read the deadline
+    through request_timeout()/current_deadline(); a fan-out started from inside a
+    task runs inline under the outer deadline instead of waiting on the pool.
+
+    Tasks run on pool threads, so they must not use httplib2-based clients built
+    on another thread.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._host_semaphores = {}
+        self._metrics = {
+            'fan_outs': 0,
+            'tasks': 0,
+            'tasks_failed': 0,
+            'tasks_timed_out': 0,
+        }
+
+    def run(self, tasks: Dict[Hashable, Callable], host: str = None,
+            deadline_seconds: float = None) -> FanOutResult:
+        """
+        Call every task and collect what finished before the deadline.
+
+        Args:
+            tasks: Dict of key -> zero-argument callable
+            host: Host the calls go to, for the per-host limit (e.g. 'sheets.googleapis.com')
+            deadline_seconds: Time budget for the whole fan-out
+
+        Returns:
+            FanOutResult with results by key, plus errors and timed-out keys
+        """
+        result = FanOutResult()
+        if not tasks:
+            return result
+
+        deadline = Deadline(deadline_seconds or self.config['DEFAULT_DEADLINE_SECONDS'])
+        outer = current_deadline()
+        if outer is not None and outer.expires_at < deadline.expires_at:
+            deadline = outer
+
+        started = time.monotonic()
+        with self._lock:
+            self._metrics['fan_outs'] += 1
+            self._metrics['tasks'] += len(tasks)
+
+        nested = getattr(_local, 'in_task', False)
+        if nested or len(tasks) <= 1:
+            # Nested fan-outs (and single calls) run on the calling thread; a nested
+            # one already holds a host slot, so it doesn't take another
+            for key, task in tasks.items():
+                try:
+                    result.results[key] = self._call(task, host, deadline, limit=not nested)
+                except DeadlineExceeded:
+                    result.timed_out.append(key)
+                except Exception as e:
+                    result.errors[key] = str(e)
+        else:
+            executor = self._get_executor()
+            futures = {executor.submit(self._call, task, host, deadline): key for key, task in tasks.items()}
+            done, not_done = wait(futures, timeout=deadline.remaining())
+
+            for future in not_done:
+                future.cancel()
+                result.timed_out.append(futures[future])
+            for future in done:
+                key = futures[future]
+                try:
+                    result.results[key] = future.result()
+                except DeadlineExceeded:
+                    result.timed_out.append(key)
+                except Exception as e:
+                    result.errors[key] = str(e)
+
+        result.elapsed = time.monotonic() - started
+        with self._lock:
+            self._metrics['tasks_failed'] += len(result.errors)
+            self._metrics['tasks_timed_out'] += len(result.timed_out)
+
+        if not result.complete:
+            logger.warning(f"Fan-out to {host or 'google'}: {len(result.results)}/{len(tasks)} done, "
+                           f"{len(result.errors)} failed, {len(result.timed_out)} timed out")
+        return result
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return dict(self._metrics)
+
+    def _call(self, task: Callable, host: Optional[str], deadline: Deadline, limit: bool = True):
+        semaphore = self._get_host_semaphore(host) if limit else None
+        if semaphore is not None and not semaphore.acquire(timeout=deadline.remaining()):
+            raise DeadlineExceeded()
+
+        previous = (getattr(_local, 'deadline', None), getattr(_local, 'in_task', False))
+        _local.deadline, _local.in_task = deadline, True
+        try:
+            if deadline.expired:
+                raise DeadlineExceeded()
+            return task()
+        finally:
+            _local.deadline, _local.in_task = previous
+            if semaphore is not None:
+                semaphore.release()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config['MAX_WORKERS'], thread_name_prefix='google-fetch'
+                )
+            return self._executor
+
+    def _get_host_semaphore(self, host: Optional[str]) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.config['PER_HOST_LIMIT'])
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+
+def _load_config() -> Dict:
+    try:
+        from django.conf import settings
+        return getattr(settings, 'GOOGLE_FETCH_CONCURRENCY', {})
+    except Exception:
+        return {}
+
+
+fetcher = ConcurrentFetcher(_load_config())
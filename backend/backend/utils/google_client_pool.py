@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+import google_auth_httplib2
+import httplib2
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from utils.sheets_rate_limiter import RateLimitedHttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCOPES = (
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets',
+)
+
+
+class GoogleClientRegistry:
+    """
+    Process-wide registry of service account credentials and Google API clients.
+
+    Credentials are parsed once per worker and shared by every thread, so the
+    OAuth token is refreshed once per worker instead of once per request. The
+    discovery-built Drive/Sheets resources sit on top of httplib2, which is not
+    thread-safe, so each thread gets its own pair, built once and then reused
+    together with its authorized HTTP transport (keep-alive connections).
+    """
+
+    # Refresh a bit before Google's expiry so in-flight calls never race it
+    REFRESH_MARGIN = timedelta(minutes=5)
+    # After a failed refresh, let the transport handle auth for a while
+    REFRESH_RETRY_AFTER = timedelta(seconds=30)
+
+    def __init__(self, http_timeout: int = 30):
+        self._http_timeout = http_timeout
+        self._lock = threading.Lock()
+        self._credentials = {}
+        self._refresh_locks = {}
+        self._refresh_failed_at = {}
+        self._local = threading.local()
+        self._token_session = requests.Session()
+        self._metrics = {
+            'credentials_parsed': 0,
+            'credentials_reused': 0,
+            'service_builds': 0,
+            'service_builds_avoided': 0,
+            'token_refreshes': 0,
+            'token_refreshes_avoided': 0,
+            'token_refresh_failures': 0,
+        }
+
+    @staticmethod
+    def _fingerprint(credentials_info: Dict, scopes: Iterable[str]) -> str:
+        raw = '|'.join([
+            str(credentials_info.get('client_email', '')),
+            str(credentials_info.get('private_key_id', '')),
+            ' '.join(sorted(scopes)),
+        ])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def _get_credentials(self, key: str, credentials_info: Dict, scopes: Tuple[str, ...]):
+        with self._lock:
+            credentials = self._credentials.get(key)
+            if credentials is not None:
+                self._metrics['credentials_reused'] += 1
+                return credentials
+
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_info,
+                scopes=list(scopes)
+            )
+            self._credentials[key] = credentials
+            self._refresh_locks[key] = threading.Lock()
+            self._metrics['credentials_parsed'] += 1
+            return credentials
+
+    def _needs_refresh(self, credentials) -> bool:
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        return credentials.expiry - datetime.utcnow() <= self.REFRESH_MARGIN
+
+    def _ensure_fresh(self, key: str, credentials):
+        """Refresh the shared token at most once per worker per expiry window."""
+        if not self._needs_refresh(credentials):
+            self._count('token_refreshes_avoided')
+            return
+
+        with self._refresh_locks[key]:
+            # Another thread may have refreshed while we were waiting
+            if not self._needs_refresh(credentials):
+                self._count('token_refreshes_avoided')
+                return
+
+            failed_at = self._refresh_failed_at.get(key)
+            if failed_at and datetime.utcnow() - failed_at < self.REFRESH_RETRY_AFTER:
+                return
+
+            try:
+                credentials.refresh(Request(session=self._token_session))
+                self._refresh_failed_at.pop(key, None)
+                self._count('token_refreshes')
+            except Exception as e:
+                # Leave it to the authorized transport to retry on the first call
+                self._refresh_failed_at[key] = datetime.utcnow()
+                self._count('token_refresh_failures')
+                logger.warning(f"Service account token refresh failed: {str(e)}")
+
+    def get_clients(self, credentials_info: Dict, scopes: Iterable[str] = DEFAULT_SCOPES):
+        """
+        Get the shared credentials and this thread's Drive/Sheets clients.
+
+        Args:
+            credentials_info: Dictionary containing service account credentials.
+            scopes: OAuth scopes the clients need.
+
+        Returns:
+            Tuple of (credentials, drive_service, sheets_service).
+        """
+        scopes = tuple(scopes)
+        key = self._fingerprint(credentials_info, scopes)
+        credentials = self._get_credentials(key, credentials_info, scopes)
+        self._ensure_fresh(key, credentials)
+
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+
+        if key in services:
+            self._count('service_builds_avoided', 2)
+            drive_service, sheets_service = services[key]
+            return credentials, drive_service, sheets_service
+
+        # One keep-alive transport per thread, shared by both resources
+        authorized_http = google_auth_httplib2.AuthorizedHttp(
+            credentials,
+            http=httplib2.Http(timeout=self._http_timeout)
+        )
+        # Sheets calls wait for quota and are retried on 429/5xx
+        authorized_http = RateLimitedHttp(authorized_http, account=credentials_info.get('client_email', key))
+        drive_service = build('drive', 'v3', http=authorized_http, cache_discovery=False)
+        sheets_service = build('sheets', 'v4', http=authorized_http, cache_discovery=False)
+        services[key] = (drive_service, sheets_service)
+        self._count('service_builds', 2)
+
+        logger.info(f"Built Google API clients for worker {os.getpid()} thread {threading.get_ident()}")
+        return credentials, drive_service, sheets_service
+
+    def get_metrics(self) -> Dict:
+        """Return this worker's client reuse counters."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['pid'] = os.getpid()
+        metrics['cached_credentials'] = len(self._credentials)
+        return metrics
+
+
+client_registry = GoogleClientRegistry()
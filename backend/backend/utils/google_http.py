@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.concurrent_fetch import current_deadline
+from utils.sheets_rate_limiter import is_rate_limited, parse_sheets_call, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Connection pools kept (one per host: sheets, drive, upload)
+    'POOL_CONNECTIONS': 4,
+    # Keep-alive connections per host; above the fan-out per-host limit
+    'POOL_MAXSIZE': 10,
+    # Retries of idempotent calls on 429/5xx, with exponential backoff. Sheets calls
+    # are retried by the rate limiter instead (its MAX_RETRIES), so each resend takes a token
+    'RETRIES': 3,
+    'BACKOFF_FACTOR': 0.5,
+    # Used when a call doesn't pass its own timeout
+    'DEFAULT_TIMEOUT': 15,
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Google only gzips responses when the User-Agent mentions it
+USER_AGENT = 'Vocalyx (gzip)'
+
+# Request header naming the user whose Sheets quota a call counts against.
+# The adapter removes it, so it is never sent to Google.
+ACCOUNT_HEADER = 'X-Rate-Limit-Account'
+
+
+class _GoogleAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that fills in the default timeout and counts retries.
+
+    Sheets calls go through the rate limiter, which also retries them on 429/5xx:
+    every resend takes a token and a 429 slows the user's buckets. The adapter
+    mounted for the Sheets host therefore leaves status retries to send().
+    """
+
+    def __init__(self, pool: 'GoogleHttpPool', default_timeout: float, **kwargs):
+        self._pool = pool
+        self._default_timeout = default_timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        timeout = timeout or self._default_timeout
+        account = request.headers.pop(ACCOUNT_HEADER, None)
+        is_sheets, spreadsheet_id, write, idempotent = parse_sheets_call(request.url, request.method)
+        if not is_sheets:
+            response = super().send(request, timeout=timeout, **kwargs)
+            retries = getattr(response.raw, 'retries', None)
+            self._pool._count_request(len(retries.history) if retries else 0)
+            return response
+
+        if not account:
+            # Each user's token has its own Sheets quota
+            token = request.headers.get('Authorization', '')
+            account = 'token:' + hashlib.sha1(token.encode('utf-8')).hexdigest()[:12]
+
+        attempt = 0
+        while True:
+            rate_limiter.acquire(account, spreadsheet_id, write)
+            response = super().send(request, timeout=timeout, **kwargs)
+
+            status = response.status_code
+            rate_limited = status in (403, 429) and is_rate_limited(status, response.content)
+            if not rate_limited and (status not in RETRY_STATUSES or not idempotent):
+                break
+
+            if rate_limited:
+                rate_limiter.penalize(account, spreadsheet_id, write)
+            if attempt >= rate_limiter.config['MAX_RETRIES']:
+                rate_limiter.record_exhausted()
+                logger.warning(f"Sheets call still failing with {status} after {attempt} retries: "
+                               f"{request.method} {request.url}")
+                break
+
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired:
+                break
+            delay = rate_limiter.backoff_seconds(attempt, response.headers.get('Retry-After'))
+
+            logger.info(f"Sheets call got {status}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            response.close()
+            time.sleep(delay)
+            rate_limiter.record_retry(delay)
+            attempt += 1
+
+        self._pool._count_request(attempt)
+        return response
+
+
+class GoogleHttpPool:
+    """
+    Process-wide requests.Session for the user-token Google services.
+
+    Calls made with requests.get/post open a new TLS connection each time; going
+    through this session keeps connections to sheets.googleapis.com and
+    www.googleapis.com alive between calls and requests. Idempotent calls (GET,
+    PUT, DELETE) are retried on 429/5xx with backoff, honouring Retry-After;
+    POSTs are not, since creating a spreadsheet or file twice is worse than an
+    error. Sheets calls are rate limited and retried per user (pass the user in
+    ACCOUNT_HEADER; otherwise the token stands in for them). Responses are gzipped.
+
+    The session is shared by every thread of the worker; it holds no cookies
+    the services rely on, and urllib3's connection pools are thread-safe.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._lock = threading.Lock()
+        self._session = None
+        self._metrics = {
+            'requests': 0,
+            'retries': 0,
+        }
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session()
+            return self._session
+
+    def _build_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.config['RETRIES'],
+            backoff_factor=self.config['BACKOFF_FACTOR'],
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']),
+            respect_retry_after_header=True,
+            # Hand the last response back so callers keep checking status_code
+            raise_on_status=False
+        )
+        adapter = _GoogleAdapter(
+            self,
+            self.config['DEFAULT_TIMEOUT'],
+            pool_connections=self.config['POOL_CONNECTIONS'],
+            pool_maxsize=self.config['POOL_MAXSIZE'],
+            max_retries=retry
+        )
+        # Only connection failures are retried here; the request never reached Google
+        sheets_adapter = _GoogleAdapter(
+            self,
+            self.config['DEFAULT_TIMEOUT'],
+            pool_connections=1,
+            pool_maxsize=self.config['POOL_MAXSIZE'],
+            max_retries=Retry(
+                total=self.config['RETRIES'],
+                connect=self.config['RETRIES'],
+                read=0,
+                status=0,
+                other=0,
+                backoff_factor=self.config['BACKOFF_FACTOR'],
+                raise_on_status=False
+            )
+        )
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('https://sheets.googleapis.com/', sheets_adapter)
+        session.headers.update({
+            'Accept-Encoding': 'gzip',
+            'User-Agent': USER_AGENT
+        })
+        logger.info("Built pooled HTTP session for Google APIs")
+        return session
+
+    def _count_request(self, retries: int):
+        with self._lock:
+            self._metrics['requests'] += 1
+            self._metrics['retries'] += retries
+
+    def get_metrics(self) -> Dict:
+        """
+        Request counters, plus connections opened per host. Requests beyond the
+        connections opened were sent over a reused connection.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            session = self._session
+
+        hosts = {}
+        adapters = list(session.adapters.values()) if session is not None else []
+        for adapter in adapters:
+            if not isinstance(adapter, _GoogleAdapter):
+                continue
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                hosts[pool.host] = {
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'connections_reused': max(pool.num_requests - pool.num_connections, 0)
+                }
+        metrics['hosts'] = hosts
+        metrics['connections_opened'] = sum(host['connections_opened'] for host in hosts.values())
+        metrics['connections_reused'] = sum(host['connections_reused'] for host in hosts.values())
+        return metrics
+
+
+def _load_config() -> Dict:
+    try:
+        from django.conf import settings
+        return getattr(settings, 'GOOGLE_HTTP_POOL', {})
+    except Exception:
+        return {}
+
+
+google_http = GoogleHttpPool(_load_config())
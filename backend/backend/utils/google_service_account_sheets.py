@@ -1,13 +1,59 @@
 import logging
+import threading
+import time
 import requests
-from typing import Dict
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Dict, Optional
 from googleapiclient.errors import HttpError
 
+from utils.column_occupancy import ColumnOccupancy
+from utils.concurrent_fetch import fetcher
+from utils.google_client_pool import client_registry
+from utils.sheet_columns import SheetColumnMap, build_block_updates, build_range_updates, column_letter
+from utils.sheet_snapshot_cache import METADATA_FIELDS, SheetSnapshot, build_metadata, snapshot_cache
+from utils.sheets_rate_limiter import BULK, rate_limiter
+from utils.sheet_write_buffer import build_ack, write_buffer
+from utils.student_index import StudentIndex
+
 logger = logging.getLogger(__name__)
 
 
+# Row moves (delete, compact) of one spreadsheet run one at a time within a worker
+_sheet_locks = {}
+_sheet_locks_guard = threading.Lock()
+
+
+def _get_sheet_lock(sheet_id: str) -> threading.RLock:
+    with _sheet_locks_guard:
+        return _sheet_locks.setdefault(sheet_id, threading.RLock())
+
+
+def _writes_sheet(structure_changed: bool = False):
+    """
+    Mark a method as writing to the spreadsheet passed as its first argument, so
+    cached snapshots of that spreadsheet are invalidated once it returns. Buffered
+    cell edits are flushed first, so they land before rows are moved or rewritten.
+    Calls with dry_run=True don't write, so they do neither.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, sheet_id, *args, **kwargs):
+            if kwargs.get('dry_run'):
+                return method(self, sheet_id, *args, **kwargs)
+            if write_buffer.pending_count(sheet_id):
+                write_buffer.flush(sheet_id, collect=False)
+            try:
+                return method(self, sheet_id, *args, **kwargs)
+            finally:
+                self._invalidate_snapshots(sheet_id, structure_changed)
+
+        return wrapper
+
+    return decorator
+
+
 class GoogleServiceAccountSheets:
     """
     Service for Google Sheets operations using a service account.
@@ -15,19 +61,25 @@ class GoogleServiceAccountSheets:
 
     DRIVE_API_BASE_URL = "https://www.googleapis.com/drive/v3"
 
+    # Only what is needed to address tabs and size reads, not the whole spreadsheet resource
+    METADATA_FIELDS = METADATA_FIELDS
+
+    # Rows per values.get; sheets with a larger grid are read in chunks of this size
+    READ_CHUNK_ROWS = 1000
+
     def __init__(self, credentials_info: Dict):
         """
         Initialize with service account credentials.
 
+        Clients come from the per-worker registry, so constructing this service
+        per request no longer re-parses credentials or rebuilds discovery clients.
+
         Args:
             credentials_info: Dictionary containing service account credentials.
         """
-        self.credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/drive', 'https://www.googleapis.com/auth/spreadsheets']
-        )
-        self.drive_service = build('drive', 'v3', credentials=self.credentials)
-        self.sheets_service = build('sheets', 'v4', credentials=self.credentials)
+        self.credentials_info = credentials_info
+        self.credentials, self.drive_service, self.sheets_service = client_registry.get_clients(credentials_info)
+        self._client_thread = threading.get_ident()
 
     def copy_template_sheet(self, template_file_id: str, new_name: str) -> Dict:
         """
@@ -158,25 +210,298 @@ class GoogleServiceAccountSheets:
     def get_sheet_data(self, sheet_id: str) -> dict:
         """
         Get data from a Google Sheet using service account.
-        Updated to handle 3-row header structure and extended column range.
+        Served from the snapshot cache when the sheet has not changed since the last read.
+        """
+        return self._get_snapshot(sheet_id).as_dict()
+
+    def _get_file_freshness(self, sheet_id: str) -> tuple:
+        """
+        Get the Drive version and modifiedTime (epoch seconds) of a spreadsheet,
+        used to validate cached snapshots without re-reading the sheet.
         """
         try:
-            # Get sheet metadata first
-            spreadsheet = self.sheets_service.spreadsheets().get(spreadsheetId=sheet_id).execute()
+            file_info = self.drive_service.files().get(
+                fileId=sheet_id,
+                fields='version,modifiedTime'
+            ).execute()
+
+            modified_time = file_info.get('modifiedTime')
+            modified_timestamp = None
+            if modified_time:
+                modified_timestamp = datetime.strptime(
+                    modified_time, '%Y-%m-%dT%H:%M:%S.%fZ'
+                ).replace(tzinfo=timezone.utc).timestamp()
+
+            return file_info.get('version'), modified_timestamp
 
-            # Get the first sheet name
-            first_sheet = spreadsheet['sheets'][0]['properties']['title']
+        except Exception as e:
+            logger.warning(f"Could not get file version for snapshot validation: {str(e)}")
+            return None, None
 
-            # 🔥 FIXED: Extended range to cover columns beyond Z
-            range_name = f"{first_sheet}!A1:AM100"  # Changed from A1:Z100 to A1:AM100
-            print(f"🔍 GET SHEET DATA: Requesting range: {range_name}")
+    def _headers_unchanged(self, sheet_id: str, snapshot: SheetSnapshot) -> bool:
+        """
+        Check that the header rows (categories and column names) of a sheet are still
+        the ones a snapshot was read with, so its column letters can still be used.
+        """
+        if not snapshot.success:
+            return False
 
+        def trimmed(rows):
+            rows = [[str(cell) for cell in row] for row in rows]
+            for row in rows:
+                while row and not row[-1]:
+                    row.pop()
+            while rows and not rows[-1]:
+                rows.pop()
+            return rows
+
+        try:
             result = self.sheets_service.spreadsheets().values().get(
                 spreadsheetId=sheet_id,
-                range=range_name
+                range=f"'{snapshot.data['sheet_name']}'!1:2"
             ).execute()
+        except Exception as e:
+            logger.warning(f"Could not read header rows for snapshot validation: {str(e)}")
+            return False
+
+        expected = [snapshot.data.get('main_headers') or [], snapshot.data.get('sub_headers') or []]
+        return trimmed(result.get('values', [])) == trimmed(expected)
 
-            values = result.get('values', [])
+    def _get_snapshot(self, sheet_id: str, sheet_name: str = None, structure_only: bool = False,
+                      fresh: bool = False) -> SheetSnapshot:
+        """
+        Get a cached snapshot of a sheet, reading it from the API only when needed.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
+            structure_only: Caller only needs headers/sheet name (e.g. to address a cell),
+                            so a snapshot whose values changed through our own writes is fine
+                            as long as its header rows are unchanged
+            fresh: Always read from the API (the result is still cached), for paths that
+                   rewrite rows from the values they read and must not act on stale data
+
+        Returns:
+            SheetSnapshot whose data is the same dict get_sheet_data returns. Treat it as read-only.
+        """
+        key = (sheet_id, sheet_name)
+        snapshot = snapshot_cache.get(key)
+        version = None
+
+        if fresh:
+            snapshot_cache.count('forced_refetches')
+        elif snapshot is None or snapshot_cache.is_expired(snapshot):
+            snapshot_cache.count('misses')
+        elif structure_only and snapshot_cache.is_structure_usable(snapshot):
+            # Our own value writes change the Drive version, so check the header rows instead
+            if snapshot_cache.is_structure_fresh(snapshot):
+                snapshot_cache.count('structure_hits')
+                return snapshot
+            if self._headers_unchanged(sheet_id, snapshot):
+                snapshot_cache.mark_structure_validated(snapshot)
+                snapshot_cache.count('structure_validated_hits')
+                return snapshot
+            snapshot_cache.count('stale_refetches')
+        elif snapshot.dirty:
+            snapshot_cache.count('dirty_refetches')
+        elif snapshot_cache.is_fresh(snapshot):
+            snapshot_cache.count('hits')
+            return snapshot
+        else:
+            version, modified_timestamp = self._get_file_freshness(sheet_id)
+            if snapshot_cache.is_unchanged(snapshot, version, modified_timestamp):
+                snapshot_cache.mark_validated(snapshot, version)
+                snapshot_cache.count('validated_hits')
+                return snapshot
+            snapshot_cache.count('stale_refetches')
+
+        if sheet_name:
+            sheet_data = self._read_specific_sheet_data(sheet_id, sheet_name)
+        else:
+            sheet_data = self._read_sheet_data(sheet_id)
+
+        snapshot = SheetSnapshot(sheet_data, version)
+        snapshot_cache.put(key, snapshot)
+        return snapshot
+
+    def _get_column_map(self, snapshot: SheetSnapshot) -> SheetColumnMap:
+        """Column descriptors of a snapshot, built once and shared by every read and write path."""
+        return snapshot.derived('columns', lambda: SheetColumnMap.from_sheet_data(snapshot.data))
+
+    def _get_column_occupancy(self, snapshot: SheetSnapshot) -> ColumnOccupancy:
+        """Fill counts and samples of every column of a snapshot, computed once per snapshot."""
+        columns = self._get_column_map(snapshot)
+        return snapshot.derived('occupancy', lambda: ColumnOccupancy(snapshot.data['tableData'], columns))
+
+    def _get_student_index(self, snapshot: SheetSnapshot) -> StudentIndex:
+        """Name/ID lookups over the students of a snapshot, built once per snapshot."""
+        # Build the column map first; derived() doesn't allow nested builds on one snapshot
+        columns = self._get_column_map(snapshot)
+        return snapshot.derived('students', lambda: StudentIndex(snapshot.data['tableData'], columns))
+
+    def _get_spreadsheet_metadata(self, sheet_id: str, refresh: bool = False) -> dict:
+        """
+        Get tab titles, ids and grid sizes of a spreadsheet, cached per spreadsheet.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            refresh: Skip the cache, e.g. when a read ran into the cached grid bound
+
+        Returns:
+            Dict with 'title', 'sheets' (list of sheet properties in tab order) and 'fetched_at'
+        """
+        metadata = None if refresh else snapshot_cache.get_metadata(sheet_id)
+        if metadata is None:
+            spreadsheet = self.sheets_service.spreadsheets().get(
+                spreadsheetId=sheet_id,
+                fields=self.METADATA_FIELDS
+            ).execute()
+
+            metadata = build_metadata(spreadsheet)
+            snapshot_cache.put_metadata(sheet_id, metadata)
+
+        return metadata
+
+    def _get_sheet_properties(self, sheet_id: str, sheet_name: str = None, refresh: bool = False) -> dict:
+        """
+        Get the properties (title, sheetId, gridProperties) of one tab.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheet_name: Name of the tab (if None, uses first sheet)
+            refresh: Skip the metadata cache
+
+        Returns:
+            Sheet properties dict, or None if there is no such tab
+        """
+        metadata = self._get_spreadsheet_metadata(sheet_id, refresh=refresh)
+        sheets = metadata['sheets']
+
+        if not sheet_name:
+            return sheets[0] if sheets else None
+
+        for properties in sheets:
+            if properties.get('title') == sheet_name:
+                return properties
+
+        # The tab may have been added or renamed since the metadata was cached
+        if not refresh:
+            return self._get_sheet_properties(sheet_id, sheet_name, refresh=True)
+        return None
+
+    def iter_sheet_rows(self, sheet_id: str, sheet_name: str = None, chunk_rows: int = None,
+                        start_row: int = 1):
+        """
+        Read a tab's used range in chunks of rows.
+
+        Each request is bounded by the tab's grid size, so a small sheet only asks for
+        the columns and rows it has, while sheets larger than one chunk are paged
+        through instead of being cut off at a fixed window. The API trims trailing
+        empty cells, so a chunk may hold fewer rows than requested.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheet_name: Name of the tab (if None, uses first sheet)
+            chunk_rows: Rows per request (defaults to READ_CHUNK_ROWS)
+            start_row: 1-based sheet row to start reading at
+
+        Yields:
+            Tuples of (1-based sheet row of the first row in the chunk, list of rows)
+        """
+        chunk_rows = chunk_rows or self.READ_CHUNK_ROWS
+        read_started = time.monotonic()
+        properties = self._get_sheet_properties(sheet_id, sheet_name)
+        if properties is None:
+            raise ValueError(f'Sheet "{sheet_name}" not found')
+
+        title = properties['title']
+        refreshed = False
+
+        # Rows before start_row were read by the caller up to a chunk boundary
+        reached_bound = start_row > 1
+
+        while True:
+            grid = properties.get('gridProperties', {})
+            row_count = grid.get('rowCount') or chunk_rows
+            last_column = column_letter(max(grid.get('columnCount') or 1, 1) - 1)
+
+            if start_row > row_count:
+                # Value writes past the last row grow the grid, so data reaching a
+                # cached bound means the sheet may be bigger than we think
+                metadata_was_cached = self._get_spreadsheet_metadata(sheet_id)['fetched_at'] < read_started
+                if reached_bound and metadata_was_cached and not refreshed:
+                    refreshed = True
+                    properties = self._get_sheet_properties(sheet_id, title, refresh=True) or properties
+                    continue
+                break
+
+            end_row = min(start_row + chunk_rows - 1, row_count)
+
+            try:
+                result = self.sheets_service.spreadsheets().values().get(
+                    spreadsheetId=sheet_id,
+                    range=f"'{title}'!A{start_row}:{last_column}{end_row}"
+                ).execute()
+            except HttpError as e:
+                # Cached grid is larger than the sheet now (rows/columns deleted)
+                if e.resp.status != 400 or refreshed:
+                    raise
+                refreshed = True
+                properties = self._get_sheet_properties(sheet_id, title, refresh=True) or properties
+                continue
+
+            rows = result.get('values', [])
+
+            # A whole empty chunk means we are past the last student
+            if not rows:
+                break
+
+            yield start_row, rows
+            reached_bound = start_row + len(rows) - 1 >= end_row
+            start_row = end_row + 1
+
+    def _read_sheet_values(self, sheet_id: str, sheet_name: str = None, first_rows: list = None,
+                           first_end_row: int = None) -> list:
+        """
+        Read all rows of a tab's used range, in sheet order starting at row 1.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheet_name: Name of the tab (if None, uses first sheet)
+            first_rows: Rows 1..first_end_row if they were already fetched
+            first_end_row: Last sheet row the first_rows read covered (READ_CHUNK_ROWS by default)
+        """
+        values = list(first_rows or [])
+        start_row = (first_end_row or self.READ_CHUNK_ROWS) + 1 if first_rows is not None else 1
+        for start_row, rows in self.iter_sheet_rows(sheet_id, sheet_name, start_row=start_row):
+            # Keep row positions aligned when a chunk came back trimmed
+            values.extend([] for _ in range(start_row - 1 - len(values)))
+            values.extend(rows)
+        return values
+
+    def _invalidate_snapshots(self, sheet_id: str, structure_changed: bool = False):
+        """Invalidate cached snapshots of every sheet in the spreadsheet after a write."""
+        snapshot_cache.invalidate(sheet_id, structure_changed)
+
+    def invalidate_cache(self, sheet_id: str):
+        """
+        Drop cached snapshots of a spreadsheet. For callers that write through
+        sheets_service directly instead of a method of this class.
+        """
+        self._invalidate_snapshots(sheet_id, structure_changed=True)
+
+    def _read_sheet_data(self, sheet_id: str) -> dict:
+        """
+        Read data from the first sheet of a Google Sheet using service account.
+        Updated to handle 3-row header structure and extended column range.
+        """
+        try:
+            # Get the first sheet name from the (cached) metadata
+            first_sheet = self._get_sheet_properties(sheet_id)['title']
+
+            # 🔥 Read the used range instead of a fixed window, so large classes are not cut off
+            print(f"🔍 GET SHEET DATA: Reading used range of: {first_sheet}")
+            values = self._read_sheet_values(sheet_id, first_sheet)
 
             if not values:
                 return {
@@ -228,37 +553,34 @@ class GoogleServiceAccountSheets:
             }
 
     # 🔥 NEW: Add the missing update_cell method
+    @_writes_sheet()
     def update_cell(self, sheet_id: str, row_index: int, column_name: str, value: str) -> dict:
         """
         Update a single cell in the Google Sheet.
         Updated for 3-row header structure.
         """
         try:
-            # Get sheet data to find column index and sheet name
-            sheet_data = self.get_sheet_data(sheet_id)
+            # Get sheet data to find column and sheet name
+            snapshot = self._get_snapshot(sheet_id, structure_only=True)
+            sheet_data = snapshot.data
             if not sheet_data['success']:
                 return sheet_data
 
             headers = sheet_data['headers']
             sheet_name = sheet_data['sheet_name']
 
-            # Find column index
-            try:
-                column_index = headers.index(column_name)
-            except ValueError:
+            column = self._get_column_map(snapshot).get(column_name)
+            if column is None:
                 logger.error(f"Column '{column_name}' not found in headers: {headers}")
                 return {
                     'success': False,
                     'error': f'Column "{column_name}" not found. Available columns: {headers}'
                 }
 
-            # Convert column index to letter (A, B, C, etc.)
-            column_letter = chr(65 + column_index)
-
             # 🔥 FIXED: Skip 3 header rows now, convert to 1-based
             sheet_row = row_index + 4  # +3 for headers, +1 for 1-based indexing
 
-            cell_range = f"{sheet_name}!{column_letter}{sheet_row}"
+            cell_range = f"{sheet_name}!{column.letter}{sheet_row}"
 
             logger.info(f"Updating cell {cell_range} with value '{value}'")
 
@@ -293,6 +615,7 @@ class GoogleServiceAccountSheets:
             }
 
     # 🔥 NEW: Add the missing add_student method
+    @_writes_sheet()
     def add_student(self, sheet_id: str, student_data: dict) -> dict:
         """
         Add a new student row to the Google Sheet.
@@ -306,13 +629,15 @@ class GoogleServiceAccountSheets:
         """
         try:
             # Get sheet data
-            sheet_data = self.get_sheet_data(sheet_id)
+            snapshot = self._get_snapshot(sheet_id)
+            sheet_data = snapshot.data
             if not sheet_data['success']:
                 return sheet_data
 
             headers = sheet_data['headers']
             sheet_name = sheet_data['sheet_name']
             current_data = sheet_data['tableData']
+            columns = self._get_column_map(snapshot)
 
             # Find next empty row (skip 2 header rows)
             next_row = len(current_data) + 4  # +2 for headers, +1 for 1-based indexing
@@ -320,12 +645,12 @@ class GoogleServiceAccountSheets:
             # Create new row with student data
             new_row = [''] * len(headers)
             for key, value in student_data.items():
-                if key in headers:
-                    index = headers.index(key)
-                    new_row[index] = str(value)
+                column = columns.get(key)
+                if column is not None:
+                    new_row[column.index] = str(value)
 
             # Append the new row
-            range_name = f"{sheet_name}!A{next_row}:{chr(65 + len(headers) - 1)}{next_row}"
+            range_name = f"{sheet_name}!A{next_row}:{columns.last_letter}{next_row}"
 
             body = {
                 'values': [new_row]
@@ -363,6 +688,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to add student: {str(e)}'
             }
 
+    @_writes_sheet()
     def add_student_with_auto_number(self, sheet_id: str, student_data: dict, sheet_name: str = None) -> dict:
         """
         Add a new student row to the Google Sheet with auto-numbering.
@@ -374,16 +700,17 @@ class GoogleServiceAccountSheets:
 
             if sheet_name:
                 print(f"🔍 ADD STUDENT: Using specific sheet: {sheet_name}")
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
             else:
                 print(f"🔍 ADD STUDENT: No sheet name provided, using default sheet")
-                sheet_data = self.get_sheet_data(sheet_id)
+            snapshot = self._get_snapshot(sheet_id, sheet_name)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 print(f"🔍 ADD STUDENT: Failed to get sheet data: {sheet_data.get('error')}")
                 return sheet_data
 
             headers = sheet_data['headers']
+            columns = self._get_column_map(snapshot)
 
             # CRITICAL FIX: Use the explicitly passed sheet_name if provided, otherwise use the one from sheet_data
             active_sheet_name = sheet_name if sheet_name else sheet_data['sheet_name']
@@ -437,23 +764,17 @@ class GoogleServiceAccountSheets:
 
             # Update student data columns
             for key, value in student_data.items():
-                if key in headers:
-                    index = headers.index(key)
-                    column_letter = chr(65 + index)
-
+                column = columns.get(key)
+                if column is not None:
                     # 🔥 SKIP formula columns
-                    header_name = headers[index].upper()
-                    formula_keywords = ['TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA']
-                    is_formula_column = any(keyword in header_name for keyword in formula_keywords)
-
-                    if not is_formula_column:
+                    if not column.is_formula:
                         updates.append({
-                            'range': f"'{active_sheet_name}'!{column_letter}{next_row}",
+                            'range': f"'{active_sheet_name}'!{column.letter}{next_row}",
                             'values': [[str(value)]]
                         })
-                        print(f"🔍 ADD STUDENT: Adding data column update: {column_letter}{next_row} = {value}")
+                        print(f"🔍 ADD STUDENT: Adding data column update: {column.letter}{next_row} = {value}")
                     else:
-                        print(f"🔍 ADD STUDENT: SKIPPING formula column: {header_name}")
+                        print(f"🔍 ADD STUDENT: SKIPPING formula column: {column.header.upper()}")
 
             print(f"🔍 ADD STUDENT: Total updates to make: {len(updates)}")
 
@@ -498,6 +819,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to add student with auto-number: {str(e)}'
             }
 
+    @_writes_sheet()
     def auto_number_all_students(self, sheet_id: str) -> dict:
         """
         Auto-number all existing students in the Google Sheet.
@@ -597,7 +919,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to auto-number students: {str(e)}'
             }
 
-    def get_student_count(self, sheet_id: str) -> int:
+    def get_student_count(self, sheet_id: str) -> Optional[int]:
         """
         Get the actual number of students in the Google Sheet.
 
@@ -605,59 +927,106 @@ class GoogleServiceAccountSheets:
             sheet_id: ID of the spreadsheet
 
         Returns:
-            Number of students (rows with data excluding headers)
+            Number of students (rows with a first or last name), or None if the sheet can't be read
         """
         try:
-            sheet_data = self.get_sheet_data(sheet_id)
-            if not sheet_data['success']:
-                return 0
+            snapshot = self._get_snapshot(sheet_id)
+            if not snapshot.success:
+                return None
+
+            return len(self._get_student_index(snapshot))
+
+        except Exception as e:
+            logger.error(f"Error counting students: {str(e)}")
+            return None
 
-            # Count rows that have actual student data
-            student_count = 0
-            for row in sheet_data['tableData']:
-                # Check if the row has name data (not empty)
-                if len(row) >= 2:  # At least LASTNAME and FIRST NAME columns
-                    lastname = row[1].strip() if len(row) > 1 and row[1] else ''
-                    firstname = row[2].strip() if len(row) > 2 and row[2] else ''
+    def _batch_read_sheet_values(self, sheet_id: str, sheets: list) -> dict:
+        """
+        Read the first chunk of every tab in one values.batchGet call.
 
-                    if lastname or firstname:  # Row has student data
-                        student_count += 1
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheets: Sheet properties from the metadata
 
-            return student_count
+        Returns:
+            Dict of sheet title -> (rows, complete, end_row). complete is False when the
+            data reaches end_row, the last row requested, and may continue past it. Every
+            tab is left out if the batch call fails, so the caller reads them one by one.
+        """
+        ranges = []
+        bounds = []
+        for properties in sheets:
+            grid = properties.get('gridProperties', {})
+            end_row = min(grid.get('rowCount') or self.READ_CHUNK_ROWS, self.READ_CHUNK_ROWS)
+            last_column = column_letter(max(grid.get('columnCount') or 1, 1) - 1)
+            ranges.append(f"'{properties['title']}'!A1:{last_column}{end_row}")
+            bounds.append(end_row)
+
+        if not ranges:
+            return {}
 
+        try:
+            result = self.sheets_service.spreadsheets().values().batchGet(
+                spreadsheetId=sheet_id,
+                ranges=ranges
+            ).execute()
         except Exception as e:
-            logger.error(f"Error counting students: {str(e)}")
-            return 0
+            # One bad tab fails the whole batch; per-tab reads keep the others working
+            logger.warning(f"Batch read of {len(ranges)} sheets failed, reading them one by one: {str(e)}")
+            return {}
 
-    def get_all_sheets_data(self, sheet_id: str) -> dict:
+        values_by_sheet = {}
+        for properties, end_row, value_range in zip(sheets, bounds, result.get('valueRanges', [])):
+            rows = value_range.get('values', [])
+            values_by_sheet[properties['title']] = (rows, len(rows) < end_row, end_row)
+
+        return values_by_sheet
+
+    def get_all_sheets_data(self, sheet_id: str, batch_read: bool = True) -> dict:
         """
         Get data from ALL sheets in a Google Spreadsheet.
 
         Args:
             sheet_id: ID of the spreadsheet
+            batch_read: Load all tabs with one values.batchGet call (False reads
+                        each tab separately, kept for benchmarking)
 
         Returns:
             Dict containing all sheets data or error
         """
         try:
             # Get sheet metadata first
-            spreadsheet = self.sheets_service.spreadsheets().get(spreadsheetId=sheet_id).execute()
+            metadata = self._get_spreadsheet_metadata(sheet_id)
             all_sheets = []
 
+            # 🔥 Load every tab in a single round trip where possible
+            prefetched = self._batch_read_sheet_values(sheet_id, metadata['sheets']) if batch_read else {}
+
+            # 🔥 Tabs the batch read didn't cover (or only partly) are read in parallel
+            tasks = {}
+            for sheet_properties in metadata['sheets']:
+                sheet_name = sheet_properties['title']
+                if sheet_name not in prefetched:
+                    tasks[sheet_name] = self._tab_reader(sheet_id, sheet_name)
+                elif not prefetched[sheet_name][1]:
+                    # Page through the rest of a tab that fills the rows read so far
+                    rows, _, end_row = prefetched[sheet_name]
+                    tasks[sheet_name] = self._tab_reader(sheet_id, sheet_name, rows, end_row)
+            fetched = fetcher.run(tasks, host='sheets.googleapis.com')
+
             # 🔥 Loop through ALL sheets instead of just the first one
-            for sheet_info in spreadsheet['sheets']:
-                sheet_name = sheet_info['properties']['title']
-                sheet_id_internal = sheet_info['properties']['sheetId']
+            for sheet_properties in metadata['sheets']:
+                sheet_name = sheet_properties['title']
+                sheet_id_internal = sheet_properties['sheetId']
 
                 try:
-                    # Get data for this specific sheet
-                    range_name = f"'{sheet_name}'!A1:Z100"  # Use sheet name in quotes for safety
-                    result = self.sheets_service.spreadsheets().values().get(
-                        spreadsheetId=sheet_id,
-                        range=range_name
-                    ).execute()
-
-                    values = result.get('values', [])
+                    # Get the used range of this specific sheet
+                    if sheet_name in tasks:
+                        if sheet_name not in fetched.results:
+                            raise Exception(fetched.error_for(sheet_name))
+                        values = fetched.results[sheet_name]
+                    else:
+                        values = prefetched[sheet_name][0]
 
                     if values and len(values) >= 2:  # Only add sheets that have header data
                         main_headers = values[0] if len(values) > 0 else []
@@ -715,6 +1084,13 @@ class GoogleServiceAccountSheets:
     def get_specific_sheet_data(self, sheet_id: str, sheet_name: str) -> dict:
         """
         Get data from a specific sheet by name.
+        Served from the snapshot cache when the sheet has not changed since the last read.
+        """
+        return self._get_snapshot(sheet_id, sheet_name).as_dict()
+
+    def _read_specific_sheet_data(self, sheet_id: str, sheet_name: str) -> dict:
+        """
+        Read data from a specific sheet by name.
         Updated to handle 3-row header structure.
         """
         try:
@@ -722,15 +1098,8 @@ class GoogleServiceAccountSheets:
             print(f"🔍 GET SPECIFIC SHEET: sheet_id={sheet_id}, sheet_name={sheet_name}")
 
             # Get data from the specific sheet
-            range_name = f"'{sheet_name}'!A1:AM100"  # Use specific sheet name in quotes
-            print(f"🔍 GET SPECIFIC SHEET: Requesting range: {range_name}")
-
-            result = self.sheets_service.spreadsheets().values().get(
-                spreadsheetId=sheet_id,
-                range=range_name
-            ).execute()
-
-            values = result.get('values', [])
+            print(f"🔍 GET SPECIFIC SHEET: Reading used range of: {sheet_name}")
+            values = self._read_sheet_values(sheet_id, sheet_name)
 
             if not values:
                 print(f"🔍 GET SPECIFIC SHEET: No data found in sheet '{sheet_name}'")
@@ -795,14 +1164,13 @@ class GoogleServiceAccountSheets:
             Dict containing sheets list or error
         """
         try:
-            # Get sheet metadata
-            spreadsheet = self.sheets_service.spreadsheets().get(spreadsheetId=sheet_id).execute()
+            # Get sheet metadata (field-masked and cached)
+            metadata = self._get_spreadsheet_metadata(sheet_id)
 
             sheets_list = []
-            for sheet_info in spreadsheet['sheets']:
-                sheet_name = sheet_info['properties']['title']
-                sheet_id_internal = sheet_info['properties']['sheetId']
-                sheet_properties = sheet_info['properties']
+            for sheet_properties in metadata['sheets']:
+                sheet_name = sheet_properties['title']
+                sheet_id_internal = sheet_properties['sheetId']
 
                 sheets_list.append({
                     'sheet_name': sheet_name,
@@ -816,7 +1184,7 @@ class GoogleServiceAccountSheets:
                 'success': True,
                 'sheets': sheets_list,
                 'total_sheets': len(sheets_list),
-                'spreadsheet_title': spreadsheet.get('properties', {}).get('title', 'Unknown')
+                'spreadsheet_title': metadata['title']
             }
 
         except Exception as e:
@@ -826,6 +1194,94 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to get sheets list: {str(e)}'
             }
 
+    def get_first_sheet_name(self, sheet_id: str) -> Optional[str]:
+        """
+        Name of the first tab, from the cached metadata (no round trip when cached).
+
+        Returns:
+            Tab title, or None if the spreadsheet can't be read
+        """
+        try:
+            properties = self._get_sheet_properties(sheet_id)
+            return properties['title'] if properties else None
+        except Exception as e:
+            logger.warning(f"Could not get first sheet name of {sheet_id}: {str(e)}")
+            return None
+
+    def add_sheet_tab(self, sheet_id: str, title: str) -> dict:
+        """
+        Add a tab to a spreadsheet.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            title: Title of the new tab
+
+        Returns:
+            Dict with the new tab's properties or error
+        """
+        result = self._update_tabs(sheet_id, [{'addSheet': {'properties': {'title': title}}}])
+        if result['success']:
+            result['sheet'] = self._get_sheet_properties(sheet_id, title)
+        return result
+
+    def rename_sheet_tab(self, sheet_id: str, sheet_name: str, new_name: str) -> dict:
+        """
+        Rename a tab of a spreadsheet.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            sheet_name: Current title of the tab
+            new_name: New title
+
+        Returns:
+            Dict with success status or error
+        """
+        properties = self._get_sheet_properties(sheet_id, sheet_name)
+        if properties is None:
+            return {
+                'success': False,
+                'error': f'Sheet "{sheet_name}" not found'
+            }
+
+        return self._update_tabs(sheet_id, [{
+            'updateSheetProperties': {
+                'properties': {'sheetId': properties['sheetId'], 'title': new_name},
+                'fields': 'title'
+            }
+        }])
+
+    def _update_tabs(self, sheet_id: str, tab_requests: list) -> dict:
+        """
+        Apply tab-level batchUpdate requests. The response carries the updated
+        (field-masked) metadata, which replaces the cached one without another read.
+        """
+        if write_buffer.pending_count(sheet_id):
+            write_buffer.flush(sheet_id, collect=False)
+
+        try:
+            response = self.sheets_service.spreadsheets().batchUpdate(
+                spreadsheetId=sheet_id,
+                body={'requests': tab_requests, 'includeSpreadsheetInResponse': True},
+                fields=f'updatedSpreadsheet({self.METADATA_FIELDS})'
+            ).execute()
+        except Exception as e:
+            logger.error(f"Update tabs error: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Failed to update sheet tabs: {str(e)}'
+            }
+        finally:
+            # Drops snapshots keyed by old tab names, and the old metadata
+            self._invalidate_snapshots(sheet_id, structure_changed=True)
+
+        if response.get('updatedSpreadsheet'):
+            snapshot_cache.put_metadata(sheet_id, build_metadata(response['updatedSpreadsheet']))
+
+        return {
+            'success': True
+        }
+
+    @_writes_sheet()
     def update_cell_in_sheet(self, sheet_id: str, row_index: int, column_name: str, value: str,
                              sheet_name: str = None) -> dict:
         """
@@ -842,11 +1298,9 @@ class GoogleServiceAccountSheets:
             Dict containing success status and update info
         """
         try:
-            # Get sheet data to find column index and sheet name
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
+            # Only headers are needed here, so a snapshot behind our own value writes is fine
+            snapshot = self._get_snapshot(sheet_id, sheet_name, structure_only=True)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 return sheet_data
@@ -854,23 +1308,18 @@ class GoogleServiceAccountSheets:
             headers = sheet_data['headers']
             target_sheet_name = sheet_data['sheet_name']
 
-            # Find column index
-            try:
-                column_index = headers.index(column_name)
-            except ValueError:
+            column = self._get_column_map(snapshot).get(column_name)
+            if column is None:
                 logger.error(f"Column '{column_name}' not found in headers: {headers}")
                 return {
                     'success': False,
                     'error': f'Column "{column_name}" not found. Available columns: {headers}'
                 }
 
-            # Convert column index to letter (A, B, C, etc.)
-            column_letter = chr(65 + column_index)
-
             # Calculate actual sheet row (skip 2 header rows, convert to 1-based)
             sheet_row = row_index + 4 # +2 for headers, +1 for 1-based indexing
 
-            cell_range = f"'{target_sheet_name}'!{column_letter}{sheet_row}"
+            cell_range = f"'{target_sheet_name}'!{column.letter}{sheet_row}"
 
             logger.info(f"Updating cell {cell_range} with value '{value}'")
             logger.info(f"🔍 DEBUG: Using valueInputOption: USER_ENTERED")
@@ -910,111 +1359,210 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to update cell: {str(e)}'
             }
 
+    def queue_cell_update(self, sheet_id: str, row_index: int, column_name: str, value: str,
+                          sheet_name: str = None, student_name: str = None) -> dict:
+        """
+        Queue a cell edit in the per-spreadsheet write buffer instead of writing it
+        right away. Rapid edits (voice grading) are written together with one
+        values.batchUpdate when the buffer window closes or fills up.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            row_index: 0-based row index (0 = first data row, skipping headers)
+            column_name: Name of the column (e.g., 'QUIZ 1')
+            value: Value to set in the cell
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
+            student_name: Spoken/typed student name, used to find the row when row_index is None
+
+        Returns:
+            Dict with the edit id and resolved A1 range, or the batch acks if this edit triggered a flush
+        """
+        try:
+            # Only headers are needed to address the cell, unless the row comes from a name
+            snapshot = self._get_snapshot(sheet_id, sheet_name, structure_only=row_index is not None)
+            sheet_data = snapshot.data
+
+            if not sheet_data['success']:
+                return sheet_data
+
+            match = None
+            if row_index is None:
+                match = self._get_student_index(snapshot).match(student_name)
+                if match is None:
+                    return {
+                        'success': False,
+                        'error': f'Student "{student_name}" not found in sheet'
+                    }
+                row_index = match.row_index
+
+            column = self._get_column_map(snapshot).get(column_name)
+            if column is None:
+                return {
+                    'success': False,
+                    'error': f'Column "{column_name}" not found. Available columns: {sheet_data["headers"]}'
+                }
+
+            target_sheet_name = sheet_data['sheet_name']
+            edit = {
+                'cell_range': f"'{target_sheet_name}'!{column.letter}{row_index + 4}",
+                'value': str(value),
+                'row_index': row_index,
+                'column_name': column_name,
+                'sheet_name': target_sheet_name
+            }
+
+            result = write_buffer.add(sheet_id, edit, self._write_buffered_edits)
+            result['sheet_name'] = target_sheet_name
+            if match is not None:
+                result['student_match'] = match.as_dict()
+            return result
+
+        except Exception as e:
+            logger.error(f"Unexpected error queueing cell update: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Failed to queue cell update: {str(e)}'
+            }
+
+    def flush_cell_updates(self, sheet_id: str, edit_ids: list = None) -> dict:
+        """
+        Write all queued cell edits of a spreadsheet now (e.g. at the end of a grading session).
+
+        The write buffer is per worker process, so only edits queued on this worker
+        are flushed and acknowledged here. Edits queued on another worker are written
+        by that worker's timer and can't be confirmed from this one; they come back
+        as unknown, and so does a flush that finds nothing at all.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            edit_ids: Edit ids returned by queue_cell_update, to check each one was acknowledged
+
+        Returns:
+            Dict with per-edit acks, including edits the buffer already flushed on its own,
+            a 'status' of 'flushed' or 'unknown', and the requested edit ids with no ack
+        """
+        try:
+            acks = write_buffer.flush(sheet_id)
+            failed = [ack for ack in acks if not ack['success']]
+
+            acked = {ack['edit_id'] for ack in acks}
+            unknown = [edit_id for edit_id in edit_ids or [] if edit_id not in acked]
+            confirmed = bool(acks) and not unknown
+
+            return {
+                'success': not failed and not unknown,
+                'status': 'flushed' if confirmed else 'unknown',
+                'acks': acks,
+                'written': sum(1 for ack in acks if ack['status'] == 'written'),
+                'superseded': sum(1 for ack in acks if ack['status'] == 'superseded'),
+                'failed': len(failed),
+                'unknown_edit_ids': unknown
+            }
+
+        except Exception as e:
+            logger.error(f"Unexpected error flushing cell updates: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Failed to flush cell updates: {str(e)}'
+            }
+
+    def _tab_reader(self, sheet_id: str, sheet_name: str, first_rows: list = None, first_end_row: int = None):
+        """Task reading one tab with _read_sheet_values, on whichever thread runs it."""
+
+        def read():
+            service = self
+            if threading.get_ident() != self._client_thread:
+                # Pool thread: use that thread's clients, not ours
+                service = GoogleServiceAccountSheets(self.credentials_info)
+            return service._read_sheet_values(sheet_id, sheet_name, first_rows=first_rows,
+                                              first_end_row=first_end_row)
+
+        return read
+
+    def _get_thread_sheets_service(self):
+        """Sheets client for the calling thread (httplib2 clients must not be shared)."""
+        if threading.get_ident() == self._client_thread:
+            return self.sheets_service
+        return client_registry.get_clients(self.credentials_info)[2]
+
+    def _write_buffered_edits(self, sheet_id: str, edits: list) -> list:
+        """Write a batch of buffered cell edits with one values.batchUpdate. May run on the buffer's timer thread."""
+        try:
+            result = self._get_thread_sheets_service().spreadsheets().values().batchUpdate(
+                spreadsheetId=sheet_id,
+                body={
+                    'valueInputOption': 'USER_ENTERED',
+                    'data': [{'range': edit['cell_range'], 'values': [[edit['value']]]} for edit in edits]
+                }
+            ).execute()
+        finally:
+            self._invalidate_snapshots(sheet_id)
+
+        responses = result.get('responses', [])
+        acks = []
+        for index, edit in enumerate(edits):
+            response = responses[index] if index < len(responses) else {}
+            acks.append(build_ack(edit, 'written', cell_range=response.get('updatedRange', edit['cell_range'])))
+
+        logger.info(f"Flushed {len(edits)} buffered cell edits to {sheet_id}")
+        return acks
+
     def compare_students_for_import(self, sheet_id: str, import_students: list, sheet_name: str = None) -> dict:
         """
         Compare import students with existing students to find duplicates.
-        FIXED: Now uses fuzzy name matching for better duplicate detection.
+
+        Existing students are indexed once (student ID, last name, first name and
+        name words), so each import student is only compared with the few rows that
+        share an ID or a name with it instead of with every row of the sheet.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            import_students: List of dicts with FIRST NAME, LASTNAME and STUDENT ID
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
+
+        Returns:
+            Dict with conflicts (each with matchReason and matchScore) and new students
         """
         try:
             # Get existing students
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
+            snapshot = self._get_snapshot(sheet_id, sheet_name)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 return sheet_data
 
-            existing_students = []
-            headers = sheet_data['headers']
-
-            # Extract existing students with their row info
-            for row_index, row in enumerate(sheet_data['tableData']):
-                if len(row) >= 2:  # Has at least first name and last name columns
-                    # Find name and ID columns
-                    first_name_idx = None
-                    last_name_idx = None
-                    student_id_idx = None
-
-                    for idx, header in enumerate(headers):
-                        if 'FIRST NAME' in header.upper() or 'FIRSTNAME' in header.upper():
-                            first_name_idx = idx
-                        elif 'LAST NAME' in header.upper() or 'LASTNAME' in header.upper():
-                            last_name_idx = idx
-                        elif 'STUDENT ID' in header.upper() or 'STUDENTID' in header.upper():
-                            student_id_idx = idx
-
-                    if first_name_idx is not None and last_name_idx is not None:
-                        first_name = row[first_name_idx].strip() if first_name_idx < len(row) and row[
-                            first_name_idx] else ''
-                        last_name = row[last_name_idx].strip() if last_name_idx < len(row) and row[
-                            last_name_idx] else ''
-                        student_id = row[student_id_idx].strip() if student_id_idx is not None and student_id_idx < len(
-                            row) and row[student_id_idx] else ''
-
-                        if first_name or last_name:  # Has some name data
-                            existing_students.append({
-                                'FIRST NAME': first_name,
-                                'LASTNAME': last_name,
-                                'STUDENT ID': student_id,
-                                'rowIndex': row_index,
-                                'fullRow': row
-                            })
+            table_data = sheet_data['tableData']
+            students = self._get_student_index(snapshot)
+
+            existing_students = {}
+            for entry in students.entries:
+                existing_students[entry.row_index] = {
+                    'FIRST NAME': entry.display_first,
+                    'LASTNAME': entry.display_last,
+                    'STUDENT ID': entry.student_id,
+                    'rowIndex': entry.row_index,
+                    'fullRow': list(table_data[entry.row_index])
+                }
 
             # Compare and find conflicts
             conflicts = []
             new_students = []
 
             for import_student in import_students:
-                import_first = import_student.get('FIRST NAME', '').strip().lower()
-                import_last = import_student.get('LASTNAME', '').strip().lower()
-                import_id = import_student.get('STUDENT ID', '').strip().lower()
-
-                # Look for match (exact ID or similar name)
-                conflict_found = None
-                for existing in existing_students:
-                    existing_first = existing['FIRST NAME'].strip().lower()
-                    existing_last = existing['LASTNAME'].strip().lower()
-                    existing_id = existing['STUDENT ID'].strip().lower()
-
-                    # 🔥 FIXED: Better name matching logic
-                    # 1. ID match (exact)
-                    id_match = (import_id and existing_id and import_id == existing_id)
-
-                    # 2. Last name match (exact) AND first name match (either contains the other)
-                    last_name_exact = (import_last == existing_last)
-                    first_name_similar = (
-                            import_first in existing_first or
-                            existing_first in import_first or
-                            import_first.split()[0] == existing_first.split()[0]  # Match first word
-                    )
-
-                    # 3. First name match (exact) AND last name match (similar)
-                    first_name_exact = (import_first == existing_first)
-                    last_name_similar = (
-                            import_last in existing_last or
-                            existing_last in import_last
-                    )
-
-                    # 4. Full name combination check (for cases like "Jared Omen" vs "Jared Karl Omen")
-                    import_full = f"{import_first} {import_last}".lower()
-                    existing_full = f"{existing_first} {existing_last}".lower()
-                    full_name_match = (
-                            import_full in existing_full or
-                            existing_full in import_full
-                    )
-
-                    if id_match or (last_name_exact and first_name_similar) or (
-                            first_name_exact and last_name_similar) or full_name_match:
-                        conflict_found = existing
-                        print(
-                            f"🔍 DUPLICATE found: '{import_first} {import_last}' matches '{existing_first} {existing_last}'")
-                        break
+                match = students.find_duplicate(
+                    import_student.get('FIRST NAME'),
+                    import_student.get('LASTNAME'),
+                    import_student.get('STUDENT ID')
+                )
 
-                if conflict_found:
+                if match:
+                    logger.info(f"🔍 DUPLICATE ({match.strategy}): '{import_student.get('FIRST NAME')} "
+                                f"{import_student.get('LASTNAME')}' matches row {match.row_index}")
                     conflicts.append({
                         'importStudent': import_student,
-                        'existingStudent': conflict_found,
+                        'existingStudent': existing_students[match.row_index],
+                        'matchReason': match.strategy,
+                        'matchScore': round(match.score, 3),
                         'action': 'skip'  # default action
                     })
                 else:
@@ -1031,12 +1579,118 @@ class GoogleServiceAccountSheets:
             }
 
         except Exception as e:
-            logger.error(f"Compare students for import error: {str(e)}")
+            logger.error(f"Compare students for import error: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Failed to compare students: {str(e)}'
+            }
+
+    @_writes_sheet()
+    @rate_limiter.priority(BULK)
+    def add_students_bulk(self, sheet_id: str, students: list, sheet_name: str = None) -> dict:
+        """
+        Add many students with auto-numbering using one read and one batchUpdate.
+
+        Target rows are planned in memory: free rows (no name) are filled first, in
+        sheet order, then rows after the last one. Students are numbered after the
+        existing ones, in the order given. Formula columns are never written.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            students: List of dicts keyed by column name (e.g. {'LASTNAME': 'Smith', 'FIRST NAME': 'John'})
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
+
+        Returns:
+            Dict with per-student results (row, number, error) and the number added
+        """
+        try:
+            # Free rows are picked from this read, so a cached one could overwrite students added since
+            snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+            sheet_data = snapshot.data
+            if not sheet_data['success']:
+                return sheet_data
+
+            target_sheet_name = sheet_data['sheet_name']
+            current_data = sheet_data['tableData']
+            columns = self._get_column_map(snapshot)
+
+            occupied = [columns.row_has_student(row) for row in current_data]
+            free_rows = [row_index for row_index, has_student in enumerate(occupied) if not has_student]
+            next_appended_row = len(current_data)
+            student_number = sum(occupied)
+
+            cells = {}
+            student_results = []
+
+            for student in students:
+                name = f"{student.get('FIRST NAME', '')} {student.get('LASTNAME', '')}".strip()
+
+                student_cells = {}
+                for key, value in student.items():
+                    column = columns.get(key)
+                    if column is not None and not column.is_formula and column.index != 0:
+                        student_cells[column.index] = value
+
+                if not any(str(student_cells.get(index) or '').strip() for index in columns.name_indexes()):
+                    student_results.append({'student': name, 'success': False, 'error': 'Student has no name'})
+                    continue
+
+                if free_rows:
+                    row_index = free_rows.pop(0)
+                else:
+                    row_index = next_appended_row
+                    next_appended_row += 1
+
+                student_number += 1
+                sheet_row = row_index + 4  # +3 for headers, +1 for 1-based indexing
+
+                # NO. column (A) gets the auto number
+                cells[(sheet_row, 0)] = student_number
+                for column_index, value in student_cells.items():
+                    cells[(sheet_row, column_index)] = value
+
+                student_results.append({
+                    'student': name,
+                    'success': True,
+                    'row_added': sheet_row,
+                    'rowNumber': student_number
+                })
+
+            updates = build_range_updates(target_sheet_name, cells)
+            updated_cells = 0
+
+            if updates:
+                result = self.sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=sheet_id,
+                    body={
+                        'valueInputOption': 'USER_ENTERED',
+                        'data': updates
+                    }
+                ).execute()
+                updated_cells = result.get('totalUpdatedCells', 0)
+
+            added = sum(1 for student_result in student_results if student_result['success'])
+            logger.info(f"Bulk added {added} students to {target_sheet_name} with {len(updates)} ranges")
+
+            return {
+                'success': True,
+                'added': added,
+                'failed': len(student_results) - added,
+                'results': student_results,
+                'updated_cells': updated_cells,
+                'ranges_written': len(updates),
+                'sheet_name': target_sheet_name
+            }
+
+        except Exception as e:
+            logger.error(f"Unexpected error adding students in bulk: {str(e)}")
             return {
                 'success': False,
-                'error': f'Failed to compare students: {str(e)}'
+                'error': f'Failed to add students: {str(e)}'
             }
 
+    @_writes_sheet()
+    @rate_limiter.priority(BULK)
     def import_students_batch(self, sheet_id: str, new_students: list, resolved_conflicts: list,
                               sheet_name: str = None) -> dict:
         """
@@ -1052,24 +1706,20 @@ class GoogleServiceAccountSheets:
                 'errors': []
             }
 
-            # Process new students (no conflicts)
-            for student in new_students:
-                try:
-                    if sheet_name:
-                        result = self.add_student_with_auto_number_to_sheet(sheet_id, student, sheet_name)
-                    else:
-                        result = self.add_student_with_auto_number(sheet_id, student)
-
-                    if result['success']:
-                        results['newStudentsAdded'] += 1
-                        print(f"✅ Added new student: {student.get('FIRST NAME', '')} {student.get('LASTNAME', '')}")
-                    else:
-                        results['errors'].append(
-                            f"Failed to add {student.get('FIRST NAME', '')} {student.get('LASTNAME', '')}: {result.get('error', 'Unknown error')}")
+            # Process new students (no conflicts) with one read and one write
+            if new_students:
+                bulk_result = self.add_students_bulk(sheet_id, new_students, sheet_name)
 
-                except Exception as e:
-                    results['errors'].append(
-                        f"Error adding {student.get('FIRST NAME', '')} {student.get('LASTNAME', '')}: {str(e)}")
+                if bulk_result['success']:
+                    results['newStudentsAdded'] += bulk_result['added']
+                    results['studentResults'] = bulk_result['results']
+                    for student_result in bulk_result['results']:
+                        if not student_result['success']:
+                            results['errors'].append(
+                                f"Failed to add {student_result['student']}: {student_result['error']}")
+                    print(f"✅ Added {bulk_result['added']} new students in {bulk_result['ranges_written']} ranges")
+                else:
+                    results['errors'].append(f"Failed to add new students: {bulk_result.get('error', 'Unknown error')}")
 
             # 🔥 FIXED: Process conflict resolutions with ACTUAL override implementation
             for conflict in resolved_conflicts:
@@ -1172,19 +1822,26 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to import students: {str(e)}'
             }
 
+    @_writes_sheet()
     def add_student_with_auto_number_to_sheet(self, sheet_id: str, student_data: dict, sheet_name: str) -> dict:
         """
         Add a new student row to a specific sheet with auto-numbering.
         Updated for 3-row header structure and formula protection.
         """
         try:
-            # Get sheet data
-            sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
+            # Get sheet data; the first empty row is picked from it, so read it fresh
+            snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+            sheet_data = snapshot.data
             if not sheet_data['success']:
                 return sheet_data
 
             headers = sheet_data['headers']
             current_data = sheet_data['tableData']
+            columns = self._get_column_map(snapshot)
+
+            # Find name column indices
+            first_name_idx = columns.first_name.index if columns.first_name else None
+            last_name_idx = columns.last_name.index if columns.last_name else None
 
             # 🔥 FIXED: Don't skip any rows in tableData - it already excludes headers
             first_empty_row = None
@@ -1195,16 +1852,6 @@ class GoogleServiceAccountSheets:
                 row = current_data[row_index]
                 has_student_data = False
 
-                # Find name column indices
-                first_name_idx = None
-                last_name_idx = None
-
-                for idx, header in enumerate(headers):
-                    if 'FIRST NAME' in header.upper() or 'FIRSTNAME' in header.upper():
-                        first_name_idx = idx
-                    elif 'LAST NAME' in header.upper() or 'LASTNAME' in header.upper():
-                        last_name_idx = idx
-
                 # Check if this row has name data
                 if first_name_idx is not None and last_name_idx is not None:
                     first_name = row[first_name_idx].strip() if first_name_idx < len(row) and row[
@@ -1250,23 +1897,17 @@ class GoogleServiceAccountSheets:
 
             # Update student data columns
             for key, value in student_data.items():
-                if key in headers:
-                    index = headers.index(key)
-                    column_letter = chr(65 + index)
-
+                column = columns.get(key)
+                if column is not None:
                     # 🔥 SKIP formula columns
-                    header_name = headers[index].upper()
-                    formula_keywords = ['TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA']
-                    is_formula_column = any(keyword in header_name for keyword in formula_keywords)
-
-                    if not is_formula_column:
+                    if not column.is_formula:
                         updates.append({
-                            'range': f"'{sheet_name}'!{column_letter}{next_row}",
+                            'range': f"'{sheet_name}'!{column.letter}{next_row}",
                             'values': [[str(value)]]
                         })
-                        print(f"🔍 ADD STUDENT: Adding data column update: {column_letter}{next_row} = {value}")
+                        print(f"🔍 ADD STUDENT: Adding data column update: {column.letter}{next_row} = {value}")
                     else:
-                        print(f"🔍 ADD STUDENT: SKIPPING formula column: {header_name}")
+                        print(f"🔍 ADD STUDENT: SKIPPING formula column: {column.header.upper()}")
 
             print(f"🔍 ADD STUDENT: Total updates to make: {len(updates)}")
 
@@ -1399,74 +2040,35 @@ class GoogleServiceAccountSheets:
                                 available_columns.append(col)
 
             # Continue with existing analysis logic but use available_columns instead of import_columns
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
+            snapshot = self._get_snapshot(sheet_id, sheet_name)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 return sheet_data
 
             headers = sheet_data['headers']
-            table_data = sheet_data['tableData']
+            occupancy = self._get_column_occupancy(snapshot)
+            total_students = occupancy.total_students
+
+            excluded_columns = [
+                'NO.', 'NO', 'NUM', 'NUMBER',
+                'LASTNAME', 'LAST NAME', 'SURNAME',
+                'FIRSTNAME', 'FIRST NAME', 'GIVEN NAME',
+                'STUDENT ID', 'STUDENTID', 'ID', 'STUDENT_ID',
+                'EMAIL', 'CONTACT', 'PHONE'
+            ]
 
             # 🔥 ENHANCED: Analyze ALL columns (not just empty ones)
             column_analysis = []
             for col_index, column_name in enumerate(headers):
-                excluded_columns = [
-                    'NO.', 'NO', 'NUM', 'NUMBER',
-                    'LASTNAME', 'LAST NAME', 'SURNAME',
-                    'FIRSTNAME', 'FIRST NAME', 'GIVEN NAME',
-                    'STUDENT ID', 'STUDENTID', 'ID', 'STUDENT_ID',
-                    'EMAIL', 'CONTACT', 'PHONE'
-                ]
-
-                if any(excluded.upper() in column_name.upper() for excluded in excluded_columns):
+                if any(excluded in column_name.upper() for excluded in excluded_columns):
                     continue
 
-                # 🔥 ENHANCED: Detailed column analysis with student-level data
-                has_data = False
-                data_count = 0
-                sample_values = []
-                student_data = []  # 🔥 NEW: Track which students have scores
-
-                for row_index, row in enumerate(table_data):
-                    if col_index < len(row) and row[col_index] and str(row[col_index]).strip():
-                        has_data = True
-                        data_count += 1
-                        value = str(row[col_index]).strip()
-
-                        if len(sample_values) < 3:
-                            sample_values.append(value)
-
-                        # 🔥 NEW: Track student names with existing scores
-                        if len(student_data) < 5:  # Only store first 5 for preview
-                            first_name_idx = None
-                            last_name_idx = None
-
-                            for idx, header in enumerate(headers):
-                                if 'FIRST NAME' in header.upper() or 'FIRSTNAME' in header.upper():
-                                    first_name_idx = idx
-                                elif 'LAST NAME' in header.upper() or 'LASTNAME' in header.upper():
-                                    last_name_idx = idx
-
-                            if (first_name_idx is not None and last_name_idx is not None and
-                                    first_name_idx < len(row) and last_name_idx < len(row)):
-                                first_name = str(row[first_name_idx]).strip() if row[first_name_idx] else ''
-                                last_name = str(row[last_name_idx]).strip() if row[last_name_idx] else ''
-
-                                if first_name or last_name:
-                                    student_data.append({
-                                        'name': f"{first_name} {last_name}".strip(),
-                                        'score': value,
-                                        'rowIndex': row_index
-                                    })
+                stats = occupancy[col_index]
+                data_count = stats.data_count
+                fill_percentage = occupancy.fill_percentage(col_index)
 
                 # 🔥 ENHANCED: More detailed availability classification
-                total_students = len(
-                    [row for row in table_data if any(str(cell).strip() for cell in row[:2])])  # Count non-empty rows
-                fill_percentage = (data_count / total_students) if total_students > 0 else 0
-
                 availability = 'empty'
                 if data_count == 0:
                     availability = 'empty'
@@ -1483,13 +2085,13 @@ class GoogleServiceAccountSheets:
                 column_analysis.append({
                     'columnName': column_name,
                     'columnIndex': col_index,
-                    'hasData': has_data,
+                    'hasData': stats.has_data,
                     'dataCount': data_count,
                     'totalStudents': total_students,
                     'fillPercentage': fill_percentage,
-                    'sampleValues': sample_values,
-                    'studentData': student_data,  # 🔥 NEW
-                    'isEmpty': not has_data,
+                    'sampleValues': list(stats.sample_values),
+                    'studentData': [dict(student) for student in stats.student_data],  # 🔥 NEW
+                    'isEmpty': not stats.has_data,
                     'isPartiallyFilled': availability == 'partial',
                     'availability': availability
                 })
@@ -1585,11 +2187,61 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to analyze columns: {str(e)}'
             }
 
+    @staticmethod
+    def _apply_merge_strategy(action: str, existing_value, import_score, student_key: str) -> tuple:
+        """
+        Decide what to write for one cell of a column import.
+
+        Returns:
+            Tuple of (should_update, final_score, conflict_resolved, skipped)
+        """
+        if action == 'replace':
+            # Replace all data (original behavior)
+            return True, import_score, bool(existing_value), False
+
+        if action in ('merge_skip', 'merge_update', 'merge'):
+            # merge_skip: skip students with existing scores, merge_update: only fill empty cells,
+            # merge: default merge behavior (same as merge_skip for backward compatibility)
+            if existing_value:
+                print(f"🔄 {action.upper()}: Keeping existing score for {student_key}: '{existing_value}'")
+                return False, import_score, False, True
+            return True, import_score, False, False
+
+        if action == 'merge_add':
+            # Add to existing scores (sum)
+            if existing_value and existing_value.replace('.', '').replace('-', '').isdigit():
+                try:
+                    final_score = float(existing_value) + float(str(import_score))
+                    print(f"🔄 MERGE_ADD: {student_key}: {existing_value} + {import_score} = {final_score}")
+                    return True, final_score, True, False
+                except ValueError:
+                    print(f"⚠️ MERGE_ADD: Cannot add non-numeric values for {student_key}")
+                    return False, import_score, False, False
+            return True, import_score, False, False
+
+        return False, import_score, False, False
+
+    @_writes_sheet(structure_changed=True)
+    @rate_limiter.priority(BULK)
     def import_column_data_with_mapping(self, sheet_id: str, column_mappings: list, import_data: dict,
-                                        sheet_name: str = None) -> dict:
+                                        sheet_name: str = None, dry_run: bool = False) -> dict:
         """
         Import column data with custom mappings and enhanced merge strategies.
-        ENHANCED: Supports multiple merge strategies for handling existing data.
+
+        The sheet is read once and every student is matched once. Header renames and
+        merge strategies (replace, merge_skip, merge_update, merge_add) are applied in
+        memory, and the result is written as a minimal set of contiguous ranges in a
+        single batchUpdate.
+
+        Args:
+            sheet_id: ID of the spreadsheet
+            column_mappings: List of {'importColumn', 'targetColumn', 'action'} dicts
+            import_data: Dict with 'columnData' ({column: {student_key: score}})
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
+            dry_run: Return the write plan and cell count without writing anything
+
+        Returns:
+            Dict containing results per action and, for dry runs, the exact plan
         """
         try:
             results = {
@@ -1604,18 +2256,27 @@ class GoogleServiceAccountSheets:
                 'actionSummary': {}  # 🔥 NEW: Track what happened per action
             }
 
-            # Get sheet data
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
+            # Get sheet data (one read for the whole import). Merge strategies decide from the
+            # existing values, so read them fresh rather than from the cache
+            snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 return sheet_data
 
-            headers = sheet_data['headers']
             table_data = sheet_data['tableData']
             target_sheet_name = sheet_data['sheet_name']
+            columns = self._get_column_map(snapshot)
+            students = self._get_student_index(snapshot)
+
+            # Match every student once, however many columns they appear in
+            student_rows = {}
+
+            # (sheet row, column index) -> value to write; row 2 holds the column names
+            planned_cells = {}
+            renames = []
+            # Planned header name -> name it has in the sheet, so later mappings can target it
+            renamed_columns = {}
 
             # Process each column mapping
             for mapping in column_mappings:
@@ -1627,21 +2288,18 @@ class GoogleServiceAccountSheets:
                     continue
 
                 try:
-                    # Find target column index
-                    target_index = headers.index(target_column)
+                    target = columns.get(renamed_columns.get(target_column, target_column))
+                    if target is None:
+                        results['errors'].append(f"Target column {target_column} not found in sheet")
+                        continue
+                    target_index = target.index
 
                     # Step 1: Rename the header if it's different
                     if import_column != target_column:
-                        rename_result = self.rename_column_header(
-                            sheet_id, target_index, import_column, target_sheet_name
-                        )
-                        if rename_result['success']:
-                            results['columnsRenamed'] += 1
-                            # Update local headers for subsequent operations
-                            headers[target_index] = import_column
-                            print(f"✅ Renamed column '{target_column}' → '{import_column}'")
-                        else:
-                            results['errors'].append(f"Failed to rename {target_column} to {import_column}")
+                        planned_cells[(2, target_index)] = import_column
+                        renamed_columns[import_column] = renamed_columns.pop(target_column, target_column)
+                        renames.append({'from': target_column, 'to': import_column, 'column': target.letter})
+                        results['columnsRenamed'] += 1
 
                     # Step 2: Import the data for this column
                     column_data = import_data.get('columnData', {}).get(import_column, {})
@@ -1661,116 +2319,99 @@ class GoogleServiceAccountSheets:
 
                     for student_key, import_score in column_data.items():
                         # Find student row by matching names
-                        student_row_index = self.find_student_row_by_name(
-                            student_key, table_data, headers
-                        )
+                        if student_key not in student_rows:
+                            student_rows[student_key] = students.find(student_key)
+                        student_row_index = student_rows[student_key]
 
                         if student_row_index is None:
                             action_stats['studentsNotFound'].append(student_key)
-                            print(f"⚠️ Student '{student_key}' not found in sheet - skipping")
                             continue
 
                         action_stats['studentsProcessed'] += 1
 
-                        # 🔥 ENHANCED: Get existing value for merge strategies
-                        existing_value = None
-                        if student_row_index < len(table_data) and target_index < len(table_data[student_row_index]):
+                        # 🔥 ENHANCED: Get existing value for merge strategies. An earlier mapping
+                        # to the same column has already replaced it in the plan
+                        cell = (student_row_index + 4, target_index)
+                        existing_cell = None
+                        if cell in planned_cells:
+                            existing_cell = planned_cells[cell]
+                        elif student_row_index < len(table_data) and target_index < len(table_data[student_row_index]):
                             existing_cell = table_data[student_row_index][target_index]
-                            existing_value = str(existing_cell).strip() if existing_cell else None
-
-                        # 🔥 ENHANCED: Apply merge strategy
-                        should_update = False
-                        final_score = import_score
-                        conflict_resolved = False
-
-                        if action == 'replace':
-                            # Replace all data (original behavior)
-                            should_update = True
-                            final_score = import_score
-                            if existing_value:
-                                conflict_resolved = True
-
-                        elif action == 'merge_skip':
-                            # Skip students with existing scores
-                            if existing_value:
-                                print(f"🔄 MERGE_SKIP: Skipping {student_key} - has existing score '{existing_value}'")
-                                action_stats['cellsSkipped'] += 1
-                                should_update = False
-                            else:
-                                should_update = True
-                                final_score = import_score
-
-                        elif action == 'merge_update':
-                            # Only update empty cells
-                            if existing_value:
-                                print(f"🔄 MERGE_UPDATE: Keeping existing score for {student_key}: '{existing_value}'")
-                                action_stats['cellsSkipped'] += 1
-                                should_update = False
-                            else:
-                                should_update = True
-                                final_score = import_score
-
-                        elif action == 'merge_add':
-                            # Add to existing scores (sum)
-                            if existing_value and existing_value.replace('.', '').replace('-', '').isdigit():
-                                try:
-                                    existing_num = float(existing_value)
-                                    import_num = float(str(import_score))
-                                    final_score = existing_num + import_num
-                                    should_update = True
-                                    conflict_resolved = True
-                                    print(
-                                        f"🔄 MERGE_ADD: {student_key}: {existing_value} + {import_score} = {final_score}")
-                                except ValueError:
-                                    print(f"⚠️ MERGE_ADD: Cannot add non-numeric values for {student_key}")
-                                    should_update = False
-                            else:
-                                should_update = True
-                                final_score = import_score
-
-                        elif action == 'merge':
-                            # Default merge behavior (same as merge_skip for backward compatibility)
-                            if existing_value:
-                                action_stats['cellsSkipped'] += 1
-                                should_update = False
-                            else:
-                                should_update = True
-                                final_score = import_score
+                        existing_value = str(existing_cell).strip() if existing_cell else None
+
+                        should_update, final_score, conflict_resolved, skipped = self._apply_merge_strategy(
+                            action, existing_value, import_score, student_key
+                        )
+
+                        if skipped:
+                            action_stats['cellsSkipped'] += 1
 
-                        # 🔥 ENHANCED: Execute the update if needed
                         if should_update:
-                            update_result = self.update_cell_in_sheet(
-                                sheet_id, student_row_index, import_column, final_score, target_sheet_name
-                            )
-
-                            if update_result['success']:
-                                action_stats['cellsUpdated'] += 1
-                                if conflict_resolved:
-                                    action_stats['conflictsResolved'] += 1
-                                print(
-                                    f"✅ Updated {student_key}: '{existing_value}' → '{final_score}' in {import_column}")
-                            else:
-                                results['errors'].append(f"Failed to update {student_key} in {import_column}")
+                            planned_cells[cell] = final_score
+                            action_stats['cellsUpdated'] += 1
+                            if conflict_resolved:
+                                action_stats['conflictsResolved'] += 1
 
                     # 🔥 NEW: Aggregate action statistics
                     results['studentsUpdated'] += action_stats['studentsProcessed']
-                    results['cellsUpdated'] += action_stats['cellsUpdated']
                     results['cellsSkipped'] += action_stats['cellsSkipped']
                     results['conflictsResolved'] += action_stats['conflictsResolved']
                     results['actionSummary'][import_column] = action_stats
 
                     logger.info(
-                        f"✅ Column '{import_column}' ({action}): {action_stats['cellsUpdated']} updated, {action_stats['cellsSkipped']} skipped, {action_stats['conflictsResolved']} conflicts resolved")
+                        f"✅ Column '{import_column}' ({action}): {action_stats['cellsUpdated']} planned, {action_stats['cellsSkipped']} skipped, {action_stats['conflictsResolved']} conflicts resolved")
 
                     if action_stats['studentsNotFound']:
                         logger.info(f"Students not found for '{import_column}': {action_stats['studentsNotFound']}")
 
-                except ValueError:
-                    results['errors'].append(f"Target column {target_column} not found in sheet")
                 except Exception as e:
                     results['errors'].append(f"Error importing {import_column}: {str(e)}")
                     logger.error(f"Import error for {import_column}: {str(e)}")
 
+            # Cells hit by several mappings are written once
+            results['cellsUpdated'] = len([cell for cell in planned_cells if cell[0] != 2])
+
+            # Step 4: Write renames and values as contiguous ranges in one call
+            updates = build_range_updates(target_sheet_name, planned_cells)
+            plan = {
+                'renames': renames,
+                'ranges': updates,
+                'rangeCount': len(updates),
+                'cellCount': len(planned_cells)
+            }
+
+            if dry_run:
+                return {
+                    'success': True,
+                    'dry_run': True,
+                    'plan': plan,
+                    'results': results,
+                    'summary': f"Dry run: would write {len(planned_cells)} cells in {len(updates)} ranges"
+                }
+
+            if updates:
+                try:
+                    self.sheets_service.spreadsheets().values().batchUpdate(
+                        spreadsheetId=sheet_id,
+                        body={
+                            'valueInputOption': 'USER_ENTERED',
+                            'data': updates
+                        }
+                    ).execute()
+                    print(f"✅ Column import wrote {len(planned_cells)} cells in {len(updates)} ranges")
+                except Exception as e:
+                    logger.error(f"Column import write failed: {str(e)}")
+                    results['success'] = False
+                    results['columnsRenamed'] = 0
+                    results['cellsUpdated'] = 0
+                    results['conflictsResolved'] = 0
+                    results['errors'].append(f"Failed to write imported data: {str(e)}")
+                    return {
+                        'success': False,
+                        'error': f'Failed to write imported data: {str(e)}',
+                        'results': results
+                    }
+
             # 🔥 ENHANCED: Detailed summary
             total_actions = len([m for m in column_mappings if m.get('action') != 'skip'])
             summary_parts = []
@@ -1789,6 +2430,7 @@ class GoogleServiceAccountSheets:
             return {
                 'success': True,
                 'results': results,
+                'plan': plan,
                 'summary': f"Import completed: {summary} across {total_actions} columns"
             }
 
@@ -1799,6 +2441,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to import column data: {str(e)}'
             }
 
+    @_writes_sheet(structure_changed=True)
     def rename_column_header(self, sheet_id: str, column_index: int, new_name: str, sheet_name: str) -> dict:
         """
         Rename a column header in the Google Sheet.
@@ -1813,11 +2456,10 @@ class GoogleServiceAccountSheets:
             Dict containing success status
         """
         try:
-            # Convert column index to letter
-            column_letter = chr(65 + column_index)
+            letter = column_letter(column_index)
 
             # Update the sub-header (row 2) - this is where the actual column names are
-            cell_range = f"'{sheet_name}'!{column_letter}2"
+            cell_range = f"'{sheet_name}'!{letter}2"
 
             body = {
                 'values': [[new_name]]
@@ -1830,7 +2472,7 @@ class GoogleServiceAccountSheets:
                 body=body
             ).execute()
 
-            logger.info(f"Successfully renamed column {column_letter} to '{new_name}'")
+            logger.info(f"Successfully renamed column {letter} to '{new_name}'")
 
             return {
                 'success': True,
@@ -1850,120 +2492,31 @@ class GoogleServiceAccountSheets:
     def find_student_row_by_name(self, student_identifier: str, table_data: list, headers: list) -> int:
         """
         Find a student's row index by name matching.
-        FIXED: More strict matching to prevent false positives.
-        """
-        try:
-            # Find name column indices
-            first_name_idx = None
-            last_name_idx = None
 
-            for idx, header in enumerate(headers):
-                if 'FIRST NAME' in header.upper() or 'FIRSTNAME' in header.upper():
-                    first_name_idx = idx
-                elif 'LAST NAME' in header.upper() or 'LASTNAME' in header.upper():
-                    last_name_idx = idx
+        Builds a StudentIndex for the given rows; callers that look up many
+        students should use _get_student_index(snapshot) and reuse it instead.
 
-            if first_name_idx is None or last_name_idx is None:
+        Args:
+            student_identifier: 'First Last' or 'Last, First'
+            table_data: Data rows (tableData)
+            headers: Column names (row 2)
+
+        Returns:
+            0-based row index in table_data, or None if no student matches
+        """
+        try:
+            columns = SheetColumnMap(headers)
+            if columns.first_name is None or columns.last_name is None:
                 logger.warning(f"Could not find name columns. Headers: {headers}")
                 return None
 
-            # 🔥 ENHANCED: Parse the student identifier with multiple format support
-            search_first = ""
-            search_last = ""
-
-            if ',' in student_identifier:
-                # Format: "Smith, John" (Last, First)
-                parts = [p.strip() for p in student_identifier.split(',')]
-                search_last = parts[0].lower() if len(parts) > 0 else ''
-                search_first = parts[1].lower() if len(parts) > 1 else ''
-            else:
-                # Format: "John Smith" (First Last) - assume first word is first name, rest is last name
-                parts = student_identifier.strip().split()
-                if len(parts) == 1:
-                    # Only one name provided - could be first or last
-                    single_name = parts[0].lower()
-                    search_first = single_name
-                    search_last = single_name
-                elif len(parts) >= 2:
-                    search_first = parts[0].lower()
-                    search_last = ' '.join(parts[1:]).lower()
-
-            logger.info(
-                f"🔍 Searching for student: '{student_identifier}' -> First: '{search_first}', Last: '{search_last}'")
-
-            # 🔥 FIXED: More strict matching strategies
-            for row_index, row in enumerate(table_data):
-                if first_name_idx < len(row) and last_name_idx < len(row):
-                    row_first = str(row[first_name_idx]).strip().lower() if row[first_name_idx] else ''
-                    row_last = str(row[last_name_idx]).strip().lower() if row[last_name_idx] else ''
-
-                    # Skip empty rows
-                    if not row_first and not row_last:
-                        continue
-
-                    # 🔥 STRATEGY 1: Exact match (highest priority)
-                    if search_first == row_first and search_last == row_last:
-                        logger.info(f"✅ EXACT match found at row {row_index}: {row_first} {row_last}")
-                        return row_index
-
-                    # 🔥 STRATEGY 2: Reversed order match
-                    if search_first == row_last and search_last == row_first:
-                        logger.info(f"✅ REVERSED match found at row {row_index}: {row_first} {row_last}")
-                        return row_index
-
-                    # 🔥 STRATEGY 3: Last name exact + first name contains (STRICTER)
-                    # This handles "Jared" in sheet matching "Jared Karl" in import
-                    if (search_last == row_last and
-                            len(search_first) >= 3 and len(row_first) >= 3 and
-                            (search_first in row_first or row_first in search_first)):
-
-                        # Additional validation: ensure it's a reasonable match
-                        first_similarity = len(set(search_first) & set(row_first)) / max(len(search_first),
-                                                                                         len(row_first))
-                        if first_similarity >= 0.6:  # At least 60% character overlap
-                            logger.info(
-                                f"✅ LAST EXACT + FIRST CONTAINS match found at row {row_index}: {row_first} {row_last}")
-                            return row_index
-
-                    # 🔥 STRATEGY 4: First name exact + last name contains (STRICTER)
-                    if (search_first == row_first and
-                            len(search_last) >= 3 and len(row_last) >= 3 and
-                            (search_last in row_last or row_last in search_last)):
-
-                        # Additional validation
-                        last_similarity = len(set(search_last) & set(row_last)) / max(len(search_last), len(row_last))
-                        if last_similarity >= 0.6:  # At least 60% character overlap
-                            logger.info(
-                                f"✅ FIRST EXACT + LAST CONTAINS match found at row {row_index}: {row_first} {row_last}")
-                            return row_index
-
-                    # 🔥 STRATEGY 5: Full name matching (for cases like "Jared Karl" vs "Jared Karl Omen")
-                    import_full = f"{search_first} {search_last}".strip()
-                    sheet_full = f"{row_first} {row_last}".strip()
-
-                    # Check if one full name is contained in the other (with minimum length requirement)
-                    if (len(import_full) >= 6 and len(sheet_full) >= 6 and
-                            (import_full in sheet_full or sheet_full in import_full)):
-
-                        # Ensure it's not a coincidental substring match
-                        word_overlap = len(set(import_full.split()) & set(sheet_full.split()))
-                        total_words = max(len(import_full.split()), len(sheet_full.split()))
-
-                        if word_overlap >= 2 or (total_words <= 2 and word_overlap >= 1):
-                            logger.info(f"✅ FULL NAME CONTAINS match found at row {row_index}: {row_first} {row_last}")
-                            return row_index
-
-            # 🔥 NO MATCH FOUND - Log available students for debugging
-            logger.warning(f"❌ No match found for: '{student_identifier}'")
-            logger.warning(f"Available students in sheet (first 5):")
-            for i, row in enumerate(table_data[:5]):
-                if first_name_idx < len(row) and last_name_idx < len(row):
-                    sheet_first = str(row[first_name_idx]).strip() if row[first_name_idx] else ''
-                    sheet_last = str(row[last_name_idx]).strip() if row[last_name_idx] else ''
-                    if sheet_first or sheet_last:  # Only show non-empty rows
-                        logger.warning(f"  Row {i}: '{sheet_first}' '{sheet_last}'")
+            match = StudentIndex(table_data, columns).match(student_identifier)
+            if match is None:
+                logger.warning(f"❌ No match found for: '{student_identifier}'")
+                return None
 
-            return None
+            logger.info(f"✅ {match.strategy} match for '{student_identifier}' at row {match.row_index}")
+            return match.row_index
 
         except Exception as e:
             logger.error(f"Find student row by name error: {str(e)}")
@@ -2251,6 +2804,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to save import history: {str(e)}'
             }
 
+    @_writes_sheet()
     def update_max_score_in_sheet(self, sheet_id: str, column_name: str, max_score: str,
                                   sheet_name: str = None) -> dict:
         """
@@ -2266,11 +2820,9 @@ class GoogleServiceAccountSheets:
             Dict containing success status and update info
         """
         try:
-            # Get sheet data to find column index and sheet name
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
+            # Only headers are needed here, so a snapshot behind our own value writes is fine
+            snapshot = self._get_snapshot(sheet_id, sheet_name, structure_only=True)
+            sheet_data = snapshot.data
 
             if not sheet_data['success']:
                 return sheet_data
@@ -2278,22 +2830,17 @@ class GoogleServiceAccountSheets:
             headers = sheet_data['headers']  # This is Row 2 (column names)
             target_sheet_name = sheet_data['sheet_name']
 
-            # Find column index by matching column name
-            try:
-                column_index = headers.index(column_name)
-            except ValueError:
+            column = self._get_column_map(snapshot).get(column_name)
+            if column is None:
                 logger.error(f"Column '{column_name}' not found in headers: {headers}")
                 return {
                     'success': False,
                     'error': f'Column "{column_name}" not found. Available columns: {headers}'
                 }
 
-            # Convert column index to letter (A, B, C, etc.)
-            column_letter = chr(65 + column_index)
-
             # 🔥 CRITICAL: Row 3 is the max scores row (1-based indexing)
             max_score_row = 3
-            cell_range = f"'{target_sheet_name}'!{column_letter}{max_score_row}"
+            cell_range = f"'{target_sheet_name}'!{column.letter}{max_score_row}"
 
             logger.info(f"Updating max score cell {cell_range} with value '{max_score}'")
 
@@ -2327,16 +2874,25 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to update max score: {str(e)}'
             }
 
+    @_writes_sheet()
     def update_batch_max_scores_in_sheet(self, sheet_id: str, column_names: list, max_score: str,
-                                         sheet_name: str = None) -> dict:
+                                         sheet_name: str = None, category: str = None,
+                                         pattern: str = None) -> dict:
         """
         Update max scores for multiple columns (batch operation).
 
+        All columns are resolved against one snapshot and their Row 3 cells are
+        written with one values.batchUpdate. Instead of listing names, columns can
+        be selected by category ('QUIZ' -> every column under the QUIZ header) or
+        by header pattern ('LAB *'); formula columns are never selected that way.
+
         Args:
             sheet_id: ID of the spreadsheet
-            column_names: List of column names (e.g., ['QUIZ 1', 'QUIZ 2'])
+            column_names: List of column names (e.g., ['QUIZ 1', 'QUIZ 2']), may be empty with a selector
             max_score: New max score value for all columns
             sheet_name: Name of the specific sheet
+            category: Row 1 category whose columns should be updated
+            pattern: Shell-style pattern matched against the column names
 
         Returns:
             Dict containing batch update results
@@ -2347,27 +2903,60 @@ class GoogleServiceAccountSheets:
                 'updated_columns': 0,
                 'failed_columns': 0,
                 'errors': [],
-                'updated_cells': 0
+                'updated_cells': 0,
+                'columns': []
             }
 
-            # Update each column individually
-            for column_name in column_names:
-                try:
-                    result = self.update_max_score_in_sheet(sheet_id, column_name, max_score, sheet_name)
+            # Only headers are needed here, so a snapshot behind our own value writes is fine
+            snapshot = self._get_snapshot(sheet_id, sheet_name, structure_only=True)
+            sheet_data = snapshot.data
 
-                    if result['success']:
-                        results['updated_columns'] += 1
-                        results['updated_cells'] += result.get('updated_cells', 0)
-                        logger.info(f"✅ Updated {column_name} max score to {max_score}")
-                    else:
-                        results['failed_columns'] += 1
-                        results['errors'].append(f"{column_name}: {result.get('error', 'Unknown error')}")
-                        logger.error(f"❌ Failed to update {column_name}: {result.get('error')}")
+            if not sheet_data['success']:
+                return sheet_data
 
-                except Exception as e:
+            target_sheet_name = sheet_data['sheet_name']
+            columns = self._get_column_map(snapshot)
+
+            # 🔥 CRITICAL: Row 3 is the max scores row (1-based indexing)
+            max_score_row = 3
+            cells = {}
+
+            for column_name in column_names or []:
+                column = columns.get(column_name)
+                if column is None:
                     results['failed_columns'] += 1
-                    results['errors'].append(f"{column_name}: {str(e)}")
-                    logger.error(f"❌ Exception updating {column_name}: {str(e)}")
+                    results['errors'].append(f'{column_name}: Column "{column_name}" not found')
+                    logger.error(f"❌ Column '{column_name}' not found in headers: {sheet_data['headers']}")
+                    continue
+                cells[(max_score_row, column.index)] = str(max_score)
+
+            for column in columns.select(category=category, pattern=pattern):
+                cells[(max_score_row, column.index)] = str(max_score)
+
+            if not cells:
+                if not results['errors']:
+                    results['errors'].append('No columns matched')
+                return {
+                    'success': False,
+                    'results': results,
+                    'error': 'No columns to update',
+                    'summary': f"Updated 0 columns, {results['failed_columns']} failed"
+                }
+
+            updates = build_range_updates(target_sheet_name, cells)
+            result = self.sheets_service.spreadsheets().values().batchUpdate(
+                spreadsheetId=sheet_id,
+                body={
+                    'valueInputOption': 'USER_ENTERED',
+                    'data': updates
+                }
+            ).execute()
+
+            results['updated_columns'] = len(cells)
+            results['updated_cells'] = result.get('totalUpdatedCells', 0)
+            results['columns'] = [columns[index].header for _, index in sorted(cells)]
+            results['ranges'] = [update['range'] for update in updates]
+            logger.info(f"✅ Updated {len(cells)} max scores to {max_score} in {len(updates)} ranges")
 
             # Determine overall success
             if results['failed_columns'] > 0:
@@ -2390,6 +2979,7 @@ class GoogleServiceAccountSheets:
                 'error': f'Failed to update batch max scores: {str(e)}'
             }
 
+    @_writes_sheet(structure_changed=True)
     def update_range(self, sheet_id, range_name, values, sheet_name=None):
         """Update a range of cells in the sheet"""
         try:
@@ -2427,156 +3017,89 @@ class GoogleServiceAccountSheets:
                                   sheet_name: str = None) -> dict:
         """
         Delete a student from the Google Sheet by name or ID.
-        Updated with formula protection and fresh data handling.
-        """
-        try:
-            import time
-
-            # 🔥 CRITICAL: Add small delay to ensure Google Sheets propagation
-            time.sleep(0.5)
-
-            # Get FRESH sheet data (force refresh)
-            if sheet_name:
-                sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            else:
-                sheet_data = self.get_sheet_data(sheet_id)
 
-            if not sheet_data['success']:
-                return sheet_data
+        Students below the deleted one move up, gaps are closed and the NO. column
+        is renumbered, all in one values.batchUpdate with one 2D range per run of
+        non-formula columns. Formula columns are never written. The resulting
+        sheet data is cached and returned, so callers don't have to read it again.
 
-            headers = sheet_data['headers']
-            target_sheet_name = sheet_data['sheet_name']
-            current_data = sheet_data['tableData']
+        Args:
+            sheet_id: ID of the spreadsheet
+            student_identifier: Student name, or student ID if search_type is 'id'
+            search_type: 'name' or 'id'
+            sheet_name: Name of the specific sheet (if None, uses first sheet)
 
-            print(f"🗑️ DELETE STUDENT: Searching for {search_type}: '{student_identifier}'")
-            print(f"🗑️ DELETE STUDENT: Total rows to search: {len(current_data)}")
-
-            # 🔥 DEBUG: Print all current students for debugging
-            print("🗑️ DEBUG: Current students in sheet:")
-            for idx, row in enumerate(current_data):
-                if len(row) >= 3:
-                    first_name = str(row[2]).strip() if len(row) > 2 and row[2] else ''
-                    last_name = str(row[1]).strip() if len(row) > 1 and row[1] else ''
-                    if first_name or last_name:
-                        print(f"   Row {idx + 4}: {first_name} {last_name}")
-
-            # Find student row with EXACT matching
-            student_row_index = None
-            student_info = {}
-
-            for row_index, row in enumerate(current_data):
-                if search_type == 'name':
-                    # Search by name (first name + last name)
-                    if len(row) >= 3:
-                        first_name = str(row[2]).strip() if len(row) > 2 and row[2] else ''
-                        last_name = str(row[1]).strip() if len(row) > 1 and row[1] else ''
-                        full_name = f"{first_name} {last_name}".strip()
-
-                        # 🔥 ENHANCED: More precise matching
-                        name_matches = [
-                            student_identifier.lower() in full_name.lower(),
-                            full_name.lower() in student_identifier.lower(),
-                            student_identifier.lower() == first_name.lower(),
-                            student_identifier.lower() == last_name.lower(),
-                            # 🔥 NEW: Try individual word matching
-                            any(word.lower() == student_identifier.lower() for word in full_name.split()),
-                            # 🔥 NEW: Try partial last name match
-                            student_identifier.lower() in last_name.lower(),
-                            student_identifier.lower() in first_name.lower()
-                        ]
-
-                        if any(name_matches):
-                            student_row_index = row_index
-                            student_info = {
-                                'first_name': first_name,
-                                'last_name': last_name,
-                                'full_name': full_name,
-                                'student_id': str(row[3]).strip() if len(row) > 3 and row[3] else 'N/A'
-                            }
-                            print(f"🗑️ FOUND MATCH: '{student_identifier}' -> '{full_name}' at row {row_index}")
-                            break
-
-                elif search_type == 'id':
-                    # Search by student ID
-                    if len(row) > 3 and row[3]:
-                        row_student_id = str(row[3]).strip()
-                        if row_student_id == student_identifier:
-                            student_row_index = row_index
-                            student_info = {
-                                'first_name': str(row[2]).strip() if len(row) > 2 and row[2] else '',
-                                'last_name': str(row[1]).strip() if len(row) > 1 and row[1] else '',
-                                'student_id': row_student_id
-                            }
-                            student_info[
-                                'full_name'] = f"{student_info['first_name']} {student_info['last_name']}".strip()
-                            break
-
-            if student_row_index is None:
-                return {
-                    'success': False,
-                    'error': f'Student not found: {student_identifier}',
-                    'search_type': search_type,
-                    'available_students': [
-                        f"{str(row[2]).strip() if len(row) > 2 and row[2] else ''} {str(row[1]).strip() if len(row) > 1 and row[1] else ''}".strip()
-                        for row in current_data if len(row) >= 3 and (str(row[2]).strip() or str(row[1]).strip())
-                    ]
-                }
+        Returns:
+            Dict with the deleted student's info and the updated sheet_data
+        """
+        try:
+            # One delete at a time per spreadsheet, so each one plans from the previous result
+            with _get_sheet_lock(sheet_id):
+                if write_buffer.pending_count(sheet_id):
+                    write_buffer.flush(sheet_id, collect=False)
 
-            # Calculate actual sheet row (add 4 for header rows and 1-based indexing)
-            sheet_row = student_row_index + 4
+                # Every row below the student is rewritten from this read, so it can't come from the cache
+                snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+                sheet_data = snapshot.data
 
-            print(f"🗑️ DELETE STUDENT: Found student at row index {student_row_index} (sheet row {sheet_row})")
-            print(f"🗑️ DELETE STUDENT: Student info: {student_info}")
+                if not sheet_data['success']:
+                    return sheet_data
 
-            # 🔥 FORMULA PROTECTION: Update only specific columns to avoid formula columns
-            updates = []
+                target_sheet_name = sheet_data['sheet_name']
+                current_data = sheet_data['tableData']
+                columns = self._get_column_map(snapshot)
 
-            for col_index, header in enumerate(headers):
-                column_letter = chr(65 + col_index)
+                print(f"🗑️ DELETE STUDENT: Searching for {search_type}: '{student_identifier}'")
 
-                # 🔥 SKIP formula columns - same logic as add_student
-                header_name = header.upper()
-                formula_keywords = ['TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA']
-                is_formula_column = any(keyword in header_name for keyword in formula_keywords)
+                # Find student row; exact name matches win over partial ones
+                students = self._get_student_index(snapshot)
 
-                if not is_formula_column:
-                    updates.append({
-                        'range': f"'{target_sheet_name}'!{column_letter}{sheet_row}",
-                        'values': [['']]  # Clear with empty string
-                    })
-                    print(f"🗑️ DELETE STUDENT: Clearing data column: {column_letter}{sheet_row} ({header})")
+                if search_type == 'id':
+                    student_row_index = students.find_by_id(student_identifier)
                 else:
-                    print(f"🗑️ DELETE STUDENT: SKIPPING formula column: {header}")
-
-            print(f"🗑️ DELETE STUDENT: Total columns to clear: {len(updates)}")
+                    student_row_index = students.find(student_identifier)
+                    if student_row_index is None:
+                        student_row_index = students.find_partial(student_identifier)
+
+                if student_row_index is None:
+                    return {
+                        'success': False,
+                        'error': f'Student not found: {student_identifier}',
+                        'search_type': search_type,
+                        'available_students': students.display_names()
+                    }
 
-            # 🔥 Batch update only the data columns (same pattern as add_student)
-            if updates:
-                body = {
-                    'valueInputOption': 'USER_ENTERED',
-                    'data': updates
+                entry = students.get_entry(student_row_index)
+                student_info = {
+                    'first_name': entry.display_first,
+                    'last_name': entry.display_last,
+                    'full_name': entry.display_name,
+                    'student_id': entry.student_id or 'N/A'
                 }
 
-                result = self.sheets_service.spreadsheets().values().batchUpdate(
-                    spreadsheetId=sheet_id,
-                    body=body
-                ).execute()
+                # Calculate actual sheet row (add 4 for header rows and 1-based indexing)
+                sheet_row = student_row_index + 4
+                print(f"🗑️ FOUND MATCH: '{student_identifier}' -> '{entry.display_name}' at sheet row {sheet_row}")
 
-                print(f"🗑️ DELETE STUDENT: Batch update successful, cleared {result.get('totalUpdatedCells', 0)} cells")
-            else:
-                print("🗑️ DELETE STUDENT: No columns to clear")
-                result = {'totalUpdatedCells': 0}
+                new_rows, first_changed = self._plan_compacted_rows(current_data, columns, student_row_index)
+                updates = build_block_updates(
+                    target_sheet_name, columns.writable_runs(), first_changed + 4, new_rows[first_changed:]
+                )
 
-            # 🔥 CRITICAL: Add delay before compacting
-            time.sleep(1.0)
+                result = {}
+                if updates:
+                    result = self.sheets_service.spreadsheets().values().batchUpdate(
+                        spreadsheetId=sheet_id,
+                        body={
+                            'valueInputOption': 'USER_ENTERED',
+                            'data': updates
+                        }
+                    ).execute()
 
-            # 🔥 COMPACT STUDENT DATA
-            compact_result = self.compact_student_data(sheet_id, target_sheet_name)
-            if not compact_result['success']:
-                print(f"⚠️ Warning: Failed to compact students: {compact_result.get('error')}")
+                print(f"🗑️ DELETE STUDENT: Shifted rows {first_changed + 4}-{len(new_rows) + 3} "
+                      f"in {len(updates)} ranges, {result.get('totalUpdatedCells', 0)} cells")
 
-            # 🔥 CRITICAL: Add final delay for data propagation
-            time.sleep(0.5)
+                new_snapshot = self._prime_snapshot(sheet_id, sheet_name, sheet_data, new_rows)
 
             logger.info(f"Successfully deleted student {student_info['full_name']} from {target_sheet_name}")
 
@@ -2585,80 +3108,118 @@ class GoogleServiceAccountSheets:
                 'deleted_student': student_info,
                 'row_cleared': sheet_row,
                 'sheet_name': target_sheet_name,
-                'compacted': compact_result.get('success', False),
-                'compacted_count': compact_result.get('compacted_count', 0),
-                'cleared_columns': len(updates)
+                'compacted': True,
+                'compacted_count': len(students) - 1,
+                'cleared_columns': len(columns.writable_columns()),
+                'updated_cells': result.get('totalUpdatedCells', 0),
+                'ranges_written': len(updates),
+                'sheet_data': new_snapshot.as_dict()
             }
 
         except Exception as e:
             logger.error(f"Unexpected error deleting student: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
+            self._invalidate_snapshots(sheet_id)
             return {
                 'success': False,
                 'error': f'Failed to delete student: {str(e)}'
             }
 
+    @staticmethod
+    def _plan_compacted_rows(table_data: list, columns: SheetColumnMap, drop_row_index: int = None) -> tuple:
+        """
+        Lay out the data rows with students moved up into consecutive rows and
+        numbered from 1 in the NO. column, optionally leaving one row out.
+
+        Returns:
+            (new_rows, first_changed): the new rows, as many as before, and the index of
+            the first row whose writable cells differ (len(new_rows) if none do)
+        """
+        width = len(columns)
+        writable = [column.index for column in columns.writable_columns()]
+        number_column = 0 in writable
+
+        current_rows = [list(row[:width]) + [''] * (width - len(row)) for row in table_data]
+        new_rows = []
+        for row_index, row in enumerate(current_rows):
+            if row_index != drop_row_index and columns.row_has_student(row):
+                row = list(row)
+                if number_column:
+                    row[0] = str(len(new_rows) + 1)
+                new_rows.append(row)
+        new_rows.extend([''] * width for _ in range(len(current_rows) - len(new_rows)))
+
+        first_changed = len(new_rows)
+        for row_index, (old_row, new_row) in enumerate(zip(current_rows, new_rows)):
+            if any(str(old_row[i] or '') != str(new_row[i] or '') for i in writable):
+                first_changed = row_index
+                break
+        return new_rows, first_changed
+
+    def _prime_snapshot(self, sheet_id: str, sheet_name: str, sheet_data: dict, new_rows: list) -> SheetSnapshot:
+        """
+        Cache the sheet as we just wrote it, so the next read doesn't go to the API.
+
+        Formula columns keep the values they had in each moved row; the snapshot is
+        only served while fresh and re-validated against Drive after that.
+        """
+        self._invalidate_snapshots(sheet_id)
+        snapshot = SheetSnapshot(dict(sheet_data, tableData=new_rows))
+        snapshot_cache.put((sheet_id, sheet_name), snapshot)
+        if sheet_name != sheet_data['sheet_name']:
+            snapshot_cache.put((sheet_id, sheet_data['sheet_name']), snapshot)
+        return snapshot
+
+    @_writes_sheet()
     def renumber_all_students(self, sheet_id: str, sheet_name: str) -> dict:
         """
         Renumber all students after deletion to maintain sequence.
+
+        The NO. column is written as a single A4:A{n} range; rows without a
+        student are skipped (null cells) so their contents stay as they are.
         """
         try:
             # Get fresh sheet data
-            sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
+            snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+            sheet_data = snapshot.data
             if not sheet_data['success']:
                 return sheet_data
 
-            headers = sheet_data['headers']
-            current_data = sheet_data['tableData']
-
-            updates = []
-            student_number = 1
-
-            for row_index, row in enumerate(current_data):
-                # Check if row has student data
-                has_student_data = False
-                if len(row) >= 3:
-                    first_name = str(row[2]).strip() if len(row) > 2 and row[2] else ''
-                    last_name = str(row[1]).strip() if len(row) > 1 and row[1] else ''
-
-                    if first_name or last_name:
-                        has_student_data = True
-
-                if has_student_data:
-                    # Calculate sheet row
-                    sheet_row = row_index + 4  # +3 for headers, +1 for 1-based indexing
-
-                    updates.append({
-                        'range': f"'{sheet_name}'!A{sheet_row}",
-                        'values': [[str(student_number)]]
-                    })
+            columns = self._get_column_map(snapshot)
 
-                    student_number += 1
-
-            # Batch update all numbers
-            if updates:
-                body = {
-                    'valueInputOption': 'USER_ENTERED',
-                    'data': updates
-                }
+            numbers = []
+            updated_count = 0
+            last_student_row = -1
+            for row_index, row in enumerate(sheet_data['tableData']):
+                if columns.row_has_student(row):
+                    updated_count += 1
+                    numbers.append([str(updated_count)])
+                    last_student_row = row_index
+                else:
+                    numbers.append([None])
 
-                result = self.sheets_service.spreadsheets().values().batchUpdate(
-                    spreadsheetId=sheet_id,
-                    body=body
-                ).execute()
+            numbers = numbers[:last_student_row + 1]
 
-                print(f"🔢 RENUMBER: Updated {len(updates)} student numbers")
-                return {
-                    'success': True,
-                    'updated_count': len(updates)
-                }
-            else:
+            if not numbers:
                 return {
                     'success': True,
                     'updated_count': 0
                 }
 
+            self.sheets_service.spreadsheets().values().update(
+                spreadsheetId=sheet_id,
+                range=f"'{sheet_data['sheet_name']}'!A4:A{len(numbers) + 3}",
+                valueInputOption='USER_ENTERED',
+                body={'values': numbers}
+            ).execute()
+
+            print(f"🔢 RENUMBER: Updated {updated_count} student numbers")
+            return {
+                'success': True,
+                'updated_count': updated_count
+            }
+
         except Exception as e:
             logger.error(f"Error renumbering students: {str(e)}")
             return {
@@ -2670,136 +3231,68 @@ class GoogleServiceAccountSheets:
         """
         Compact student data by removing gaps and moving students up to fill empty rows.
         Preserves formulas in Total columns.
+
+        Only rows from the first gap down are rewritten, as one 2D range per run of
+        columns between formula columns, in a single values.batchUpdate.
         """
         try:
             print(f"🔄 COMPACT: Starting compaction for sheet '{sheet_name}'")
 
-            # Get current sheet data
-            sheet_data = self.get_specific_sheet_data(sheet_id, sheet_name)
-            if not sheet_data['success']:
-                return sheet_data
-
-            headers = sheet_data['headers']
-            current_data = sheet_data['tableData']
-
-            # 🔍 Find all students with actual data
-            students_with_data = []
-
-            for row_index, row in enumerate(current_data):
-                # Check if row has student data
-                has_student_data = False
-                if len(row) >= 3:
-                    first_name = str(row[2]).strip() if len(row) > 2 and row[2] else ''
-                    last_name = str(row[1]).strip() if len(row) > 1 and row[1] else ''
-
-                    if first_name or last_name:
-                        has_student_data = True
-                        # Store the complete row data
-                        complete_row = row[:] + [''] * (len(headers) - len(row))  # Pad to match header length
-                        students_with_data.append({
-                            'original_index': row_index,
-                            'data': complete_row[:len(headers)]  # Ensure it matches header length
-                        })
-
-            print(f"🔄 COMPACT: Found {len(students_with_data)} students with data")
-
-            if len(students_with_data) == 0:
-                return {
-                    'success': True,
-                    'message': 'No students to compact',
-                    'compacted_count': 0
-                }
-
-            # 🔄 Create batch updates to compact the data
-            updates = []
-
-            # 🔥 Step 1: Clear all existing student rows (but keep formulas)
-            total_rows_to_clear = len(current_data)
-            for row_index in range(total_rows_to_clear):
-                sheet_row = row_index + 4  # +3 for headers, +1 for 1-based indexing
-
-                # Clear only data columns (not formula columns)
-                for col_index, header in enumerate(headers):
-                    column_letter = chr(65 + col_index)
-
-                    # 🔥 SKIP formula columns
-                    header_name = header.upper()
-                    formula_keywords = ['TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA']
-                    is_formula_column = any(keyword in header_name for keyword in formula_keywords)
-
-                    if not is_formula_column:
-                        updates.append({
-                            'range': f"'{sheet_name}'!{column_letter}{sheet_row}",
-                            'values': [['']]
-                        })
-
-            # 🔥 Step 2: Place students in consecutive rows starting from row 4
-            for new_index, student in enumerate(students_with_data):
-                student_number = new_index + 1
-                new_sheet_row = new_index + 4  # Start from row 4 (after 3 header rows)
-
-                # Update each column for this student
-                for col_index, header in enumerate(headers):
-                    column_letter = chr(65 + col_index)
-
-                    # 🔥 SKIP formula columns
-                    header_name = header.upper()
-                    formula_keywords = ['TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA']
-                    is_formula_column = any(keyword in header_name for keyword in formula_keywords)
-
-                    if not is_formula_column:
-                        if col_index == 0:  # NO. column
-                            value = str(student_number)
-                        else:
-                            # Get the original data, handling missing columns
-                            original_data = student['data']
-                            if col_index < len(original_data):
-                                value = str(original_data[col_index]) if original_data[col_index] else ''
-                            else:
-                                value = ''
-
-                        updates.append({
-                            'range': f"'{sheet_name}'!{column_letter}{new_sheet_row}",
-                            'values': [[value]]
-                        })
+            with _get_sheet_lock(sheet_id):
+                if write_buffer.pending_count(sheet_id):
+                    write_buffer.flush(sheet_id, collect=False)
 
-            print(f"🔄 COMPACT: Prepared {len(updates)} updates")
+                # Rows are rewritten from this read, so it can't come from the cache
+                snapshot = self._get_snapshot(sheet_id, sheet_name, fresh=True)
+                sheet_data = snapshot.data
+                if not sheet_data['success']:
+                    return sheet_data
 
-            # 🔥 Execute all updates in batches (Google Sheets has limits)
-            batch_size = 100  # Process in smaller batches
-            total_updated = 0
+                columns = self._get_column_map(snapshot)
+                new_rows, first_changed = self._plan_compacted_rows(sheet_data['tableData'], columns)
+                student_count = sum(1 for row in new_rows if columns.row_has_student(row))
 
-            for i in range(0, len(updates), batch_size):
-                batch_updates = updates[i:i + batch_size]
+                print(f"🔄 COMPACT: Found {student_count} students with data")
 
-                body = {
-                    'valueInputOption': 'USER_ENTERED',
-                    'data': batch_updates
-                }
+                if student_count == 0:
+                    return {
+                        'success': True,
+                        'message': 'No students to compact',
+                        'compacted_count': 0
+                    }
 
-                result = self.sheets_service.spreadsheets().values().batchUpdate(
-                    spreadsheetId=sheet_id,
-                    body=body
-                ).execute()
+                updates = build_block_updates(
+                    sheet_data['sheet_name'], columns.writable_runs(), first_changed + 4, new_rows[first_changed:]
+                )
 
-                batch_updated = result.get('totalUpdatedCells', 0)
-                total_updated += batch_updated
-                print(f"🔄 COMPACT: Batch {i // batch_size + 1} - Updated {batch_updated} cells")
+                total_updated = 0
+                if updates:
+                    result = self.sheets_service.spreadsheets().values().batchUpdate(
+                        spreadsheetId=sheet_id,
+                        body={
+                            'valueInputOption': 'USER_ENTERED',
+                            'data': updates
+                        }
+                    ).execute()
+                    total_updated = result.get('totalUpdatedCells', 0)
+                    self._prime_snapshot(sheet_id, sheet_name, sheet_data, new_rows)
 
-            print(f"🔄 COMPACT: Successfully compacted {len(students_with_data)} students")
-            print(f"🔄 COMPACT: Total cells updated: {total_updated}")
+            print(f"🔄 COMPACT: Successfully compacted {student_count} students "
+                  f"({len(updates)} ranges, {total_updated} cells)")
 
             return {
                 'success': True,
-                'compacted_count': len(students_with_data),
+                'compacted_count': student_count,
                 'total_updated_cells': total_updated,
-                'message': f'Successfully compacted {len(students_with_data)} students'
+                'ranges_written': len(updates),
+                'message': f'Successfully compacted {student_count} students'
             }
 
         except Exception as e:
             logger.error(f"Error compacting student data: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
+            self._invalidate_snapshots(sheet_id)
             return {
                 'success': False,
                 'error': f'Failed to compact student data: {str(e)}'
@@ -0,0 +1,331 @@
+import fnmatch
+from typing import Dict, Iterator, List, Optional
+
+# Columns whose header contains one of these hold sheet formulas and must never be written
+FORMULA_KEYWORDS = ('TOTAL', 'SUM', 'AVERAGE', 'AVG', 'FORMULA')
+
+FIRST_NAME_KEYS = ('FIRST NAME', 'FIRSTNAME')
+LAST_NAME_KEYS = ('LAST NAME', 'LASTNAME')
+STUDENT_ID_KEYS = ('STUDENT ID', 'STUDENTID', 'ID NUMBER', 'ID NO.', 'ID')
+
+
+def column_letter(index: int) -> str:
+    """
+    Convert a 0-based column index to its A1 letter (0 -> A, 25 -> Z, 26 -> AA).
+
+    Args:
+        index: 0-based column index
+
+    Returns:
+        Column letter(s) for A1 notation
+    """
+    if index < 0:
+        raise ValueError(f'Column index must be >= 0, got {index}')
+
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letter: str) -> int:
+    """
+    Convert an A1 column letter to its 0-based index (A -> 0, Z -> 25, AA -> 26).
+
+    Args:
+        letter: Column letter(s), case-insensitive
+
+    Returns:
+        0-based column index
+    """
+    letter = str(letter).strip().upper()
+    if not letter or not letter.isalpha():
+        raise ValueError(f'Invalid column letter: {letter!r}')
+
+    index = 0
+    for char in letter:
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def normalize_header(name) -> str:
+    """Normalize a header for lookups: trimmed, single-spaced, upper case."""
+    return ' '.join(str(name or '').split()).upper()
+
+
+def is_formula_header(header) -> bool:
+    """True if the header marks a formula column (TOTAL, SUM, AVERAGE...)."""
+    header_name = str(header or '').upper()
+    return any(keyword in header_name for keyword in FORMULA_KEYWORDS)
+
+
+class ColumnDescriptor:
+    """Everything the read and write paths need to know about one sheet column."""
+
+    __slots__ = ('index', 'letter', 'header', 'category', 'max_score', 'is_formula')
+
+    def __init__(self, index: int, header: str, category: str = '', max_score: str = ''):
+        self.index = index
+        self.letter = column_letter(index)
+        self.header = header
+        self.category = category
+        self.max_score = max_score
+        self.is_formula = is_formula_header(header)
+
+    def as_dict(self) -> Dict:
+        return {
+            'index': self.index,
+            'letter': self.letter,
+            'header': self.header,
+            'category': self.category,
+            'max_score': self.max_score,
+            'is_formula': self.is_formula
+        }
+
+    def __repr__(self):
+        return f"ColumnDescriptor({self.letter}, {self.header!r})"
+
+
+class SheetColumnMap:
+    """
+    Column descriptors for one sheet, built from the 3-row header template:
+    row 1 categories, row 2 column names, row 3 max scores.
+
+    Lookups by header name are O(1) and tolerant of case/spacing differences.
+    When two columns share a name the first one wins, like headers.index() did.
+    """
+
+    def __init__(self, headers: List[str], main_headers: List = None, max_scores: List = None):
+        main_headers = main_headers or []
+        max_scores = max_scores or []
+
+        self.columns = []
+        self._by_name = {}
+
+        # Category cells are merged across their columns and the API only returns
+        # the value for the first one, so carry it forward
+        category = ''
+        for index, header in enumerate(headers):
+            if index < len(main_headers) and str(main_headers[index] or '').strip():
+                category = str(main_headers[index]).strip()
+            max_score = str(max_scores[index]).strip() if index < len(max_scores) and max_scores[index] else ''
+
+            descriptor = ColumnDescriptor(index, header, category, max_score)
+            self.columns.append(descriptor)
+            self._by_name.setdefault(normalize_header(header), descriptor)
+
+        self.first_name = self._find_name_column(FIRST_NAME_KEYS)
+        self.last_name = self._find_name_column(LAST_NAME_KEYS)
+        self.student_id = self.find(*STUDENT_ID_KEYS)
+
+    @classmethod
+    def from_sheet_data(cls, sheet_data: Dict) -> 'SheetColumnMap':
+        """Build the map from the dict returned by get_sheet_data()."""
+        return cls(
+            sheet_data.get('headers', []),
+            sheet_data.get('main_headers', []),
+            sheet_data.get('max_scores', [])
+        )
+
+    def _find_name_column(self, keys) -> Optional[ColumnDescriptor]:
+        for descriptor in self.columns:
+            header_name = normalize_header(descriptor.header)
+            if any(key in header_name for key in keys):
+                return descriptor
+        return None
+
+    def get(self, name) -> Optional[ColumnDescriptor]:
+        """Descriptor for a header name, or None if the sheet has no such column."""
+        return self._by_name.get(normalize_header(name))
+
+    def find(self, *names) -> Optional[ColumnDescriptor]:
+        """Descriptor for the first of several alternative header names that exists."""
+        for name in names:
+            descriptor = self.get(name)
+            if descriptor is not None:
+                return descriptor
+        return None
+
+    def __getitem__(self, index: int) -> ColumnDescriptor:
+        return self.columns[index]
+
+    def __contains__(self, name) -> bool:
+        return normalize_header(name) in self._by_name
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __iter__(self) -> Iterator[ColumnDescriptor]:
+        return iter(self.columns)
+
+    def name_indexes(self) -> tuple:
+        """(last name, first name) column indexes, defaulting to the template's B and C."""
+        last_name = self.last_name.index if self.last_name else 1
+        first_name = self.first_name.index if self.first_name else 2
+        return last_name, first_name
+
+    def row_has_student(self, row: List) -> bool:
+        """True if a data row holds a student, i.e. has a last or first name."""
+        for index in self.name_indexes():
+            if index < len(row) and str(row[index] or '').strip():
+                return True
+        return False
+
+    def select(self, category: str = None, pattern: str = None) -> List[ColumnDescriptor]:
+        """
+        Non-formula columns matching a row-1 category and/or a header pattern.
+
+        Args:
+            category: Category name, e.g. 'QUIZ' (case-insensitive)
+            pattern: Shell-style header pattern, e.g. 'QUIZ *' or 'LAB ?' (case-insensitive)
+
+        Returns:
+            Matching descriptors in sheet order (empty if no selector is given)
+        """
+        if not category and not pattern:
+            return []
+
+        category = normalize_header(category) if category else None
+        pattern = normalize_header(pattern) if pattern else None
+
+        selected = []
+        for descriptor in self.writable_columns():
+            if category and normalize_header(descriptor.category) != category:
+                continue
+            if pattern and not fnmatch.fnmatchcase(normalize_header(descriptor.header), pattern):
+                continue
+            selected.append(descriptor)
+        return selected
+
+    @property
+    def last_letter(self) -> str:
+        return self.columns[-1].letter if self.columns else 'A'
+
+    def writable_columns(self) -> List[ColumnDescriptor]:
+        return [descriptor for descriptor in self.columns if not descriptor.is_formula]
+
+    def writable_runs(self) -> List[List[ColumnDescriptor]]:
+        """
+        Group the non-formula columns into runs of adjacent columns, so a row can
+        be written as a few contiguous ranges instead of one range per cell.
+        """
+        runs = []
+        current = []
+        for descriptor in self.columns:
+            if descriptor.is_formula:
+                if current:
+                    runs.append(current)
+                    current = []
+                continue
+            current.append(descriptor)
+        if current:
+            runs.append(current)
+        return runs
+
+
+def a1_range(sheet_name: str, first_row: int, first_column: int, last_row: int = None,
+             last_column: int = None) -> str:
+    """
+    A1 range for a block of cells, e.g. 'Sheet'!B4:E9 (or 'Sheet'!B4 for one cell).
+
+    Args:
+        sheet_name: Tab name
+        first_row: 1-based first row
+        first_column: 0-based first column index
+        last_row: 1-based last row (defaults to first_row)
+        last_column: 0-based last column index (defaults to first_column)
+    """
+    last_row = first_row if last_row is None else last_row
+    last_column = first_column if last_column is None else last_column
+
+    start = f"{column_letter(first_column)}{first_row}"
+    if last_row == first_row and last_column == first_column:
+        return f"'{sheet_name}'!{start}"
+    return f"'{sheet_name}'!{start}:{column_letter(last_column)}{last_row}"
+
+
+def build_range_updates(sheet_name: str, cells: Dict) -> List[Dict]:
+    """
+    Turn individual cell values into as few values.batchUpdate ranges as possible.
+
+    Adjacent columns of a row are written as one range, and consecutive rows that
+    cover the same columns are stacked into one block. Cells that are not given
+    are never part of a range, so formula columns in between stay untouched.
+
+    Args:
+        sheet_name: Tab name
+        cells: Dict of (1-based row, 0-based column index) -> value
+
+    Returns:
+        List of {'range': ..., 'values': ...} dicts for the 'data' of a batchUpdate
+    """
+    rows = {}
+    for (row, column), value in cells.items():
+        rows.setdefault(row, {})[column] = value
+
+    # (first column, width) -> [first row, last row, values], for blocks still growing
+    open_blocks = {}
+    blocks = []
+
+    for row in sorted(rows):
+        spans = []
+        columns = sorted(rows[row])
+        start = columns[0]
+        for previous, column in zip(columns, columns[1:] + [None]):
+            if column != previous + 1:
+                spans.append((start, [rows[row][c] for c in range(start, previous + 1)]))
+                start = column
+
+        still_open = {}
+        for start, values in spans:
+            key = (start, len(values))
+            block = open_blocks.get(key)
+            if block is not None and block[1] == row - 1:
+                block[1] = row
+                block[2].append(values)
+            else:
+                block = [row, row, [values]]
+                blocks.append((start, block))
+            still_open[key] = block
+        open_blocks = still_open
+
+    updates = []
+    for start, (first_row, last_row, values) in blocks:
+        updates.append({
+            'range': a1_range(sheet_name, first_row, start, last_row, start + len(values[0]) - 1),
+            'values': [[str(value) for value in row_values] for row_values in values]
+        })
+    return updates
+
+
+def build_block_updates(sheet_name: str, runs: List[List[ColumnDescriptor]], first_row: int,
+                        rows: List[List]) -> List[Dict]:
+    """
+    Write consecutive full rows as one 2D range per run of writable columns.
+
+    Args:
+        sheet_name: Tab name
+        runs: Column runs from SheetColumnMap.writable_runs()
+        first_row: 1-based sheet row of rows[0]
+        rows: Row values, each at least as wide as the last column of the runs
+
+    Returns:
+        List of {'range': ..., 'values': ...} dicts for the 'data' of a batchUpdate
+    """
+    if not rows:
+        return []
+
+    last_row = first_row + len(rows) - 1
+    updates = []
+    for run in runs:
+        first_column, last_column = run[0].index, run[-1].index
+        updates.append({
+            'range': a1_range(sheet_name, first_row, first_column, last_row, last_column),
+            'values': [
+                ['' if value is None else str(value) for value in row[first_column:last_column + 1]]
+                for row in rows
+            ]
+        })
+    return updates
@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Serve a snapshot without asking Drive if it was validated this recently
+    'FRESH_SECONDS': 3,
+    # Never serve a snapshot older than this, even if Drive says it is unchanged
+    'MAX_AGE_SECONDS': 300,
+    # Write paths only need headers/sheet name, which survive our own value writes;
+    # past FRESH_SECONDS they are re-checked against the header rows first
+    'STRUCTURE_MAX_AGE_SECONDS': 30,
+    # Allowance for clock skew when comparing Drive's modifiedTime to fetch time
+    'MODIFIED_TIME_SKEW_SECONDS': 5,
+    # Tab titles and grid sizes; reads that hit the grid bound refresh it anyway
+    'METADATA_MAX_AGE_SECONDS': 300,
+    'MAX_ENTRIES': 256,
+    'MAX_BYTES': 32 * 1024 * 1024,
+}
+
+# Field mask for spreadsheet metadata: tab titles, ids, order and grid sizes only,
+# not the named ranges, protected ranges and formatting a bare spreadsheets.get returns
+METADATA_FIELDS = 'properties.title,sheets.properties(sheetId,title,index,sheetType,gridProperties)'
+
+
+def build_metadata(spreadsheet: Dict) -> Dict:
+    """Metadata dict cached per spreadsheet, from a spreadsheets.get response."""
+    return {
+        'title': spreadsheet.get('properties', {}).get('title', 'Unknown'),
+        'sheets': [sheet_info['properties'] for sheet_info in spreadsheet.get('sheets', [])],
+        'fetched_at': time.monotonic()
+    }
+
+
+def _copy_rows(rows):
+    return [list(row) if isinstance(row, list) else row for row in rows]
+
+
+def _estimate_size(data: Dict) -> int:
+    """Rough in-memory footprint of a parsed sheet read, used for the memory budget."""
+    size = 512
+    for key in ('headers', 'main_headers', 'sub_headers', 'max_scores'):
+        size += sum(len(str(cell)) + 56 for cell in data.get(key, []) or [])
+    for row in data.get('tableData', []) or []:
+        size += 64 + sum(len(str(cell)) + 56 for cell in row)
+    return size
+
+
+class SheetSnapshot:
+    """
+    One parsed read of a sheet (headers, max_scores, tableData) plus the structures
+    derived from it. Derived structures are built lazily, once per snapshot.
+    """
+
+    def __init__(self, data: Dict, version: Optional[str] = None):
+        self.data = data
+        self.version = version
+        self.fetched_at = time.monotonic()
+        self.fetched_at_wall = time.time()
+        self.validated_at = self.fetched_at
+        self.structure_validated_at = self.fetched_at
+        self.dirty = False
+        self.size = _estimate_size(data) if data.get('success') else 0
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @property
+    def success(self) -> bool:
+        return bool(self.data.get('success'))
+
+    def derived(self, name: str, factory: Callable):
+        """Get (or build once) a structure computed from this snapshot."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = factory()
+                    self._derived[name] = value
+        return value
+
+    def as_dict(self) -> Dict:
+        """Copy of the sheet data that callers are free to mutate."""
+        result = dict(self.data)
+        for key in ('headers', 'main_headers', 'sub_headers', 'max_scores'):
+            if isinstance(result.get(key), list):
+                result[key] = list(result[key])
+        if isinstance(result.get('tableData'), list):
+            result['tableData'] = _copy_rows(result['tableData'])
+        return result
+
+
+class SheetSnapshotCache:
+    """
+    Per-worker LRU cache of sheet snapshots keyed by (spreadsheet id, sheet name).
+
+    Entries are bounded by count and by an approximate memory budget. Freshness is
+    checked against Drive's file version/modifiedTime by the caller once an entry
+    is older than FRESH_SECONDS; writes made through GoogleServiceAccountSheets
+    mark entries dirty (values changed) or drop them (structure changed).
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._metadata = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'hits': 0,
+            'validated_hits': 0,
+            'structure_hits': 0,
+            'structure_validated_hits': 0,
+            'misses': 0,
+            'stale_refetches': 0,
+            'dirty_refetches': 0,
+            'forced_refetches': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'metadata_hits': 0,
+            'metadata_misses': 0,
+        }
+
+    def count(self, metric: str):
+        with self._lock:
+            self._metrics[metric] += 1
+
+    def get(self, key: Tuple[str, Optional[str]]) -> Optional[SheetSnapshot]:
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, key: Tuple[str, Optional[str]], snapshot: SheetSnapshot):
+        if not snapshot.success:
+            return
+        if snapshot.size > self.config['MAX_BYTES']:
+            logger.info(f"Sheet snapshot {key} is larger than the cache budget, not caching")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = snapshot
+            self._bytes += snapshot.size
+
+            while self._entries and (len(self._entries) > self.config['MAX_ENTRIES'] or
+                                     self._bytes > self.config['MAX_BYTES']):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._metrics['evictions'] += 1
+
+    def invalidate(self, spreadsheet_id: str, structure_changed: bool = False):
+        """
+        Invalidate every cached tab of a spreadsheet after a write.
+
+        Value writes only mark entries dirty, so write paths that just need headers
+        can keep using them; structural writes (headers, arbitrary ranges) drop them.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == spreadsheet_id]:
+                if structure_changed:
+                    self._bytes -= self._entries.pop(key).size
+                else:
+                    self._entries[key].dirty = True
+            if structure_changed:
+                self._metadata.pop(spreadsheet_id, None)
+            self._metrics['invalidations'] += 1
+
+    def get_metadata(self, spreadsheet_id: str) -> Optional[Dict]:
+        """Cached spreadsheet metadata (tab titles, ids, grid sizes), if still fresh."""
+        with self._lock:
+            entry = self._metadata.get(spreadsheet_id)
+            if entry is None or time.monotonic() - entry[0] > self.config['METADATA_MAX_AGE_SECONDS']:
+                self._metrics['metadata_misses'] += 1
+                return None
+            self._metadata.move_to_end(spreadsheet_id)
+            self._metrics['metadata_hits'] += 1
+            return entry[1]
+
+    def put_metadata(self, spreadsheet_id: str, metadata: Dict):
+        with self._lock:
+            self._metadata.pop(spreadsheet_id, None)
+            self._metadata[spreadsheet_id] = (time.monotonic(), metadata)
+            while len(self._metadata) > self.config['MAX_ENTRIES']:
+                self._metadata.popitem(last=False)
+
+    def invalidate_metadata(self, spreadsheet_id: str):
+        """Drop cached metadata only, e.g. after a tab was added or renamed elsewhere."""
+        with self._lock:
+            self._metadata.pop(spreadsheet_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._metadata.clear()
+            self._bytes = 0
+
+    def is_fresh(self, snapshot: SheetSnapshot) -> bool:
+        return time.monotonic() - snapshot.validated_at <= self.config['FRESH_SECONDS']
+
+    def is_expired(self, snapshot: SheetSnapshot) -> bool:
+        return time.monotonic() - snapshot.fetched_at > self.config['MAX_AGE_SECONDS']
+
+    def is_structure_usable(self, snapshot: SheetSnapshot) -> bool:
+        return time.monotonic() - snapshot.fetched_at <= self.config['STRUCTURE_MAX_AGE_SECONDS']
+
+    def is_structure_fresh(self, snapshot: SheetSnapshot) -> bool:
+        return time.monotonic() - snapshot.structure_validated_at <= self.config['FRESH_SECONDS']
+
+    def is_unchanged(self, snapshot: SheetSnapshot, version: Optional[str],
+                     modified_timestamp: Optional[float]) -> bool:
+        """Compare Drive file metadata with what the snapshot was read at."""
+        if snapshot.version is not None and version is not None:
+            return snapshot.version == version
+        if modified_timestamp is not None:
+            return modified_timestamp < snapshot.fetched_at_wall - self.config['MODIFIED_TIME_SKEW_SECONDS']
+        return False
+
+    def mark_validated(self, snapshot: SheetSnapshot, version: Optional[str]):
+        snapshot.validated_at = time.monotonic()
+        snapshot.structure_validated_at = snapshot.validated_at
+        if version is not None:
+            snapshot.version = version
+
+    def mark_structure_validated(self, snapshot: SheetSnapshot):
+        snapshot.structure_validated_at = time.monotonic()
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['entries'] = len(self._entries)
+            metrics['bytes'] = self._bytes
+        served = metrics['hits'] + metrics['validated_hits'] + metrics['structure_hits'] + \
+            metrics['structure_validated_hits']
+        lookups = served + metrics['misses'] + metrics['stale_refetches'] + metrics['dirty_refetches'] + \
+            metrics['forced_refetches']
+        metrics['hit_rate'] = round(served / lookups, 3) if lookups else 0.0
+        return metrics
+
+
+def _load_config() -> Dict:
+    try:
+        from django.conf import settings
+        return getattr(settings, 'GOOGLE_SHEETS_SNAPSHOT_CACHE', {})
+    except Exception:
+        return {}
+
+
+snapshot_cache = SheetSnapshotCache(_load_config())
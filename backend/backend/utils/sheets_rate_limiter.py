@@ -0,0 +1,356 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from utils.concurrent_fetch import current_deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Sheets API per-user quotas (the service account is one user). Buckets are
+    # per worker process, so divide by the number of workers when running several.
+    'READS_PER_MINUTE': 60,
+    'WRITES_PER_MINUTE': 60,
+    # Share of the account's rate one spreadsheet may use, so a bulk import on one
+    # class record doesn't hold up every other teacher
+    'SPREADSHEET_SHARE': 0.5,
+    # Burst allowed after idle time, in seconds worth of quota
+    'BURST_SECONDS': 15,
+    # Share of each bucket only interactive calls may take
+    'INTERACTIVE_RESERVE': 0.2,
+    # Longest a call waits for a token; past it, the call is sent anyway and Google decides
+    'MAX_WAIT_SECONDS': 30,
+    # Retries of rate-limited / failed calls, with full-jitter exponential backoff
+    'MAX_RETRIES': 5,
+    'BACKOFF_BASE_SECONDS': 1,
+    'BACKOFF_MAX_SECONDS': 32,
+    # After a 429 the bucket rate is halved, then recovers linearly over this long
+    'RECOVERY_SECONDS': 60,
+    # Buckets kept per worker (one per account and kind, and per spreadsheet). A bucket
+    # idle this long has refilled and recovered, so dropping it loses nothing
+    'MAX_BUCKETS': 4096,
+    'BUCKET_IDLE_SECONDS': 600,
+}
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+SHEETS_HOST = 'sheets.googleapis.com'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'RATE_LIMIT_EXCEEDED')
+
+_SPREADSHEET_PATTERN = re.compile(r'/v4/spreadsheets/([^/:?]+)')
+
+_local = threading.local()
+
+
+class TokenBucket:
+    """Token bucket whose rate drops after a 429 and climbs back afterwards."""
+
+    def __init__(self, per_minute: float, burst_seconds: float, recovery_seconds: float):
+        self.max_rate = per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(self.max_rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self.recovery_seconds = recovery_seconds
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed <= 0:
+            return
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * elapsed / self.recovery_seconds)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, needed: float) -> float:
+        return max(needed - self.tokens, 0.0) / self.rate
+
+    def penalize(self):
+        # The retry's own backoff covers the immediate wait; this slows what follows
+        self.rate = max(self.rate / 2, self.max_rate / 10)
+
+
+class SheetsRateLimiter:
+    """
+    Client-side quota for Sheets API calls, so classroom load is smoothed out
+    here instead of turning into 429s that lose cells.
+
+    Every call takes a token from its account bucket (reads and writes counted
+    separately, like Google's quotas) and from its spreadsheet's bucket. Bulk
+    work (imports, background refreshes) leaves a reserve in each bucket to
+    interactive calls (voice scores, page loads) and yields to interactive
+    callers that are waiting. A 429 halves the rate of the buckets involved,
+    which then recovers over RECOVERY_SECONDS.
+
+    Calls run at INTERACTIVE priority unless wrapped in priority(BULK), which
+    also works as a method decorator.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_CONFIG)
+        if config:
+            self.config.update(config)
+        self._condition = threading.Condition()
+        self._buckets = OrderedDict()
+        self._interactive_waiting = 0
+        self._metrics = {
+            'calls': 0,
+            'throttled_calls': 0,
+            'throttled_seconds': 0.0,
+            'bulk_throttled_seconds': 0.0,
+            'wait_limit_reached': 0,
+            'rate_limited_responses': 0,
+            'retries': 0,
+            'retry_sleep_seconds': 0.0,
+            'retries_exhausted': 0,
+            'buckets_evicted': 0,
+        }
+
+    @contextmanager
+    def priority(self, level: str):
+        previous = getattr(_local, 'priority', INTERACTIVE)
+        _local.priority = level
+        try:
+            yield
+        finally:
+            _local.priority = previous
+
+    @staticmethod
+    def current_priority() -> str:
+        return getattr(_local, 'priority', INTERACTIVE)
+
+    def _bucket_keys(self, account: str, spreadsheet_id: Optional[str], write: bool) -> List[Tuple]:
+        kind = 'write' if write else 'read'
+        keys = [(account, kind)]
+        if spreadsheet_id:
+            keys.append((account, kind, spreadsheet_id))
+        return keys
+
+    def _get_bucket(self, key: Tuple) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+            return bucket
+
+        per_minute = self.config['WRITES_PER_MINUTE'] if key[1] == 'write' else self.config['READS_PER_MINUTE']
+        if len(key) > 2:
+            per_minute *= self.config['SPREADSHEET_SHARE']
+        bucket = self._buckets[key] = TokenBucket(
+            per_minute, self.config['BURST_SECONDS'], self.config['RECOVERY_SECONDS']
+        )
+        self._evict_buckets(bucket.updated)
+        return bucket
+
+    def _evict_buckets(self, now: float):
+        # Least recently used first; a bucket is refreshed whenever a call takes from it
+        while len(self._buckets) > 1:
+            key, oldest = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.config['MAX_BUCKETS'] and \
+                    now - oldest.updated < self.config['BUCKET_IDLE_SECONDS']:
+                break
+            del self._buckets[key]
+            self._metrics['buckets_evicted'] += 1
+
+    def acquire(self, account: str, spreadsheet_id: str = None, write: bool = False) -> float:
+        """
+        Wait until the call fits the quota and take its tokens.
+
+        Returns:
+            Seconds spent waiting
+        """
+        bulk = self.current_priority() == BULK
+        started = time.monotonic()
+        max_wait = self.config['MAX_WAIT_SECONDS']
+        deadline = current_deadline()
+        if deadline is not None:
+            max_wait = min(max_wait, deadline.remaining())
+
+        with self._condition:
+            buckets = [self._get_bucket(key) for key in self._bucket_keys(account, spreadsheet_id, write)]
+            if not bulk:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    for bucket in buckets:
+                        bucket.refill(now)
+
+                    reserve = self.config['INTERACTIVE_RESERVE'] if bulk else 0.0
+                    needed = [min(1.0 + bucket.capacity * reserve, bucket.capacity) for bucket in buckets]
+                    yielding = bulk and self._interactive_waiting > 0
+                    if not yielding and all(b.tokens >= n for b, n in zip(buckets, needed)):
+                        for bucket in buckets:
+                            bucket.tokens -= 1.0
+                        break
+
+                    waited = now - started
+                    if waited >= max_wait:
+                        # Don't fail the call here; Google's answer (and the retries) decide. Its
+                        # token is taken only as far as the bucket has one, so calls that gave up
+                        # don't leave a debt that makes every later call wait longer
+                        for bucket in buckets:
+                            bucket.tokens = max(bucket.tokens - 1.0, 0.0)
+                        self._metrics['wait_limit_reached'] += 1
+                        break
+
+                    wait = max(b.wait_time(n) for b, n in zip(buckets, needed)) if not yielding else 0.05
+                    self._condition.wait(min(max(wait, 0.01), max_wait - waited))
+            finally:
+                if not bulk:
+                    self._interactive_waiting -= 1
+                    self._condition.notify_all()
+
+            waited = time.monotonic() - started
+            self._metrics['calls'] += 1
+            if waited > 0.001:
+                self._metrics['throttled_calls'] += 1
+                self._metrics['throttled_seconds'] += waited
+                if bulk:
+                    self._metrics['bulk_throttled_seconds'] += waited
+        return waited
+
+    def penalize(self, account: str, spreadsheet_id: str = None, write: bool = False):
+        """Slow down the buckets of a call that Google rate limited."""
+        with self._condition:
+            for key in self._bucket_keys(account, spreadsheet_id, write):
+                self._get_bucket(key).penalize()
+            self._metrics['rate_limited_responses'] += 1
+
+    def backoff_seconds(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Retry-After when Google sent one, otherwise full-jitter exponential backoff."""
+        delay = None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+        if delay is None:
+            cap = min(self.config['BACKOFF_MAX_SECONDS'], self.config['BACKOFF_BASE_SECONDS'] * (2 ** attempt))
+            delay = random.uniform(0, cap)
+
+        deadline = current_deadline()
+        if deadline is not None:
+            delay = min(delay, deadline.remaining())
+        return delay
+
+    def record_retry(self, slept: float):
+        with self._condition:
+            self._metrics['retries'] += 1
+            self._metrics['retry_sleep_seconds'] += slept
+
+    def record_exhausted(self):
+        with self._condition:
+            self._metrics['retries_exhausted'] += 1
+
+    def get_metrics(self) -> Dict:
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics['buckets'] = {
+                '/'.join(key[1:]): {
+                    'tokens': round(bucket.tokens, 2),
+                    'rate_per_minute': round(bucket.rate * 60, 1)
+                }
+                for key, bucket in self._buckets.items()
+            }
+        metrics['throttled_seconds'] = round(metrics['throttled_seconds'], 3)
+        metrics['bulk_throttled_seconds'] = round(metrics['bulk_throttled_seconds'], 3)
+        metrics['retry_sleep_seconds'] = round(metrics['retry_sleep_seconds'], 3)
+        return metrics
+
+
+def parse_sheets_call(uri: str, method: str) -> Tuple[bool, Optional[str], bool, bool]:
+    """
+    Classify a request URI.
+
+    Returns:
+        (is_sheets_call, spreadsheet_id, is_write, safe_to_retry_on_5xx)
+    """
+    if SHEETS_HOST not in uri:
+        return False, None, False, False
+    match = _SPREADSHEET_PATTERN.search(uri)
+    spreadsheet_id = match.group(1) if match else None
+    method = (method or 'GET').upper()
+    write = method != 'GET'
+    # Setting values is idempotent; appends and structural batchUpdates are not
+    idempotent = method in ('GET', 'PUT') or '/values:batch' in uri or ('/values/' in uri and ':clear' in uri)
+    return True, spreadsheet_id, write, idempotent
+
+
+def is_rate_limited(status: int, content) -> bool:
+    if status == 429:
+        return True
+    if status != 403 or not content:
+        return False
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', 'replace')
+    return any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+class RateLimitedHttp:
+    """
+    httplib2-compatible transport for googleapiclient that applies the rate
+    limiter and retries rate-limited or failed Sheets calls.
+
+    Wraps the authorized transport of a service account, so every Sheets call
+    made through its discovery clients is covered without touching the callers.
+    Other hosts (Drive) pass straight through.
+    """
+
+    def __init__(self, http, account: str, limiter: SheetsRateLimiter = None):
+        self._http = http
+        self._account = account
+        self._limiter = limiter or rate_limiter
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        is_sheets, spreadsheet_id, write, idempotent = parse_sheets_call(str(uri), method)
+        if not is_sheets:
+            return self._http.request(uri, method, body, headers, *args, **kwargs)
+
+        limiter = self._limiter
+        attempt = 0
+        while True:
+            limiter.acquire(self._account, spreadsheet_id, write)
+            response, content = self._http.request(uri, method, body, headers, *args, **kwargs)
+
+            status = int(response.status)
+            rate_limited = is_rate_limited(status, content)
+            if not rate_limited and (status not in RETRY_STATUSES or not idempotent):
+                return response, content
+
+            if rate_limited:
+                limiter.penalize(self._account, spreadsheet_id, write)
+            if attempt >= limiter.config['MAX_RETRIES']:
+                limiter.record_exhausted()
+                logger.warning(f"Sheets call still failing with {status} after {attempt} retries: {method} {uri}")
+                return response, content
+
+            delay = limiter.backoff_seconds(attempt, response.get('retry-after'))
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired:
+                return response, content
+
+            logger.info(f"Sheets call got {status}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            limiter.record_retry(delay)
+            attempt += 1
+
+
+def _load_config() -> Dict:
+    try:
+        from django.conf import settings
+        return getattr(settings, 'SHEETS_RATE_LIMITS', {})
+    except Exception:
+        return {}
+
+
+rate_limiter = SheetsRateLimiter(_load_config())
@@ -0,0 +1,328 @@
+from typing import Dict, List, Optional, Tuple
+
+from utils.sheet_columns import SheetColumnMap
+
+# Strategies in priority order; a match found by an earlier one always wins
+EXACT = 'exact'
+REVERSED = 'reversed'
+FULL_NAME = 'full_name'
+FIRST_TOKEN = 'first_token'
+LAST_EXACT_FIRST_CONTAINS = 'last_exact_first_contains'
+FIRST_EXACT_LAST_CONTAINS = 'first_exact_last_contains'
+FULL_NAME_CONTAINS = 'full_name_contains'
+
+# Reasons an imported student is reported as a duplicate of an existing one
+DUPLICATE_STUDENT_ID = 'student_id'
+DUPLICATE_EXACT_NAME = 'exact_name'
+DUPLICATE_LAST_NAME = 'last_name_first_similar'
+DUPLICATE_FIRST_NAME = 'first_name_last_similar'
+DUPLICATE_FULL_NAME = 'full_name_contains'
+
+# Containment matches also need this much character overlap, so 'ann' doesn't match 'joanna'
+MIN_CHAR_SIMILARITY = 0.6
+
+
+def normalize_name(value) -> str:
+    """Normalize a name for matching: trimmed, single-spaced, lower case."""
+    return ' '.join(str(value or '').split()).lower()
+
+
+def parse_student_identifier(student_identifier) -> Tuple[str, str]:
+    """
+    Split a student identifier into (first, last), normalized.
+
+    'Smith, John' is read as Last, First. 'John Smith' is read as First Last, with
+    every word after the first going to the last name. A single word is used as
+    both first and last name.
+    """
+    identifier = str(student_identifier or '')
+
+    if ',' in identifier:
+        parts = identifier.split(',')
+        return normalize_name(parts[1] if len(parts) > 1 else ''), normalize_name(parts[0])
+
+    parts = identifier.split()
+    if not parts:
+        return '', ''
+    if len(parts) == 1:
+        return parts[0].lower(), parts[0].lower()
+    return parts[0].lower(), ' '.join(parts[1:]).lower()
+
+
+def char_similarity(a: str, b: str) -> float:
+    """Shared distinct characters over the longer length, the check find_student_row_by_name used."""
+    if not a or not b:
+        return 0.0
+    return len(set(a) & set(b)) / max(len(a), len(b))
+
+
+class StudentMatch:
+    """Result of a lookup: the 0-based data row, the strategy that found it and a 0-1 score."""
+
+    __slots__ = ('row_index', 'strategy', 'score')
+
+    def __init__(self, row_index: int, strategy: str, score: float = 1.0):
+        self.row_index = row_index
+        self.strategy = strategy
+        self.score = score
+
+    def as_dict(self) -> Dict:
+        return {
+            'row_index': self.row_index,
+            'strategy': self.strategy,
+            'score': round(self.score, 3)
+        }
+
+    def __repr__(self):
+        return f"StudentMatch(row={self.row_index}, {self.strategy}, {self.score:.2f})"
+
+
+class StudentEntry:
+    """Normalized names of one data row, computed once when the index is built."""
+
+    __slots__ = ('row_index', 'first', 'last', 'full', 'words', 'student_id', 'display_first', 'display_last')
+
+    def __init__(self, row_index: int, first: str, last: str, student_id: str):
+        self.row_index = row_index
+        self.display_first = first
+        self.display_last = last
+        self.first = normalize_name(first)
+        self.last = normalize_name(last)
+        self.full = f"{self.first} {self.last}".strip()
+        self.words = frozenset(self.full.split())
+        self.student_id = student_id
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.display_first} {self.display_last}".strip()
+
+
+class StudentIndex:
+    """
+    Name and ID lookups over the student rows of one sheet snapshot.
+
+    Built once per snapshot, so repeated lookups (column imports, voice grading,
+    deletes) don't rescan the sheet. Exact, reversed, full-name and first-token
+    matches are dict lookups. The containment fallbacks only look at rows that
+    share a last name, first name or word with the identifier, ranked by how
+    closely they match.
+
+    Row indexes are 0-based data rows, like tableData (sheet row = index + 4).
+    """
+
+    def __init__(self, table_data: List[List], columns: SheetColumnMap):
+        last_name_idx, first_name_idx = columns.name_indexes()
+        student_id_idx = columns.student_id.index if columns.student_id else 3
+
+        self.entries = []
+        self._by_row = {}
+        self._pairs = {}
+        self._full_names = {}
+        self._first_tokens = {}
+        self._by_first = {}
+        self._by_last = {}
+        self._by_word = {}
+        self._by_id = {}
+
+        for row_index, row in enumerate(table_data):
+            first = _cell(row, first_name_idx)
+            last = _cell(row, last_name_idx)
+            if not first and not last:
+                continue
+
+            entry = StudentEntry(row_index, first, last, _cell(row, student_id_idx))
+            self.entries.append(entry)
+            self._by_row[row_index] = entry
+
+            # First row wins for duplicates, like the old top-to-bottom scan
+            self._pairs.setdefault((entry.first, entry.last), entry)
+            self._full_names.setdefault(entry.full, entry)
+            self._full_names.setdefault(f"{entry.last} {entry.first}".strip(), entry)
+            if entry.first:
+                self._first_tokens.setdefault((entry.first.split()[0], entry.last), entry)
+            self._by_first.setdefault(entry.first, []).append(entry)
+            self._by_last.setdefault(entry.last, []).append(entry)
+            for word in entry.words:
+                self._by_word.setdefault(word, []).append(entry)
+            if entry.student_id:
+                self._by_id.setdefault(entry.student_id.lower(), entry)
+
+    @classmethod
+    def from_sheet_data(cls, sheet_data: Dict, columns: SheetColumnMap = None) -> 'StudentIndex':
+        """Build the index from the dict returned by get_sheet_data()."""
+        columns = columns or SheetColumnMap.from_sheet_data(sheet_data)
+        return cls(sheet_data.get('tableData', []), columns)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match(self, student_identifier) -> Optional[StudentMatch]:
+        """
+        Find the row of a student by name ('John Smith' or 'Smith, John').
+
+        Returns:
+            StudentMatch for the best matching row, or None
+        """
+        search_first, search_last = parse_student_identifier(student_identifier)
+        if not search_first and not search_last:
+            return None
+
+        entry = self._pairs.get((search_first, search_last))
+        if entry is not None:
+            return StudentMatch(entry.row_index, EXACT)
+
+        entry = self._pairs.get((search_last, search_first))
+        if entry is not None:
+            return StudentMatch(entry.row_index, REVERSED)
+
+        search_full = f"{search_first} {search_last}".strip()
+        entry = self._full_names.get(search_full)
+        if entry is not None:
+            return StudentMatch(entry.row_index, FULL_NAME)
+
+        # 'John Smith' for 'John Paul Smith'
+        if search_first:
+            entry = self._first_tokens.get((search_first.split()[0], search_last))
+            if entry is not None:
+                return StudentMatch(entry.row_index, FIRST_TOKEN, 0.9)
+
+        return self._match_containment(search_first, search_last, search_full)
+
+    def find(self, student_identifier) -> Optional[int]:
+        """0-based data row of a student by name, or None."""
+        match = self.match(student_identifier)
+        return match.row_index if match else None
+
+    def find_by_id(self, student_id) -> Optional[int]:
+        """0-based data row of a student by exact student ID, or None."""
+        entry = self._by_id.get(str(student_id or '').strip().lower())
+        return entry.row_index if entry else None
+
+    def find_duplicate(self, first_name, last_name, student_id=None) -> Optional[StudentMatch]:
+        """
+        Find an existing student that an imported student duplicates.
+
+        A matching student ID wins outright. Otherwise only rows in the same
+        last-name or first-name bucket, or sharing a name word, are compared:
+        same last name with a similar first name ('Jared' / 'Jared Karl'), same
+        first name with a similar last name, or one full name containing the other.
+        Name matches are scored by the words both full names share.
+
+        Returns:
+            StudentMatch whose strategy is the duplicate reason, or None
+        """
+        student_id = str(student_id or '').strip().lower()
+        if student_id:
+            entry = self._by_id.get(student_id)
+            if entry is not None:
+                return StudentMatch(entry.row_index, DUPLICATE_STUDENT_ID)
+
+        first = normalize_name(first_name)
+        last = normalize_name(last_name)
+        if not first and not last:
+            return None
+
+        entry = self._pairs.get((first, last))
+        if entry is not None:
+            return StudentMatch(entry.row_index, DUPLICATE_EXACT_NAME)
+
+        full = f"{first} {last}".strip()
+        words = set(full.split())
+
+        candidates = {}
+        for bucket in [self._by_last.get(last, ()), self._by_first.get(first, ())] + \
+                [self._by_word.get(word, ()) for word in words]:
+            for entry in bucket:
+                candidates[entry.row_index] = entry
+
+        best = None
+        for row_index in sorted(candidates):
+            entry = candidates[row_index]
+            reason = _duplicate_reason(first, last, full, entry)
+            if reason is None:
+                continue
+            score = len(words & entry.words) / len(words | entry.words) if entry.words else 0.0
+            if best is None or score > best.score:
+                best = StudentMatch(row_index, reason, score)
+        return best
+
+    def find_partial(self, text) -> Optional[int]:
+        """
+        First row whose name contains the text, or whose full name is contained in
+        it. Looser than find(); used when a single name or fragment is given.
+        """
+        text = normalize_name(text)
+        if not text:
+            return None
+        for entry in self.entries:
+            if text in entry.full or entry.full in text:
+                return entry.row_index
+        return None
+
+    def get_entry(self, row_index: int) -> Optional[StudentEntry]:
+        return self._by_row.get(row_index)
+
+    def display_names(self) -> List[str]:
+        return [entry.display_name for entry in self.entries]
+
+    def _match_containment(self, search_first: str, search_last: str, search_full: str) -> Optional[StudentMatch]:
+        # Best candidate per strategy; an earlier strategy wins regardless of score
+        best = {}
+
+        def consider(strategy, entry, score):
+            current = best.get(strategy)
+            if current is None or score > current[0] or (score == current[0] and entry.row_index < current[1].row_index):
+                best[strategy] = (score, entry)
+
+        if len(search_first) >= 3:
+            for entry in self._by_last.get(search_last, ()):
+                if len(entry.first) >= 3 and (search_first in entry.first or entry.first in search_first):
+                    score = char_similarity(search_first, entry.first)
+                    if score >= MIN_CHAR_SIMILARITY:
+                        consider(LAST_EXACT_FIRST_CONTAINS, entry, score)
+
+        if len(search_last) >= 3:
+            for entry in self._by_first.get(search_first, ()):
+                if len(entry.last) >= 3 and (search_last in entry.last or entry.last in search_last):
+                    score = char_similarity(search_last, entry.last)
+                    if score >= MIN_CHAR_SIMILARITY:
+                        consider(FIRST_EXACT_LAST_CONTAINS, entry, score)
+
+        # 'Jared Karl' vs 'Jared Karl Omen'; only rows sharing a word can qualify
+        search_words = set(search_full.split())
+        if len(search_full) >= 6:
+            candidates = {}
+            for word in search_words:
+                for entry in self._by_word.get(word, ()):
+                    candidates[entry.row_index] = entry
+
+            for entry in candidates.values():
+                if len(entry.full) < 6 or not (search_full in entry.full or entry.full in search_full):
+                    continue
+                word_overlap = len(search_words & entry.words)
+                total_words = max(len(search_words), len(entry.words))
+                if word_overlap >= 2 or (total_words <= 2 and word_overlap >= 1):
+                    consider(FULL_NAME_CONTAINS, entry, word_overlap / total_words)
+
+        for strategy in (LAST_EXACT_FIRST_CONTAINS, FIRST_EXACT_LAST_CONTAINS, FULL_NAME_CONTAINS):
+            if strategy in best:
+                score, entry = best[strategy]
+                return StudentMatch(entry.row_index, strategy, score)
+        return None
+
+
+def _duplicate_reason(first: str, last: str, full: str, entry: StudentEntry) -> Optional[str]:
+    if last == entry.last:
+        if first in entry.first or entry.first in first or first.split()[:1] == entry.first.split()[:1]:
+            return DUPLICATE_LAST_NAME
+    if first == entry.first and (last in entry.last or entry.last in last):
+        return DUPLICATE_FIRST_NAME
+    if full in entry.full or entry.full in full:
+        return DUPLICATE_FULL_NAME
+    return None
+
+
+def _cell(row: List, index: int) -> str:
+    if index < len(row) and row[index]:
+        return str(row[index]).strip()
+    return ''
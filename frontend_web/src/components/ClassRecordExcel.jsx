@@ -21,6 +21,8 @@ import ImportScoresInfoModal from './modals/ImportScoresInfoModal.jsx';
 import StudentConfirmationModal from './modals/StudentConfirmationModal.jsx';
 import DeleteStudentModal from './modals/DeleteStudentModal.jsx';
 
+// How often to check on a Google Sheet that is still being created
+const SHEET_STATUS_POLL_MS = 2000;
 
 const ClassRecordExcel = () => {
   const { id } = useParams();
@@ -102,6 +104,7 @@ const ClassRecordExcel = () => {
   const [showVoiceGuide, setShowVoiceGuide] = useState(false);
 
   const isFirstRender = useRef(true);
+  const sheetStatusTimer = useRef(null);
 
   useEffect(() => {
     if (isFirstRender.current) {
@@ -171,6 +174,7 @@ const ClassRecordExcel = () => {
 
     useEffect(() => {
       fetchClassRecord();
+      return () => clearTimeout(sheetStatusTimer.current);
     }, [id]);
 
    useEffect(() => {
@@ -243,6 +247,11 @@ const ClassRecordExcel = () => {
       const response = await classRecordService.getClassRecord(id);
       console.log("📊 Fetched class record data:", response.data);
       setClassRecord(response.data);
+
+      // 🔥 The sheet is copied from the template after create; wait for it
+      if (!response.data?.google_sheet_id && response.data?.sheet_status === 'provisioning') {
+        waitForSheet();
+      }
       
       // 🔥 Load ALL sheets data for multi-sheet support
       if (response.data?.google_sheet_id) {
@@ -286,6 +295,29 @@ const ClassRecordExcel = () => {
     }
   };
 
+  const waitForSheet = () => {
+    clearTimeout(sheetStatusTimer.current);
+    sheetStatusTimer.current = setTimeout(async () => {
+      try {
+        const response = await classRecordService.getSheetStatus(id);
+        const { sheet_status, sheet_status_error, google_sheet_id } = response.data;
+
+        if (google_sheet_id) {
+          console.log("✅ Google Sheet is ready, loading it...");
+          fetchClassRecord();
+        } else if (sheet_status === 'provisioning') {
+          waitForSheet();
+        } else {
+          setClassRecord(prev => ({ ...prev, ...response.data }));
+          toast.error(`Google Sheet could not be created: ${sheet_status_error || 'Unknown error'}`);
+        }
+      } catch (error) {
+        console.error('Error checking Google Sheet status:', error);
+        waitForSheet();
+      }
+    }, SHEET_STATUS_POLL_MS);
+  };
+
   const validateScore = (columnName, score) => {
     const maxScore = maxScores[columnName];
     
@@ -221,6 +221,9 @@ export const classRecordService = {
     
     // Get a specific class record by ID
     getClassRecord: (id) => api.get(`/class-records/${id}/`),
+
+    // Get the state of a class record's Google Sheet, which is created in the background
+    getSheetStatus: (id) => api.get(`/class-records/${id}/sheet_status/`),
     
     // Update a class record
     updateClassRecord: (id, recordData) => api.patch(`/class-records/${id}/`, recordData),